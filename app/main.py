@@ -1,20 +1,38 @@
-from fastapi import FastAPI, Depends, HTTPException, status
+from fastapi import FastAPI, Depends, HTTPException, Query, status, BackgroundTasks
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from database import engine, Base, get_db
+from database import engine, Base, get_db, SessionLocal
 from app.models.Base import User
 from app.schemas.user_schema import UserCreate, UserResponse, UserLogin
-from app.services.security import UserService
+from app.schemas.battle_schema import BattleBatchRequest
+from app.services.security import UserService, ADMIN_USER_IDS
 from app.utilties.ErrorHandling import CustomErrorMiddleware, setup_exception_handlers
 from app.models import PokemonTeam, PokemonTeamResponse, PokemonTeamCreate
 from app.services import get_current_user
-from app.services.battle_services import PokemonBattleService
-from app.services.tournament_service import TournamentType, AdvancedTournamentService
+from app.services.battle_services import PokemonBattleService, BattleCombatant, CompactBattleOutcome
+from app.services.battle_replay import BattleReplay, TeamBattleReplay, TEAM_REPLAY_VERSION
+from app.services.team_battle_service import TeamStats
+from app.services.battle_cache import battle_result_cache, CachedBattleService
+from app.services.battle_batch_service import BattleBatchService
+from app.services.matchup_matrix_service import matchup_matrix_service
+from app.services.simulation_executor import simulation_executor, SimulationQueueFullError
+from app.services.tournament_service import TournamentType, AdvancedTournamentService, FORECAST_MAX_SIMULATIONS
+from app.services.tournament_stream_service import TournamentStreamService
+from app.services.tournament_job_service import TournamentJobService
+from app.services.rating_service import rating_service, POKEMON_ENTITY, TRAINER_ENTITY
+from app.services.leaderboard_service import leaderboard_service, LEADERBOARD_MAX_ENTRIES, LEADERBOARD_MAX_RADIUS
 from app.services.pokemon_storage_service import PokemonStorageService
 from app.storage.distributed_storage import DistributedTrainerStorageManager
-from typing import List
+from app.storage.backup_catalog import BackupCatalog
+from app.storage.segment_storage import close_segment_stores
+import asyncio
+from datetime import datetime
+from typing import List, Optional
 
 Base.metadata.create_all(bind=engine)
 
+backup_catalog = BackupCatalog(SessionLocal)
+
 app = FastAPI(...)
 
 
@@ -27,13 +45,70 @@ app = FastAPI(
 app.add_middleware(CustomErrorMiddleware)
 setup_exception_handlers(app)
 
+@app.on_event("startup")
+async def start_simulation_executor():
+    await simulation_executor.start()
+
+@app.on_event("startup")
+def load_ratings():
+    db = SessionLocal()
+    try:
+        rating_service.load(db)
+        leaderboard_service.rebuild(db, rating_service)
+    finally:
+        db.close()
+
+@app.on_event("startup")
+async def schedule_rating_recompute():
+    app.state.rating_recompute = asyncio.ensure_future(rating_service.recompute_periodically())
+
+@app.on_event("shutdown")
+def stop_simulation_executor():
+    simulation_executor.shutdown()
+
+@app.on_event("shutdown")
+def close_storage():
+    # Seal active segments so the next startup reads footers instead of scanning
+    close_segment_stores()
+
+@app.on_event("shutdown")
+def stop_rating_recompute():
+    app.state.rating_recompute.cancel()
+
+@app.on_event("shutdown")
+def flush_ratings():
+    db = SessionLocal()
+    try:
+        rating_service.flush(db)
+    finally:
+        db.close()
+
 # Dependencies
+def get_storage_manager() -> DistributedTrainerStorageManager:
+    return DistributedTrainerStorageManager(catalog=backup_catalog)
+
 def get_pokemon_storage_service(
     db: Session = Depends(get_db),
-    storage_manager: DistributedTrainerStorageManager = Depends()
+    storage_manager: DistributedTrainerStorageManager = Depends(get_storage_manager)
 ):
     return PokemonStorageService(db, storage_manager)
 
+def get_admin_user(current_user_id: int = Depends(get_current_user)) -> int:
+    """
+    Restrict an endpoint to the users in ADMIN_USER_IDS
+    """
+    if current_user_id not in ADMIN_USER_IDS:
+        raise HTTPException(status_code=403, detail="Administrator access required")
+    return current_user_id
+
+def require_storage_owner(storage_id: str, user_id: int):
+    """
+    Reject storage IDs not saved for the user; others' records are reported
+    as missing rather than forbidden
+    """
+    if backup_catalog.owner(storage_id) != user_id:
+        raise HTTPException(status_code=404, detail=f"Storage entry not found: {storage_id}")
+
 @app.post("/users/register", response_model=UserResponse)
 def register_user(user: UserCreate, db: Session = Depends(get_db)):
     existing_user = db.query(User).filter(
@@ -84,23 +159,125 @@ def read_users_me(db: Session = Depends(get_db)):
     return user
 
 @app.post("/pokemon/battle")
-def simulate_battle(
+async def simulate_battle(
     pokemon1_id: int, 
     pokemon2_id: int,
-    db: Session = Depends(get_db),
+    seed: Optional[int] = None,
+    current_user_id: int = Depends(get_current_user),
     storage_service: PokemonStorageService = Depends(get_pokemon_storage_service)
 ):
     try:
-        pokemon1 = storage_service.retrieve_pokemon_by_id(pokemon1_id)
-        pokemon2 = storage_service.retrieve_pokemon_by_id(pokemon2_id)
+        pokemon1 = BattleCombatant.from_pokemon(storage_service.retrieve_pokemon_by_id(pokemon1_id))
+        pokemon2 = BattleCombatant.from_pokemon(storage_service.retrieve_pokemon_by_id(pokemon2_id))
         
-        battle_outcome = PokemonBattleService.simulate_battle(pokemon1, pokemon2)
+        # Only seeded battles are reproducible, so only those are cached
+        battle_outcome = await CachedBattleService.run_battle(simulation_executor, pokemon1, pokemon2, seed=seed)
+        winner, loser = (pokemon1, pokemon2) if battle_outcome.pokemon1_won else (pokemon2, pokemon1)
+        # Only rate battles the server seeded: a chosen seed could be replayed
+        # until it wins, and chosen seeds are the ones served from the cache
+        if seed is None:
+            rating_service.record_battle(battle_outcome.winner_id, battle_outcome.loser_id)
+            await rating_service.flush_if_due_async()
         return {
-            "winner": battle_outcome.winner.name,
-            "loser": battle_outcome.loser.name,
+            "winner": winner.name,
+            "loser": loser.name,
             "rounds": battle_outcome.rounds,
-            "damage_dealt": battle_outcome.damage_dealt
+            "damage_dealt": {
+                pokemon1.name: battle_outcome.damage_dealt[0],
+                pokemon2.name: battle_outcome.damage_dealt[1]
+            },
+            "seed": battle_outcome.seed,
+            "replay": BattleReplay.from_outcome(battle_outcome, pokemon1, pokemon2).encode().hex()
         }
+    except SimulationQueueFullError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+def record_battle_outcomes(outcomes: List[CompactBattleOutcome]):
+    for outcome in outcomes:
+        rating_service.record_battle(outcome.winner_id, outcome.loser_id)
+
+@app.post("/pokemon/battle/batch")
+def simulate_battle_batch(
+    batch: BattleBatchRequest,
+    background_tasks: BackgroundTasks,
+    current_user_id: int = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    # Resolve every Pokemon up front, before the session is released
+    combatants = BattleBatchService.load_combatants(
+        db, (pokemon_id for pair in batch.pairs for pokemon_id in pair)
+    )
+    try:
+        results = BattleBatchService.open_stream(
+            simulation_executor,
+            combatants,
+            batch.pairs,
+            seed=batch.seed,
+            max_rounds=batch.max_rounds,
+            chunk_size=batch.chunk_size,
+            # Batches with a chosen base seed are not rated
+            on_outcomes=record_battle_outcomes if batch.seed is None else None
+        )
+    except SimulationQueueFullError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    background_tasks.add_task(rating_service.flush_if_due_in_session)
+    return StreamingResponse(results, media_type="application/x-ndjson")
+
+@app.get("/pokemon/battle/probability")
+def battle_probability(
+    pokemon1_id: int,
+    pokemon2_id: int,
+    storage_service: PokemonStorageService = Depends(get_pokemon_storage_service)
+):
+    try:
+        pokemon1 = BattleCombatant.from_pokemon(storage_service.retrieve_pokemon_by_id(pokemon1_id))
+        pokemon2 = BattleCombatant.from_pokemon(storage_service.retrieve_pokemon_by_id(pokemon2_id))
+        probabilities = CachedBattleService.battle_probabilities(pokemon1, pokemon2)
+        return {
+            "pokemon1": pokemon1.name,
+            "pokemon2": pokemon2.name,
+            **probabilities.model_dump()
+        }
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.get("/pokemon/matchups")
+def trainer_matchup_matrix(
+    current_user_id: int = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    try:
+        return matchup_matrix_service.get_matrix(db, current_user_id)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.get("/pokemon/battle/cache")
+def battle_cache_stats():
+    return battle_result_cache.stats()
+
+@app.get("/pokemon/battle/replay/{replay}")
+def replay_battle(
+    replay: str,
+    storage_service: PokemonStorageService = Depends(get_pokemon_storage_service)
+):
+    try:
+        data = bytes.fromhex(replay)
+        if data[:1] == bytes([TEAM_REPLAY_VERSION]):
+            team_replay = TeamBattleReplay.decode(data)
+            team1 = TeamStats.from_team([
+                storage_service.retrieve_pokemon_by_id(pokemon_id) for pokemon_id in team_replay.team1_ids
+            ])
+            team2 = TeamStats.from_team([
+                storage_service.retrieve_pokemon_by_id(pokemon_id) for pokemon_id in team_replay.team2_ids
+            ])
+            return team_replay.replay(team1, team2)
+
+        battle_replay = BattleReplay.decode(data)
+        pokemon1 = BattleCombatant.from_pokemon(storage_service.retrieve_pokemon_by_id(battle_replay.pokemon1_id))
+        pokemon2 = BattleCombatant.from_pokemon(storage_service.retrieve_pokemon_by_id(battle_replay.pokemon2_id))
+        return battle_replay.replay(pokemon1, pokemon2)
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
@@ -108,6 +285,8 @@ def simulate_battle(
 async def simulate_pokemon_tournament(
     team_ids: List[int],
     tournament_type: TournamentType = TournamentType.SINGLE_ELIMINATION,
+    seed: Optional[int] = None,
+    seeded: bool = False,
     current_user_id: int = Depends(get_current_user),
     storage_service: PokemonStorageService = Depends(get_pokemon_storage_service)
 ):
@@ -122,26 +301,328 @@ async def simulate_pokemon_tournament(
 
         tournament_bracket = AdvancedTournamentService.create_tournament_bracket(
             tournament_teams,
-            tournament_type
+            tournament_type,
+            seed,
+            seeded
         )
 
-        completed_tournament = AdvancedTournamentService.simulate_tournament(
+        completed_tournament = await simulation_executor.run_tournament(
             tournament_bracket
         )
+        # As with battles, only server-seeded tournaments are rated
+        if seed is None:
+            rating_service.record_tournament(completed_tournament)
+            await rating_service.flush_if_due_async()
 
         return {
             "tournament_type": completed_tournament.tournament_type.value,
             "champion": completed_tournament.champion.name,
             "total_rounds": completed_tournament.current_round,
-            "matches": [
-                {
-                    "round": match.round_number,
-                    "participants": [p.name for p in match.participants],
-                    "winner": match.winner.name,
-                    "loser": match.loser.name,
-                    "match_details": match.match_details
-                } for match in completed_tournament.matches
-            ]
+            "seed": completed_tournament.seed,
+            "standings": [
+                standing.model_dump() for standing in completed_tournament.standings
+            ],
+            # First-round byes are listed by name rather than as matches
+            "byes": [completed_tournament.participants[index].name for index in completed_tournament.byes],
+            "matches": list(AdvancedTournamentService.match_summaries(completed_tournament))
         }
+    except SimulationQueueFullError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.post("/pokemon/tournament/stream")
+async def stream_pokemon_tournament(
+    team_ids: List[int],
+    background_tasks: BackgroundTasks,
+    tournament_type: TournamentType = TournamentType.SINGLE_ELIMINATION,
+    seed: Optional[int] = None,
+    seeded: bool = False,
+    current_user_id: int = Depends(get_current_user),
+    storage_service: PokemonStorageService = Depends(get_pokemon_storage_service)
+):
+    try:
+        tournament_teams = []
+        for team_id in team_ids:
+            team = await storage_service.retrieve_pokemon_team(
+                team_id=team_id, 
+                user_id=current_user_id
+            )
+            tournament_teams.append(team.pokemons)
+
+        tournament_bracket = AdvancedTournamentService.create_tournament_bracket(
+            tournament_teams,
+            tournament_type,
+            seed,
+            seeded
+        )
+
+        def record_matches(records):
+            rating_service.record_tournament_records(tournament_bracket, records)
+
+        # Matches and round summaries are sent as Server-Sent Events as they are decided
+        events = TournamentStreamService.open_stream(
+            simulation_executor,
+            tournament_bracket,
+            record_matches if seed is None else None
+        )
+        background_tasks.add_task(rating_service.flush_if_due_in_session)
+        return StreamingResponse(
+            events,
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache"}
+        )
+    except SimulationQueueFullError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.post("/pokemon/tournament/job")
+async def start_tournament_job(
+    team_ids: List[int],
+    background_tasks: BackgroundTasks,
+    seed: Optional[int] = None,
+    current_user_id: int = Depends(get_current_user),
+    storage_service: PokemonStorageService = Depends(get_pokemon_storage_service),
+    storage_manager: DistributedTrainerStorageManager = Depends(get_storage_manager)
+):
+    """
+    Start a checkpointed single elimination tournament for very large fields
+    Teams are streamed into storage; poll the job for progress. The job's
+    results are rated unless a seed is given
+    """
+    async def tournament_teams():
+        for team_id in team_ids:
+            team = await storage_service.retrieve_pokemon_team(
+                team_id=team_id, 
+                user_id=current_user_id
+            )
+            yield team.pokemons
+
+    try:
+        job_id = await TournamentJobService.create_job(
+            storage_manager, tournament_teams(), seed, owner_id=current_user_id
+        )
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    background_tasks.add_task(TournamentJobService.run_job, storage_manager, job_id, simulation_executor)
+    # The checkpoint record's backups are listed under its storage ID
+    return {"job_id": job_id, "storage_id": TournamentJobService.job_storage_id(job_id)}
+
+@app.post("/pokemon/tournament/job/{job_id}/resume")
+async def resume_tournament_job(
+    job_id: str,
+    background_tasks: BackgroundTasks,
+    storage_manager: DistributedTrainerStorageManager = Depends(get_storage_manager)
+):
+    """
+    Resume an interrupted tournament job from its last checkpoint
+    """
+    try:
+        checkpoint = await TournamentJobService.get_job(storage_manager, job_id)
+    except Exception as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    if TournamentJobService.is_running(job_id):
+        raise HTTPException(status_code=409, detail=f"Tournament job {job_id} is already running")
+
+    background_tasks.add_task(TournamentJobService.run_job, storage_manager, job_id, simulation_executor)
+    return {"job_id": job_id, "current_round": checkpoint["current_round"]}
+
+@app.get("/pokemon/tournament/job/{job_id}")
+async def get_tournament_job(
+    job_id: str,
+    storage_manager: DistributedTrainerStorageManager = Depends(get_storage_manager)
+):
+    try:
+        checkpoint = await TournamentJobService.get_job(storage_manager, job_id)
+    except Exception as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+    survivors = checkpoint["survivors"]
+    return {
+        "job_id": job_id,
+        "status": checkpoint["status"],
+        "current_round": checkpoint["current_round"],
+        "participant_count": checkpoint["participant_count"],
+        "remaining": checkpoint["participant_count"] if survivors is None else len(survivors),
+        "seed": checkpoint["seed"],
+        "champion": checkpoint["champion"],
+        "error": checkpoint.get("error")
+    }
+
+@app.get("/storage/shards")
+def get_shard_balance(storage_manager: DistributedTrainerStorageManager = Depends(get_storage_manager)):
+    return storage_manager.shard_balance()
+
+@app.post("/storage/shards")
+async def add_storage_shard(
+    shard: Optional[str] = None,
+    admin_user_id: int = Depends(get_admin_user),
+    storage_manager: DistributedTrainerStorageManager = Depends(get_storage_manager)
+):
+    """
+    Add a shard and move the keys it now owns onto it
+    """
+    try:
+        moved = await storage_manager.add_shard(shard)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return {"shards": list(storage_manager.ring.shards), **moved}
+
+@app.delete("/storage/shards/{shard}")
+async def remove_storage_shard(
+    shard: str,
+    admin_user_id: int = Depends(get_admin_user),
+    storage_manager: DistributedTrainerStorageManager = Depends(get_storage_manager)
+):
+    """
+    Remove a shard, moving its keys to the remaining shards
+    """
+    try:
+        moved = await storage_manager.remove_shard(shard)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return {"shards": list(storage_manager.ring.shards), **moved}
+
+@app.post("/storage/backups/gc")
+async def collect_backup_garbage(
+    admin_user_id: int = Depends(get_admin_user),
+    storage_manager: DistributedTrainerStorageManager = Depends(get_storage_manager)
+):
+    """
+    Delete backup chunks no longer referenced by any backup
+    """
+    return await storage_manager.collect_backup_garbage()
+
+@app.get("/storage/{storage_id}/backups")
+async def list_storage_backups(
+    storage_id: str,
+    as_of: Optional[datetime] = None,
+    limit: int = 20,
+    current_user_id: int = Depends(get_current_user),
+    storage_manager: DistributedTrainerStorageManager = Depends(get_storage_manager)
+):
+    """
+    Backups of a record from the catalog, newest first, optionally only those
+    taken at or before as_of
+    """
+    require_storage_owner(storage_id, current_user_id)
+    backups = await storage_manager.backup_history(storage_id, as_of, limit)
+    return {"storage_id": storage_id, "backups": [backup._asdict() for backup in backups]}
+
+@app.get("/storage/{storage_id}/as-of")
+async def read_storage_as_of(
+    storage_id: str,
+    at: Optional[datetime] = None,
+    current_user_id: int = Depends(get_current_user),
+    storage_manager: DistributedTrainerStorageManager = Depends(get_storage_manager)
+):
+    """
+    A record as it was at a point in time, from its latest backup at or before it
+    """
+    require_storage_owner(storage_id, current_user_id)
+    try:
+        backup, data = await storage_manager.read_as_of(storage_id, at)
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    return {"backup_id": backup.backup_id, "backup_timestamp": backup.backup_timestamp, "data": data}
+
+@app.post("/storage/{storage_id}/restore")
+async def restore_storage_record(
+    storage_id: str,
+    as_of: Optional[datetime] = None,
+    current_user_id: int = Depends(get_current_user),
+    storage_manager: DistributedTrainerStorageManager = Depends(get_storage_manager)
+):
+    """
+    Restore a record to primary storage as of a point in time
+    """
+    require_storage_owner(storage_id, current_user_id)
+    try:
+        backup = await storage_manager.restore_as_of(storage_id, as_of)
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    return {"storage_id": storage_id, "restored_from": backup.backup_id, "backup_timestamp": backup.backup_timestamp}
+
+@app.get("/ratings/{entity_type}/{entity_id}")
+def get_rating(entity_type: str, entity_id: int):
+    if entity_type not in (POKEMON_ENTITY, TRAINER_ENTITY):
+        raise HTTPException(status_code=400, detail=f"Unknown rating type {entity_type}")
+    rating = rating_service.get_rating(entity_type, entity_id)
+    if rating is None:
+        raise HTTPException(status_code=404, detail="No rated results yet")
+    return {"entity_type": entity_type, "entity_id": entity_id, **rating}
+
+@app.get("/leaderboard/{board}")
+def get_leaderboard(board: str, k: int = Query(10, ge=1, le=LEADERBOARD_MAX_ENTRIES)):
+    try:
+        return leaderboard_service.top(board, k)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.get("/leaderboard/{board}/trainers/{user_id}")
+def get_leaderboard_rank(board: str, user_id: int):
+    try:
+        entry = leaderboard_service.trainer(board, user_id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if entry is None:
+        raise HTTPException(status_code=404, detail="Trainer is not on this leaderboard")
+    return entry
+
+@app.get("/leaderboard/{board}/around/{user_id}")
+def get_leaderboard_neighbours(board: str, user_id: int, radius: int = Query(5, ge=0, le=LEADERBOARD_MAX_RADIUS)):
+    try:
+        entries = leaderboard_service.around(board, user_id, radius)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if not entries:
+        raise HTTPException(status_code=404, detail="Trainer is not on this leaderboard")
+    return entries
+
+@app.post("/pokemon/tournament/forecast")
+async def forecast_pokemon_tournament(
+    team_ids: List[int],
+    tournament_type: TournamentType = TournamentType.SINGLE_ELIMINATION,
+    simulations: int = Query(10_000, ge=1, le=FORECAST_MAX_SIMULATIONS),
+    seed: Optional[int] = None,
+    seeded: bool = False,
+    current_user_id: int = Depends(get_current_user),
+    storage_service: PokemonStorageService = Depends(get_pokemon_storage_service)
+):
+    try:
+        AdvancedTournamentService.check_forecastable(tournament_type)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    try:
+        tournament_teams = []
+        for team_id in team_ids:
+            team = await storage_service.retrieve_pokemon_team(
+                team_id=team_id, 
+                user_id=current_user_id
+            )
+            tournament_teams.append(team.pokemons)
+
+        tournament_bracket = AdvancedTournamentService.create_tournament_bracket(
+            tournament_teams,
+            tournament_type,
+            seed,
+            seeded
+        )
+
+        forecast = await simulation_executor.submit(
+            AdvancedTournamentService.forecast_tournament,
+            tournament_bracket,
+            simulations
+        )
+        return forecast.model_dump(mode="json")
+    except SimulationQueueFullError as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
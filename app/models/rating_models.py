@@ -0,0 +1,32 @@
+from sqlalchemy import Column, Integer, String, Float, DateTime, JSON, UniqueConstraint
+from app.database.database import Base
+from datetime import datetime
+
+class RatingModel(Base):
+    """
+    SQLAlchemy model for the current rating of a Pokemon or trainer
+    """
+    __tablename__ = "ratings"
+    __table_args__ = (UniqueConstraint('entity_type', 'entity_id'),)
+
+    id = Column(Integer, primary_key=True, index=True)
+    entity_type = Column(String, nullable=False, index=True)  # 'pokemon' or 'trainer'
+    entity_id = Column(Integer, nullable=False)
+    rating = Column(Float, nullable=False)
+    deviation = Column(Float, nullable=False)  # Glicko rating deviation
+    games = Column(Integer, default=0)
+    last_updated = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class RatingResultModel(Base):
+    """
+    SQLAlchemy model for one rated result, kept so ratings can be recomputed
+    """
+    __tablename__ = "rating_results"
+
+    id = Column(Integer, primary_key=True, index=True)
+    period = Column(Integer, nullable=False, index=True)  # Results in a period are rated together
+    winner_pokemon_ids = Column(JSON, nullable=False)
+    loser_pokemon_ids = Column(JSON, nullable=False)
+    winner_trainer_id = Column(Integer, nullable=True)
+    loser_trainer_id = Column(Integer, nullable=True)
+    recorded_at = Column(DateTime, default=datetime.utcnow)
@@ -1,6 +1,7 @@
-from sqlalchemy import Column, Integer, String, DateTime, JSON, ForeignKey
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, Integer, String, DateTime, JSON, ForeignKey, Index
+from sqlalchemy.orm import relationship, foreign
 from app.database.database import Base
+from app.models.Base import User
 from datetime import datetime
 
 class StorageModel(Base):
@@ -17,8 +18,14 @@ class StorageModel(Base):
     created_at = Column(DateTime, default=datetime.utcnow)
     last_updated = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
-    # Relationship to backups
-    backups = relationship("BackupModel", back_populates="original_storage")
+    # Relationship to backups, read-only since backups are catalogued without
+    # requiring a storage entry
+    backups = relationship(
+        "BackupModel",
+        primaryjoin="StorageModel.storage_id == foreign(BackupModel.original_storage_id)",
+        back_populates="original_storage",
+        viewonly=True
+    )
     
     # Relationship to user
     user = relationship("User", back_populates="storage_entries")
@@ -28,15 +35,28 @@ class BackupModel(Base):
     SQLAlchemy model for storing backup entries
     """
     __tablename__ = "storage_backups"
+    # Latest and as-of lookups for a record are one index seek
+    __table_args__ = (
+        Index('ix_storage_backups_storage_time', 'backup_root', 'original_storage_id', 'backup_timestamp'),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     backup_id = Column(String, unique=True, nullable=False, index=True)
-    original_storage_id = Column(String, ForeignKey('storage_entries.storage_id'), nullable=False)
+    # Not a foreign key: records such as job checkpoints have no storage entry
+    original_storage_id = Column(String, nullable=False)
+    # Absolute path of the backup store holding the manifest
+    backup_root = Column(String, nullable=False)
     backup_timestamp = Column(DateTime, default=datetime.utcnow)
-    metadata = Column(JSON, nullable=True)  # Store additional backup metadata
+    # "metadata" is reserved on declarative models, so the attribute is renamed
+    backup_metadata = Column("metadata", JSON, nullable=True)  # Store additional backup metadata
     
     # Relationship back to original storage
-    original_storage = relationship("StorageModel", back_populates="backups")
+    original_storage = relationship(
+        "StorageModel",
+        primaryjoin="foreign(BackupModel.original_storage_id) == StorageModel.storage_id",
+        back_populates="backups",
+        viewonly=True
+    )
 
-# Update User model to include relationship (add to your existing User model)
-# User.storage_entries = relationship("StorageModel", back_populates="user")
\ No newline at end of file
+# Relationship from User, declared here so the users model stays independent
+User.storage_entries = relationship("StorageModel", back_populates="user")
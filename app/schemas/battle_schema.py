@@ -0,0 +1,11 @@
+from pydantic import BaseModel, Field
+from typing import List, Optional, Tuple
+
+class BattleBatchRequest(BaseModel):
+    """
+    Request model for simulating many battles in one call
+    """
+    pairs: List[Tuple[int, int]] = Field(..., min_length=1, description="(pokemon1_id, pokemon2_id) pairs")
+    seed: Optional[int] = Field(default=None, description="Base seed; each pair derives its own seed from it")
+    max_rounds: int = Field(default=20, ge=1, le=1000)
+    chunk_size: int = Field(default=500, ge=1, le=10_000)
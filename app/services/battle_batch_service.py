@@ -0,0 +1,150 @@
+import json
+import asyncio
+from typing import AsyncIterator, Callable, Dict, Iterable, List, Optional, Tuple
+from sqlalchemy.orm import Session
+from app.models.pokemon_team import Pokemon
+from app.services.battle_services import (
+    PokemonBattleService,
+    BattleCombatant,
+    CompactBattleOutcome,
+    derive_seed
+)
+from app.services.simulation_executor import SimulationExecutor
+
+BattleJob = Tuple[BattleCombatant, BattleCombatant, Optional[int]]
+OutcomeListener = Callable[[List[CompactBattleOutcome]], None]
+
+def run_battle_chunk_job(jobs: List[BattleJob], max_rounds: int) -> List[CompactBattleOutcome]:
+    return [
+        PokemonBattleService.simulate_compact_battle(combatant1, combatant2, max_rounds, seed)
+        for combatant1, combatant2, seed in jobs
+    ]
+
+class BattleBatchService:
+    @staticmethod
+    def load_combatants(db: Session, pokemon_ids: Iterable[int]) -> Dict[int, BattleCombatant]:
+        """
+        Fetch every referenced Pokemon in a single query and snapshot them
+
+        Args:
+            db: Database session
+            pokemon_ids: Ids referenced by the batch, duplicates allowed
+
+        Returns:
+            Combatant snapshots keyed by Pokemon id; missing ids are absent
+        """
+        unique_ids = set(pokemon_ids)
+        if not unique_ids:
+            return {}
+        pokemons = db.query(Pokemon).filter(Pokemon.id.in_(unique_ids)).all()
+        return {pokemon.id: BattleCombatant.from_pokemon(pokemon) for pokemon in pokemons}
+
+    @classmethod
+    def open_stream(
+        cls,
+        executor: SimulationExecutor,
+        combatants: Dict[int, BattleCombatant],
+        pairs: List[Tuple[int, int]],
+        seed: Optional[int] = None,
+        max_rounds: int = 20,
+        chunk_size: int = 500,
+        on_outcomes: Optional[OutcomeListener] = None
+    ) -> AsyncIterator[str]:
+        """
+        Start streaming a batch, checking capacity while an error status can
+        still be returned
+
+        Raises:
+            SimulationQueueFullError: If the executor is saturated
+        """
+        executor.check_capacity()
+        return cls.stream_results(executor, combatants, pairs, seed, max_rounds, chunk_size, on_outcomes)
+
+    @staticmethod
+    async def stream_results(
+        executor: SimulationExecutor,
+        combatants: Dict[int, BattleCombatant],
+        pairs: List[Tuple[int, int]],
+        seed: Optional[int] = None,
+        max_rounds: int = 20,
+        chunk_size: int = 500,
+        on_outcomes: Optional[OutcomeListener] = None
+    ) -> AsyncIterator[str]:
+        """
+        Simulate pairs in chunks on the executor and yield NDJSON lines in pair order
+        Keeps at most one chunk per worker in flight, so memory stays bounded.
+        A chunk that cannot be simulated, e.g. because the executor filled up
+        mid-stream, yields an error line per pair instead of ending the stream
+
+        Args:
+            executor: Process pool executor running the chunks
+            combatants: Snapshots from load_combatants
+            pairs: (pokemon1_id, pokemon2_id) pairs
+            seed: Base seed; pair i uses derive_seed(seed, i)
+            max_rounds: Round limit for every battle
+            chunk_size: Number of battles per executor job
+            on_outcomes: Called with each chunk's outcomes once they are ready
+        """
+        in_flight: "asyncio.Queue" = asyncio.Queue(maxsize=max(1, executor.max_workers))
+
+        async def produce():
+            for start in range(0, len(pairs), chunk_size):
+                chunk = pairs[start:start + chunk_size]
+                jobs = []
+                for offset, (pokemon1_id, pokemon2_id) in enumerate(chunk):
+                    if pokemon1_id in combatants and pokemon2_id in combatants:
+                        jobs.append((
+                            combatants[pokemon1_id],
+                            combatants[pokemon2_id],
+                            None if seed is None else derive_seed(seed, start + offset)
+                        ))
+                task = asyncio.ensure_future(
+                    executor.submit(run_battle_chunk_job, jobs, max_rounds)
+                ) if jobs else None
+                await in_flight.put((start, chunk, task))
+            await in_flight.put(None)
+
+        producer = asyncio.ensure_future(produce())
+        try:
+            while True:
+                item = await in_flight.get()
+                if item is None:
+                    break
+                start, chunk, task = item
+                chunk_error = None
+                try:
+                    chunk_outcomes = await task if task is not None else []
+                except Exception as e:
+                    chunk_error = str(e)
+                else:
+                    if on_outcomes is not None and chunk_outcomes:
+                        on_outcomes(chunk_outcomes)
+                outcomes = iter(chunk_outcomes) if chunk_error is None else iter(())
+
+                lines = []
+                for offset, (pokemon1_id, pokemon2_id) in enumerate(chunk):
+                    result = {"index": start + offset, "pokemon1_id": pokemon1_id, "pokemon2_id": pokemon2_id}
+                    if pokemon1_id not in combatants or pokemon2_id not in combatants:
+                        result["error"] = "Pokemon not found"
+                    elif chunk_error is not None:
+                        result["error"] = chunk_error
+                    else:
+                        outcome = next(outcomes)
+                        result.update({
+                            "winner_id": outcome.winner_id,
+                            "loser_id": outcome.loser_id,
+                            "rounds": outcome.rounds,
+                            "damage_dealt": list(outcome.damage_dealt),
+                            "seed": outcome.seed
+                        })
+                    lines.append(json.dumps(result))
+                yield "\n".join(lines) + "\n"
+            await producer
+        finally:
+            if not producer.done():
+                producer.cancel()
+            # The consumer left early; drop chunks nobody will read
+            while not in_flight.empty():
+                item = in_flight.get_nowait()
+                if item is not None and item[2] is not None:
+                    item[2].cancel()
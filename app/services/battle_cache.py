@@ -0,0 +1,169 @@
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional
+from app.services.battle_services import (
+    PokemonBattleService,
+    BattleCombatant,
+    CompactBattleOutcome
+)
+from app.services.battle_simulation_service import BattleProbabilities, ExactBattleSolver
+from app.services.simulation_executor import SimulationExecutor
+
+BATTLE_CACHE_MAX_ENTRIES = 100_000
+DISTRIBUTION_MODE = "distribution"
+
+class BattleResultCache:
+    """
+    Bounded LRU cache of battle results keyed on combatant stat fingerprints
+    Identical stat lines on different teams share entries, and a stat change
+    produces a new key, so entries never need invalidating on updates; results
+    for superseded stats simply age out
+    """
+    def __init__(self, max_entries: int = BATTLE_CACHE_MAX_ENTRIES):
+        """
+        Initialize the cache
+
+        :param max_entries: Maximum number of cached results before evicting
+        """
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(
+        combatant1: BattleCombatant,
+        combatant2: BattleCombatant,
+        max_rounds: int,
+        mode: Hashable
+    ) -> Hashable:
+        """
+        Build a cache key; mode is the battle seed or DISTRIBUTION_MODE
+        """
+        return (combatant1.fingerprint(), combatant2.fingerprint(), max_rounds, mode)
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """
+        Return the cached value for key, or None on a miss
+        """
+        with self._lock:
+            if key in self._entries:
+                self.hits += 1
+                self._entries.move_to_end(key)
+                return self._entries[key]
+            self.misses += 1
+            return None
+
+    def get_or_compute(self, key: Hashable, compute: Callable[[], Any]) -> Any:
+        """
+        Return the cached value for key, computing and storing it on a miss
+        """
+        value = self.get(key)
+        if value is None:
+            value = compute()
+            self.put(key, value)
+        return value
+
+    def put(self, key: Hashable, value: Any):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0
+            }
+
+battle_result_cache = BattleResultCache()
+
+class CachedBattleService:
+    """
+    PokemonBattleService and ExactBattleSolver behind the battle result cache
+    """
+    @staticmethod
+    def simulate_battle(
+        combatant1: BattleCombatant,
+        combatant2: BattleCombatant,
+        max_rounds: int = 20,
+        seed: Optional[int] = None,
+        cache: BattleResultCache = battle_result_cache
+    ) -> CompactBattleOutcome:
+        """
+        Seeded battles are cached; unseeded battles are always simulated
+        """
+        if seed is None:
+            return PokemonBattleService.simulate_compact_battle(combatant1, combatant2, max_rounds)
+
+        outcome = cache.get_or_compute(
+            cache.make_key(combatant1, combatant2, max_rounds, seed),
+            lambda: PokemonBattleService.simulate_compact_battle(
+                combatant1, combatant2, max_rounds, seed
+            )
+        )
+        return CachedBattleService.rebind(outcome, combatant1, combatant2)
+
+    @staticmethod
+    async def run_battle(
+        executor: SimulationExecutor,
+        combatant1: BattleCombatant,
+        combatant2: BattleCombatant,
+        max_rounds: int = 20,
+        seed: Optional[int] = None,
+        cache: BattleResultCache = battle_result_cache
+    ) -> CompactBattleOutcome:
+        """
+        simulate_battle for request handlers: cache misses run on the
+        simulation executor instead of the event loop
+
+        :raises SimulationQueueFullError: If the executor cannot accept the battle
+        """
+        if seed is None:
+            return await executor.run_battle(combatant1, combatant2, max_rounds)
+
+        key = cache.make_key(combatant1, combatant2, max_rounds, seed)
+        outcome = cache.get(key)
+        if outcome is None:
+            outcome = await executor.run_battle(combatant1, combatant2, max_rounds, seed)
+            cache.put(key, outcome)
+        return CachedBattleService.rebind(outcome, combatant1, combatant2)
+
+    @staticmethod
+    def battle_probabilities(
+        combatant1: BattleCombatant,
+        combatant2: BattleCombatant,
+        max_rounds: int = 20,
+        cache: BattleResultCache = battle_result_cache
+    ) -> BattleProbabilities:
+        return cache.get_or_compute(
+            cache.make_key(combatant1, combatant2, max_rounds, DISTRIBUTION_MODE),
+            lambda: ExactBattleSolver.solve(combatant1, combatant2, max_rounds)
+        )
+
+    @staticmethod
+    def rebind(
+        outcome: CompactBattleOutcome,
+        combatant1: BattleCombatant,
+        combatant2: BattleCombatant
+    ) -> CompactBattleOutcome:
+        """
+        Point a cached outcome at the requesting combatants' ids
+        The entry may have been computed for another Pokemon with the same stats
+        """
+        winner, loser = (combatant1, combatant2) if outcome.pokemon1_won else (combatant2, combatant1)
+        return outcome._replace(winner_id=winner.id, loser_id=loser.id)
@@ -0,0 +1,260 @@
+import struct
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+from app.services.battle_services import BattleCombatant, CompactBattleOutcome, DamageTable
+from app.services.team_battle_service import TeamStats, TeamBattleOutcome, TeamBattleService
+
+REPLAY_VERSION = 1
+# version, seed, pokemon1 id, pokemon2 id, max_rounds, rounds
+REPLAY_HEADER = struct.Struct('<BQqqHH')
+NO_COMBATANT_ID = -1
+TEAM_REPLAY_VERSION = 2
+# version, seed, max_turns, turns, team1 size, team2 size; member ids follow
+TEAM_REPLAY_HEADER = struct.Struct('<BQHHBB')
+
+class BattleReplay(NamedTuple):
+    """
+    Compact record of a battle: seed, combatant ids and per-turn crit bits
+    Encodes to a few dozen bytes and re-derives the full battle on demand
+    """
+    seed: int
+    pokemon1_id: Optional[int]
+    pokemon2_id: Optional[int]
+    max_rounds: int
+    rounds: int
+    critical_hits: int
+
+    @classmethod
+    def from_outcome(
+        cls,
+        outcome: CompactBattleOutcome,
+        combatant1: BattleCombatant,
+        combatant2: BattleCombatant,
+        max_rounds: int = 20
+    ) -> "BattleReplay":
+        return cls(
+            seed=outcome.seed,
+            pokemon1_id=combatant1.id,
+            pokemon2_id=combatant2.id,
+            max_rounds=max_rounds,
+            rounds=outcome.rounds,
+            critical_hits=outcome.critical_hits
+        )
+
+    def encode(self) -> bytes:
+        """
+        Serialize to the binary replay format
+        """
+        try:
+            header = REPLAY_HEADER.pack(
+                REPLAY_VERSION,
+                self.seed,
+                NO_COMBATANT_ID if self.pokemon1_id is None else self.pokemon1_id,
+                NO_COMBATANT_ID if self.pokemon2_id is None else self.pokemon2_id,
+                self.max_rounds,
+                self.rounds
+            )
+        except struct.error as e:
+            raise ValueError(f"Battle cannot be encoded as a replay: {e}")
+        return header + self.critical_hits.to_bytes(self._crit_bytes(self.rounds), 'little')
+
+    @classmethod
+    def decode(cls, data: bytes) -> "BattleReplay":
+        """
+        Parse a binary replay produced by encode
+        """
+        if len(data) < REPLAY_HEADER.size:
+            raise ValueError("Replay is truncated")
+
+        version, seed, pokemon1_id, pokemon2_id, max_rounds, rounds = REPLAY_HEADER.unpack_from(data)
+        if version != REPLAY_VERSION:
+            raise ValueError(f"Unsupported replay version {version}")
+
+        crit_data = data[REPLAY_HEADER.size:]
+        if len(crit_data) != cls._crit_bytes(rounds):
+            raise ValueError("Replay crit bits do not match the number of rounds")
+
+        return cls(
+            seed=seed,
+            pokemon1_id=None if pokemon1_id == NO_COMBATANT_ID else pokemon1_id,
+            pokemon2_id=None if pokemon2_id == NO_COMBATANT_ID else pokemon2_id,
+            max_rounds=max_rounds,
+            rounds=rounds,
+            critical_hits=int.from_bytes(crit_data, 'little')
+        )
+
+    def replay(
+        self,
+        combatant1: BattleCombatant,
+        combatant2: BattleCombatant
+    ) -> Dict[str, Any]:
+        """
+        Re-derive the full turn-by-turn battle from the stored crit bits
+
+        :param combatant1: Snapshot of the first Pokemon (matching pokemon1_id)
+        :param combatant2: Snapshot of the second Pokemon (matching pokemon2_id)
+        :return: Winner, loser, damage totals and every turn of the battle
+        """
+        if (combatant1.id, combatant2.id) != (self.pokemon1_id, self.pokemon2_id):
+            raise ValueError("Combatants do not match the replay")
+
+        p1_damage_table, p2_damage_table = DamageTable.for_matchup(combatant1, combatant2)
+        p1_hp = combatant1.hp
+        p2_hp = combatant2.hp
+        damage_dealt = {combatant1.name: 0, combatant2.name: 0}
+        turns: List[Dict[str, Any]] = []
+        pokemon1_won = None
+
+        for round_number in range(1, self.rounds + 1):
+            bits = self.critical_hits >> (2 * (round_number - 1))
+            p1_critical = bool(bits & 1)
+            p2_critical = bool(bits & 2)
+
+            p2_hp -= p1_damage_table[p1_critical]
+            damage_dealt[combatant1.name] += p1_damage_table[p1_critical]
+            turns.append({
+                "round": round_number,
+                "attacker": combatant1.name,
+                "critical": p1_critical,
+                "damage": p1_damage_table[p1_critical],
+                "defender_hp": p2_hp
+            })
+            if p2_hp <= 0:
+                pokemon1_won = True
+                break
+
+            p1_hp -= p2_damage_table[p2_critical]
+            damage_dealt[combatant2.name] += p2_damage_table[p2_critical]
+            turns.append({
+                "round": round_number,
+                "attacker": combatant2.name,
+                "critical": p2_critical,
+                "damage": p2_damage_table[p2_critical],
+                "defender_hp": p1_hp
+            })
+            if p1_hp <= 0:
+                pokemon1_won = False
+                break
+
+        # If max rounds reached, determine winner by remaining HP
+        if pokemon1_won is None:
+            pokemon1_won = p1_hp > p2_hp
+
+        winner, loser = (combatant1, combatant2) if pokemon1_won else (combatant2, combatant1)
+        return {
+            "seed": self.seed,
+            "winner": winner.name,
+            "loser": loser.name,
+            "rounds": self.rounds,
+            "damage_dealt": damage_dealt,
+            "turns": turns
+        }
+
+    @staticmethod
+    def _crit_bytes(rounds: int) -> int:
+        return (2 * rounds + 7) // 8
+
+class TeamBattleReplay(NamedTuple):
+    """
+    Compact record of a team battle: seed, member ids and per-turn crit bits
+    """
+    seed: int
+    team1_ids: Tuple[Optional[int], ...]
+    team2_ids: Tuple[Optional[int], ...]
+    max_turns: int
+    turns: int
+    critical_hits: int
+
+    @classmethod
+    def from_outcome(
+        cls,
+        outcome: TeamBattleOutcome,
+        team1: TeamStats,
+        team2: TeamStats,
+        max_turns: int
+    ) -> "TeamBattleReplay":
+        return cls(
+            seed=outcome.seed,
+            team1_ids=team1.ids,
+            team2_ids=team2.ids,
+            max_turns=max_turns,
+            turns=outcome.turns,
+            critical_hits=outcome.critical_hits
+        )
+
+    def encode(self) -> bytes:
+        """
+        Serialize to the binary team replay format
+        """
+        member_ids = [
+            NO_COMBATANT_ID if pokemon_id is None else pokemon_id
+            for pokemon_id in self.team1_ids + self.team2_ids
+        ]
+        try:
+            header = TEAM_REPLAY_HEADER.pack(
+                TEAM_REPLAY_VERSION,
+                self.seed,
+                self.max_turns,
+                self.turns,
+                len(self.team1_ids),
+                len(self.team2_ids)
+            ) + struct.pack(f'<{len(member_ids)}q', *member_ids)
+        except struct.error as e:
+            raise ValueError(f"Team battle cannot be encoded as a replay: {e}")
+        return header + self.critical_hits.to_bytes(BattleReplay._crit_bytes(self.turns), 'little')
+
+    @classmethod
+    def decode(cls, data: bytes) -> "TeamBattleReplay":
+        """
+        Parse a binary team replay produced by encode
+        """
+        if len(data) < TEAM_REPLAY_HEADER.size:
+            raise ValueError("Replay is truncated")
+
+        version, seed, max_turns, turns, size1, size2 = TEAM_REPLAY_HEADER.unpack_from(data)
+        if version != TEAM_REPLAY_VERSION:
+            raise ValueError(f"Unsupported team replay version {version}")
+
+        ids_format = struct.Struct(f'<{size1 + size2}q')
+        crit_data = data[TEAM_REPLAY_HEADER.size + ids_format.size:]
+        if len(crit_data) != BattleReplay._crit_bytes(turns):
+            raise ValueError("Replay crit bits do not match the number of turns")
+
+        member_ids = tuple(
+            None if pokemon_id == NO_COMBATANT_ID else pokemon_id
+            for pokemon_id in ids_format.unpack_from(data, TEAM_REPLAY_HEADER.size)
+        )
+        return cls(
+            seed=seed,
+            team1_ids=member_ids[:size1],
+            team2_ids=member_ids[size1:],
+            max_turns=max_turns,
+            turns=turns,
+            critical_hits=int.from_bytes(crit_data, 'little')
+        )
+
+    def replay(self, team1: TeamStats, team2: TeamStats) -> Dict[str, Any]:
+        """
+        Re-derive the full team battle by re-running it from the stored seed
+
+        :param team1: Stats of the first team (matching team1_ids)
+        :param team2: Stats of the second team (matching team2_ids)
+        :return: Winner, knockouts and every attack of the battle
+        """
+        if (team1.ids, team2.ids) != (self.team1_ids, self.team2_ids):
+            raise ValueError("Teams do not match the replay")
+
+        turn_log: List[Dict[str, Any]] = []
+        outcome = TeamBattleService.simulate_team_battle(
+            team1, team2, self.max_turns, self.seed, turn_log
+        )
+        if (outcome.turns, outcome.critical_hits) != (self.turns, self.critical_hits):
+            raise ValueError("Replay does not match the recorded battle")
+
+        return {
+            "seed": self.seed,
+            "team1_won": outcome.team1_won,
+            "turns": outcome.turns,
+            "knockouts": list(outcome.knockouts),
+            "remaining_hp": list(outcome.remaining_hp),
+            "attacks": turn_log
+        }
@@ -1,8 +1,29 @@
 import random
-from typing import List, Dict, Tuple
+import hashlib
+from typing import List, Dict, NamedTuple, Optional, Sequence, Tuple, Union
+import numpy as np
 from app.models.pokemon_team import Pokemon
 from pydantic import BaseModel
 
+CRITICAL_HIT_CHANCE = 0.0625  # 1/16 chance of critical hit
+CRITICAL_HIT_MULTIPLIER = 1.5
+DEFAULT_STAT = 10  # Column default for stats on the Pokemon model
+SEED_BITS = 63
+
+def new_seed() -> int:
+    """
+    Draw a fresh battle seed when the caller did not supply one
+    """
+    return random.getrandbits(SEED_BITS)
+
+def derive_seed(base_seed: int, *path: int) -> int:
+    """
+    Derive an independent, reproducible seed from a base seed and a path
+    (e.g. round number and match index), regardless of which worker runs it
+    """
+    digest = hashlib.blake2b(repr((base_seed,) + path).encode(), digest_size=8).digest()
+    return int.from_bytes(digest, 'little') >> (64 - SEED_BITS)
+
 class BattleOutcome(BaseModel):
     winner: Pokemon
     loser: Pokemon
@@ -14,96 +35,327 @@ class TypeEffectivenessMatrix:
     Defines type effectiveness for Pokemon battles
     Multipliers determine damage calculation
     """
+    TYPES = (
+        'Normal', 'Fire', 'Water', 'Electric', 'Grass', 'Ice',
+        'Fighting', 'Poison', 'Ground', 'Flying', 'Psychic', 'Bug',
+        'Rock', 'Ghost', 'Dragon', 'Dark', 'Steel', 'Fairy'
+    )
+    # Code used for unknown types and for a missing secondary type
+    NEUTRAL_TYPE = len(TYPES)
+    TYPE_CODES = {type_name: code for code, type_name in enumerate(TYPES)}
+
     EFFECTIVENESS = {
-        # Simplified type effectiveness matrix
-        'Fire': {'Grass': 2.0, 'Water': 0.5, 'Normal': 1.0},
-        'Water': {'Fire': 2.0, 'Grass': 0.5, 'Normal': 1.0},
-        'Grass': {'Water': 2.0, 'Fire': 0.5, 'Normal': 1.0},
-        'Normal': {'Fire': 1.0, 'Water': 1.0, 'Grass': 1.0}
+        # Only non-neutral matchups are listed, everything else is 1.0
+        'Normal': {'Rock': 0.5, 'Ghost': 0.0, 'Steel': 0.5},
+        'Fire': {'Fire': 0.5, 'Water': 0.5, 'Grass': 2.0, 'Ice': 2.0, 'Bug': 2.0,
+                 'Rock': 0.5, 'Dragon': 0.5, 'Steel': 2.0},
+        'Water': {'Fire': 2.0, 'Water': 0.5, 'Grass': 0.5, 'Ground': 2.0, 'Rock': 2.0,
+                  'Dragon': 0.5},
+        'Electric': {'Water': 2.0, 'Electric': 0.5, 'Grass': 0.5, 'Ground': 0.0,
+                     'Flying': 2.0, 'Dragon': 0.5},
+        'Grass': {'Fire': 0.5, 'Water': 2.0, 'Grass': 0.5, 'Poison': 0.5, 'Ground': 2.0,
+                  'Flying': 0.5, 'Bug': 0.5, 'Rock': 2.0, 'Dragon': 0.5, 'Steel': 0.5},
+        'Ice': {'Fire': 0.5, 'Water': 0.5, 'Grass': 2.0, 'Ice': 0.5, 'Ground': 2.0,
+                'Flying': 2.0, 'Dragon': 2.0, 'Steel': 0.5},
+        'Fighting': {'Normal': 2.0, 'Ice': 2.0, 'Poison': 0.5, 'Flying': 0.5,
+                     'Psychic': 0.5, 'Bug': 0.5, 'Rock': 2.0, 'Ghost': 0.0, 'Dark': 2.0,
+                     'Steel': 2.0, 'Fairy': 0.5},
+        'Poison': {'Grass': 2.0, 'Poison': 0.5, 'Ground': 0.5, 'Rock': 0.5, 'Ghost': 0.5,
+                   'Steel': 0.0, 'Fairy': 2.0},
+        'Ground': {'Fire': 2.0, 'Electric': 2.0, 'Grass': 0.5, 'Poison': 2.0,
+                   'Flying': 0.0, 'Bug': 0.5, 'Rock': 2.0, 'Steel': 2.0},
+        'Flying': {'Electric': 0.5, 'Grass': 2.0, 'Fighting': 2.0, 'Bug': 2.0,
+                   'Rock': 0.5, 'Steel': 0.5},
+        'Psychic': {'Fighting': 2.0, 'Poison': 2.0, 'Psychic': 0.5, 'Dark': 0.0,
+                    'Steel': 0.5},
+        'Bug': {'Fire': 0.5, 'Grass': 2.0, 'Fighting': 0.5, 'Poison': 0.5, 'Flying': 0.5,
+                'Psychic': 2.0, 'Ghost': 0.5, 'Dark': 2.0, 'Steel': 0.5, 'Fairy': 0.5},
+        'Rock': {'Fire': 2.0, 'Ice': 2.0, 'Fighting': 0.5, 'Ground': 0.5, 'Flying': 2.0,
+                 'Bug': 2.0, 'Steel': 0.5},
+        'Ghost': {'Normal': 0.0, 'Psychic': 2.0, 'Ghost': 2.0, 'Dark': 0.5},
+        'Dragon': {'Dragon': 2.0, 'Steel': 0.5, 'Fairy': 0.0},
+        'Dark': {'Fighting': 0.5, 'Psychic': 2.0, 'Ghost': 2.0, 'Dark': 0.5, 'Fairy': 0.5},
+        'Steel': {'Fire': 0.5, 'Water': 0.5, 'Electric': 0.5, 'Ice': 2.0, 'Rock': 2.0,
+                  'Steel': 0.5, 'Fairy': 2.0},
+        'Fairy': {'Fire': 0.5, 'Fighting': 2.0, 'Poison': 0.5, 'Dragon': 2.0, 'Dark': 2.0,
+                  'Steel': 0.5}
     }
 
+    # Dense (attacker, defender) chart, with an all-neutral row/column for NEUTRAL_TYPE
+    CHART = np.ones((len(TYPES) + 1, len(TYPES) + 1))
+    for _attacker, _row in EFFECTIVENESS.items():
+        for _defender, _multiplier in _row.items():
+            CHART[TYPE_CODES[_attacker], TYPE_CODES[_defender]] = _multiplier
+    del _attacker, _row, _defender, _multiplier
+
+    # (attacker, defender type_1, defender type_2) multipliers for dual types
+    DUAL_CHART = CHART[:, :, None] * CHART[:, None, :]
+    _codes = np.arange(len(TYPES) + 1)
+    DUAL_CHART[:, _codes, _codes] = CHART
+    del _codes
+
+    @classmethod
+    def type_code(cls, type_name: Optional[str]) -> int:
+        return cls.TYPE_CODES.get(type_name, cls.NEUTRAL_TYPE)
+
     @classmethod
     def get_type_multiplier(cls, attacker_type: str, defender_type: str) -> float:
-        return cls.EFFECTIVENESS.get(attacker_type, {}).get(defender_type, 1.0)
+        return float(cls.CHART[cls.type_code(attacker_type), cls.type_code(defender_type)])
+
+    @classmethod
+    def get_dual_type_multiplier(
+        cls,
+        attacker_type: str,
+        defender_type_1: str,
+        defender_type_2: Optional[str] = None
+    ) -> float:
+        return float(cls.DUAL_CHART[
+            cls.type_code(attacker_type),
+            cls.type_code(defender_type_1),
+            cls.type_code(defender_type_2)
+        ])
+
+class BattleCombatant:
+    """
+    Compact battle stat snapshot of a Pokemon
+    Built once per Pokemon so the battle hot path never touches ORM/pydantic objects
+    """
+    __slots__ = (
+        'id', 'name', 'hp', 'attack', 'defense',
+        'special_attack', 'special_defense', 'speed',
+        'type_1_code', 'type_2_code'
+    )
+
+    def __init__(
+        self,
+        id: Optional[int],
+        name: str,
+        hp: int,
+        attack: int,
+        defense: int,
+        type_1_code: int,
+        type_2_code: int = TypeEffectivenessMatrix.NEUTRAL_TYPE,
+        special_attack: int = DEFAULT_STAT,
+        special_defense: int = DEFAULT_STAT,
+        speed: int = DEFAULT_STAT
+    ):
+        self.id = id
+        self.name = name
+        self.hp = hp
+        self.attack = attack
+        self.defense = defense
+        self.special_attack = special_attack
+        self.special_defense = special_defense
+        self.speed = speed
+        self.type_1_code = type_1_code
+        self.type_2_code = type_2_code
+
+    @classmethod
+    def from_pokemon(cls, pokemon: Union[Pokemon, "BattleCombatant"]) -> "BattleCombatant":
+        """
+        Snapshot the fields the battle engine reads
+        Unset stats fall back to the model's column default
+        """
+        if isinstance(pokemon, cls):
+            return pokemon
+
+        def stat(value: Optional[int]) -> int:
+            return DEFAULT_STAT if value is None else value
+
+        return cls(
+            id=pokemon.id,
+            name=pokemon.name,
+            hp=stat(pokemon.hp),
+            attack=stat(pokemon.attack),
+            defense=stat(pokemon.defense),
+            type_1_code=TypeEffectivenessMatrix.type_code(pokemon.type_1),
+            type_2_code=TypeEffectivenessMatrix.type_code(getattr(pokemon, 'type_2', None)),
+            special_attack=stat(getattr(pokemon, 'special_attack', None)),
+            special_defense=stat(getattr(pokemon, 'special_defense', None)),
+            speed=stat(getattr(pokemon, 'speed', None))
+        )
+
+    def fingerprint(self) -> Tuple[int, int, int, int, int]:
+        """
+        Identify the combatant by the fields the one-on-one engine reads
+        """
+        return (self.hp, self.attack, self.defense, self.type_1_code, self.type_2_code)
+
+class CompactBattleOutcome(NamedTuple):
+    """
+    Battle result that refers to combatants by id instead of embedding them
+    damage_dealt is ordered (pokemon1, pokemon2); critical_hits packs the
+    per-round crit rolls, bit 2*(round-1) for pokemon1 and the next bit for pokemon2
+    """
+    winner_id: Optional[int]
+    loser_id: Optional[int]
+    pokemon1_won: bool
+    rounds: int
+    damage_dealt: Tuple[int, int]
+    seed: int
+    critical_hits: int
+
+class DamageTable(NamedTuple):
+    """
+    Per-matchup damage, built once per battle
+    Each side is indexed by the critical hit roll: (normal, critical)
+    """
+    p1_damage: Tuple[int, int]
+    p2_damage: Tuple[int, int]
+
+    @classmethod
+    def for_matchup(
+        cls,
+        pokemon1: Union[Pokemon, BattleCombatant],
+        pokemon2: Union[Pokemon, BattleCombatant]
+    ) -> "DamageTable":
+        pokemon1 = BattleCombatant.from_pokemon(pokemon1)
+        pokemon2 = BattleCombatant.from_pokemon(pokemon2)
+        return cls(
+            p1_damage=(
+                PokemonBattleService.calculate_damage(pokemon1, pokemon2, False),
+                PokemonBattleService.calculate_damage(pokemon1, pokemon2, True)
+            ),
+            p2_damage=(
+                PokemonBattleService.calculate_damage(pokemon2, pokemon1, False),
+                PokemonBattleService.calculate_damage(pokemon2, pokemon1, True)
+            )
+        )
 
 class PokemonBattleService:
     @staticmethod
     def calculate_damage(
-        attacker: Pokemon, 
-        defender: Pokemon, 
+        attacker: Union[Pokemon, BattleCombatant], 
+        defender: Union[Pokemon, BattleCombatant], 
         is_critical_hit: bool = False
     ) -> int:
         """
         Calculate damage based on attacker and defender stats
         Incorporates type effectiveness and potential critical hits
         """
+        attacker = BattleCombatant.from_pokemon(attacker)
+        defender = BattleCombatant.from_pokemon(defender)
+
         base_damage = attacker.attack - (defender.defense / 2)
-        type_multiplier = TypeEffectivenessMatrix.get_type_multiplier(
-            attacker.type_1, defender.type_1
-        )
+        type_multiplier = float(TypeEffectivenessMatrix.DUAL_CHART[
+            attacker.type_1_code, defender.type_1_code, defender.type_2_code
+        ])
         
-        critical_multiplier = 1.5 if is_critical_hit else 1.0
+        critical_multiplier = CRITICAL_HIT_MULTIPLIER if is_critical_hit else 1.0
         
         damage = max(1, int(base_damage * type_multiplier * critical_multiplier))
         return damage
 
+    @staticmethod
+    def calculate_pair_damage(
+        attackers: Sequence[BattleCombatant],
+        defenders: Sequence[BattleCombatant]
+    ) -> np.ndarray:
+        """
+        Vectorized calculate_damage for attackers[i] hitting defenders[i]
+        Returns an int array of shape (len(attackers), 2): (normal, critical)
+        """
+        attack = np.array([combatant.attack for combatant in attackers], dtype=float)
+        defense = np.array([combatant.defense for combatant in defenders], dtype=float)
+        type_multiplier = TypeEffectivenessMatrix.DUAL_CHART[
+            np.array([combatant.type_1_code for combatant in attackers], dtype=np.intp),
+            np.array([combatant.type_1_code for combatant in defenders], dtype=np.intp),
+            np.array([combatant.type_2_code for combatant in defenders], dtype=np.intp)
+        ]
+        scaled = ((attack - defense / 2) * type_multiplier)[:, None]
+        critical_multiplier = np.array([1.0, CRITICAL_HIT_MULTIPLIER])
+        return np.maximum(1, np.trunc(scaled * critical_multiplier)).astype(np.int64)
+
     @staticmethod
     def simulate_battle(
         pokemon1: Pokemon, 
         pokemon2: Pokemon, 
-        max_rounds: int = 20
+        max_rounds: int = 20,
+        seed: Optional[int] = None
     ) -> BattleOutcome:
         """
         Simulate a battle between two Pokemon
         Uses probabilistic damage calculation and turn-based mechanics
         """
-        p1_hp = pokemon1.hp
-        p2_hp = pokemon2.hp
-        
+        outcome = PokemonBattleService.simulate_compact_battle(
+            BattleCombatant.from_pokemon(pokemon1),
+            BattleCombatant.from_pokemon(pokemon2),
+            max_rounds,
+            seed
+        )
+
         damage_dealt = {
             pokemon1.name: 0,
             pokemon2.name: 0
         }
+        damage_dealt[pokemon1.name] += outcome.damage_dealt[0]
+        damage_dealt[pokemon2.name] += outcome.damage_dealt[1]
+
+        return BattleOutcome(
+            winner=pokemon1 if outcome.pokemon1_won else pokemon2,
+            loser=pokemon2 if outcome.pokemon1_won else pokemon1,
+            rounds=outcome.rounds,
+            damage_dealt=damage_dealt
+        )
+
+    @staticmethod
+    def simulate_compact_battle(
+        combatant1: BattleCombatant,
+        combatant2: BattleCombatant,
+        max_rounds: int = 20,
+        seed: Optional[int] = None
+    ) -> CompactBattleOutcome:
+        """
+        Battle hot path on combatant snapshots
+        Allocates nothing per turn and returns an id-based outcome;
+        the same seed always reproduces the same battle
+        """
+        if seed is None:
+            seed = new_seed()
+        rng = random.Random(seed)
+
+        p1_hp = combatant1.hp
+        p2_hp = combatant2.hp
+        p1_damage_table, p2_damage_table = DamageTable.for_matchup(combatant1, combatant2)
+        p1_dealt = 0
+        p2_dealt = 0
+        critical_hits = 0
         
         for round in range(1, max_rounds + 1):
             # Randomize critical hit chance
-            p1_critical = random.random() < 0.0625  # 1/16 chance of critical hit
-            p2_critical = random.random() < 0.0625
+            p1_critical = rng.random() < CRITICAL_HIT_CHANCE
+            p2_critical = rng.random() < CRITICAL_HIT_CHANCE
+            critical_hits |= (p1_critical | (p2_critical << 1)) << (2 * (round - 1))
             
             # Pokemon 1's turn
-            p1_damage = PokemonBattleService.calculate_damage(
-                pokemon1, pokemon2, p1_critical
-            )
+            p1_damage = p1_damage_table[p1_critical]
             p2_hp -= p1_damage
-            damage_dealt[pokemon1.name] += p1_damage
+            p1_dealt += p1_damage
             
             if p2_hp <= 0:
-                return BattleOutcome(
-                    winner=pokemon1, 
-                    loser=pokemon2, 
-                    rounds=round, 
-                    damage_dealt=damage_dealt
+                return CompactBattleOutcome(
+                    combatant1.id, combatant2.id, True, round,
+                    (p1_dealt, p2_dealt), seed, critical_hits
                 )
             
             # Pokemon 2's turn
-            p2_damage = PokemonBattleService.calculate_damage(
-                pokemon2, pokemon1, p2_critical
-            )
+            p2_damage = p2_damage_table[p2_critical]
             p1_hp -= p2_damage
-            damage_dealt[pokemon2.name] += p2_damage
+            p2_dealt += p2_damage
             
             if p1_hp <= 0:
-                return BattleOutcome(
-                    winner=pokemon2, 
-                    loser=pokemon1, 
-                    rounds=round, 
-                    damage_dealt=damage_dealt
+                return CompactBattleOutcome(
+                    combatant2.id, combatant1.id, False, round,
+                    (p1_dealt, p2_dealt), seed, critical_hits
                 )
         
         # If max rounds reached, determine winner by remaining HP
-        return BattleOutcome(
-            winner=pokemon1 if p1_hp > p2_hp else pokemon2,
-            loser=pokemon2 if p1_hp > p2_hp else pokemon1,
-            rounds=max_rounds,
-            damage_dealt=damage_dealt
-        )
\ No newline at end of file
+        if p1_hp > p2_hp:
+            return CompactBattleOutcome(
+                combatant1.id, combatant2.id, True, max_rounds,
+                (p1_dealt, p2_dealt), seed, critical_hits
+            )
+        return CompactBattleOutcome(
+            combatant2.id, combatant1.id, False, max_rounds,
+            (p1_dealt, p2_dealt), seed, critical_hits
+        )
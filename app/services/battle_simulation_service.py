@@ -0,0 +1,276 @@
+from collections import defaultdict
+from functools import lru_cache
+from typing import Dict, Optional, Sequence, Tuple, Union
+import numpy as np
+from pydantic import BaseModel
+from app.models.pokemon_team import Pokemon
+from app.services.battle_services import (
+    PokemonBattleService,
+    BattleCombatant,
+    DamageTable,
+    CRITICAL_HIT_CHANCE
+)
+
+class BattleSimulationSummary(BaseModel):
+    """
+    Aggregated results of many simulated battles for a single matchup
+    """
+    samples: int
+    win_rate: float  # Fraction of battles won by the first Pokemon
+    timeout_rate: float  # Fraction of battles decided by the max_rounds tie-break
+    rounds_distribution: Dict[int, float]
+    mean_damage: Dict[str, float]
+
+class BattleProbabilities(BaseModel):
+    """
+    Exact outcome distribution of a single matchup
+    """
+    win_probability: float  # First Pokemon wins, by knockout or tie-break
+    loss_probability: float
+    timeout_probability: float  # Share of outcomes decided by the max_rounds tie-break
+    expected_rounds: float
+
+class MonteCarloBattleService:
+    @staticmethod
+    def simulate_battles(
+        pokemon1: Union[Pokemon, BattleCombatant],
+        pokemon2: Union[Pokemon, BattleCombatant],
+        samples: int = 10_000,
+        max_rounds: int = 20,
+        seed: Optional[int] = None
+    ) -> BattleSimulationSummary:
+        """
+        Simulate many battles of the same matchup at once
+        Mirrors PokemonBattleService.simulate_battle, but draws every critical
+        hit roll as one (samples, max_rounds) matrix and tracks HP as vectors
+        """
+        if samples < 1:
+            raise ValueError("samples must be at least 1")
+        if max_rounds < 1:
+            raise ValueError("max_rounds must be at least 1")
+
+        rng = np.random.default_rng(seed)
+        pokemon1 = BattleCombatant.from_pokemon(pokemon1)
+        pokemon2 = BattleCombatant.from_pokemon(pokemon2)
+
+        # Damage is deterministic apart from the critical hit roll
+        damage_table = DamageTable.for_matchup(pokemon1, pokemon2)
+        p1_damage = np.array(damage_table.p1_damage)
+        p2_damage = np.array(damage_table.p2_damage)
+
+        # Same draw order as simulate_battle: p1 then p2 each round
+        critical_rolls = rng.random((samples, max_rounds, 2)) < CRITICAL_HIT_CHANCE
+        p1_dealt = np.cumsum(p1_damage[critical_rolls[:, :, 0].astype(np.intp)], axis=1)
+        p2_dealt = np.cumsum(p2_damage[critical_rolls[:, :, 1].astype(np.intp)], axis=1)
+
+        # First round (1-based) in which each side lands the knockout,
+        # max_rounds + 1 if it never does
+        p1_knockout = MonteCarloBattleService._first_round_reaching(p1_dealt, pokemon2.hp)
+        p2_knockout = MonteCarloBattleService._first_round_reaching(p2_dealt, pokemon1.hp)
+
+        # Pokemon 1 moves first, so a knockout in the same round goes to it
+        p1_wins_by_knockout = p1_knockout <= p2_knockout
+        timed_out = np.minimum(p1_knockout, p2_knockout) > max_rounds
+        rounds = np.minimum(np.minimum(p1_knockout, p2_knockout), max_rounds)
+
+        # If max rounds reached, determine winner by remaining HP
+        final_p1_hp = pokemon1.hp - p2_dealt[:, -1]
+        final_p2_hp = pokemon2.hp - p1_dealt[:, -1]
+        p1_wins = np.where(timed_out, final_p1_hp > final_p2_hp, p1_wins_by_knockout)
+
+        # Pokemon 2 does not get its turn in the round it is knocked out
+        round_index = rounds - 1
+        rows = np.arange(samples)
+        total_p1_dealt = p1_dealt[rows, round_index]
+        total_p2_dealt = np.where(
+            p1_wins & ~timed_out,
+            np.where(round_index > 0, p2_dealt[rows, round_index - 1], 0),
+            p2_dealt[rows, round_index]
+        )
+
+        round_counts = np.bincount(rounds, minlength=max_rounds + 1)
+        rounds_distribution = {
+            round_number: float(count) / samples
+            for round_number, count in enumerate(round_counts)
+            if count
+        }
+
+        mean_damage = {pokemon1.name: float(total_p1_dealt.mean())}
+        mean_damage[pokemon2.name] = float(total_p2_dealt.mean())
+
+        return BattleSimulationSummary(
+            samples=samples,
+            win_rate=float(p1_wins.mean()),
+            timeout_rate=float(timed_out.mean()),
+            rounds_distribution=rounds_distribution,
+            mean_damage=mean_damage
+        )
+
+    @staticmethod
+    def _first_round_reaching(cumulative_damage: np.ndarray, hp: int) -> np.ndarray:
+        """
+        Return the 1-based round where cumulative damage first reaches hp
+        """
+        reached = cumulative_damage >= hp
+        return np.where(
+            reached.any(axis=1),
+            reached.argmax(axis=1) + 1,
+            cumulative_damage.shape[1] + 1
+        )
+
+@lru_cache(maxsize=4096)
+def _solve_matchup(
+    p1_hp: int,
+    p2_hp: int,
+    p1_damage: Tuple[int, int],
+    p2_damage: Tuple[int, int],
+    max_rounds: int
+) -> Tuple[float, float, float, float]:
+    """
+    Propagate the (p1_hp, p2_hp) distribution round by round
+    Damage tuples are (normal, critical); returns win, loss, timeout, rounds
+    """
+    p1_rolls = ((p1_damage[0], 1 - CRITICAL_HIT_CHANCE), (p1_damage[1], CRITICAL_HIT_CHANCE))
+    p2_rolls = ((p2_damage[0], 1 - CRITICAL_HIT_CHANCE), (p2_damage[1], CRITICAL_HIT_CHANCE))
+
+    states = {(p1_hp, p2_hp): 1.0}
+    win = loss = timeout = expected_rounds = 0.0
+
+    for round_number in range(1, max_rounds + 1):
+        next_states = defaultdict(float)
+        for (hp1, hp2), probability in states.items():
+            for p1_hit, p1_chance in p1_rolls:
+                branch = probability * p1_chance
+                if hp2 - p1_hit <= 0:
+                    win += branch
+                    expected_rounds += branch * round_number
+                    continue
+                for p2_hit, p2_chance in p2_rolls:
+                    leaf = branch * p2_chance
+                    if hp1 - p2_hit <= 0:
+                        loss += leaf
+                        expected_rounds += leaf * round_number
+                    else:
+                        next_states[(hp1 - p2_hit, hp2 - p1_hit)] += leaf
+        states = next_states
+        if not states:
+            break
+
+    # If max rounds reached, determine winner by remaining HP
+    for (hp1, hp2), probability in states.items():
+        timeout += probability
+        expected_rounds += probability * max_rounds
+        if hp1 > hp2:
+            win += probability
+        else:
+            loss += probability
+
+    return win, loss, timeout, expected_rounds
+
+class ExactBattleSolver:
+    @staticmethod
+    def solve(
+        pokemon1: Union[Pokemon, BattleCombatant],
+        pokemon2: Union[Pokemon, BattleCombatant],
+        max_rounds: int = 20
+    ) -> BattleProbabilities:
+        """
+        Compute the exact outcome distribution of simulate_battle
+        The critical hit roll is the only randomness, so a dynamic program over
+        (round, p1_hp, p2_hp) replaces sampling; results are memoized per matchup
+        """
+        pokemon1 = BattleCombatant.from_pokemon(pokemon1)
+        pokemon2 = BattleCombatant.from_pokemon(pokemon2)
+        damage_table = DamageTable.for_matchup(pokemon1, pokemon2)
+        win, loss, timeout, expected_rounds = _solve_matchup(
+            pokemon1.hp,
+            pokemon2.hp,
+            damage_table.p1_damage,
+            damage_table.p2_damage,
+            max_rounds
+        )
+        return BattleProbabilities(
+            win_probability=win,
+            loss_probability=loss,
+            timeout_probability=timeout,
+            expected_rounds=expected_rounds
+        )
+
+    @staticmethod
+    def win_probabilities(
+        first: Sequence[BattleCombatant],
+        second: Sequence[BattleCombatant],
+        max_rounds: int = 20
+    ) -> np.ndarray:
+        """
+        Exact win probability of first[i] against second[i] for many pairs at once
+        Same model as solve, but the dynamic program runs over
+        (pair, p1 crit count, p2 crit count) arrays instead of per-pair dicts
+        """
+        pairs = len(first)
+        if pairs != len(second):
+            raise ValueError("first and second must have the same length")
+        if pairs == 0:
+            return np.zeros(0)
+
+        p1_damage = PokemonBattleService.calculate_pair_damage(first, second)
+        p2_damage = PokemonBattleService.calculate_pair_damage(second, first)
+        p1_hp = np.array([combatant.hp for combatant in first])[:, None]
+        p2_hp = np.array([combatant.hp for combatant in second])[:, None]
+
+        # Damage after a given number of attacks depends only on how many crits landed
+        crit_counts = np.arange(max_rounds + 1)
+        p1_crit_bonus = (p1_damage[:, 1] - p1_damage[:, 0])[:, None] * crit_counts
+        p2_crit_bonus = (p2_damage[:, 1] - p2_damage[:, 0])[:, None] * crit_counts
+
+        # states[pair, p1 crits, p2 crits] = probability both are still standing;
+        # after r rounds at most r crits per side, so only [:r + 1, :r + 1] is live
+        states = np.zeros((pairs, max_rounds + 1, max_rounds + 1))
+        states[:, 0, 0] = 1.0
+        win = np.zeros(pairs)
+        active = np.arange(pairs)
+
+        for round_number in range(1, max_rounds + 1):
+            live = round_number + 1
+            window = states[:, :live, :live]
+
+            # Pokemon 1's turn: split on the crit roll, then remove knockouts
+            window[:, 1:, :] = (
+                window[:, 1:, :] * (1 - CRITICAL_HIT_CHANCE)
+                + window[:, :-1, :] * CRITICAL_HIT_CHANCE
+            )
+            window[:, 0, :] *= 1 - CRITICAL_HIT_CHANCE
+            p1_dealt = round_number * p1_damage[active, :1] + p1_crit_bonus[active, :live]
+            knocked_out = p1_dealt >= p2_hp[active]
+            win[active] += (window.sum(axis=2) * knocked_out).sum(axis=1)
+            window *= ~knocked_out[:, :, None]
+
+            # Pokemon 2's turn
+            window[:, :, 1:] = (
+                window[:, :, 1:] * (1 - CRITICAL_HIT_CHANCE)
+                + window[:, :, :-1] * CRITICAL_HIT_CHANCE
+            )
+            window[:, :, 0] *= 1 - CRITICAL_HIT_CHANCE
+            p2_dealt = round_number * p2_damage[active, :1] + p2_crit_bonus[active, :live]
+            window *= ~(p2_dealt >= p1_hp[active])[:, None, :]
+
+            # Drop finished pairs so later rounds only touch live battles
+            still_running = window.reshape(len(active), -1).any(axis=1)
+            if not still_running.all():
+                active = active[still_running]
+                states = states[still_running]
+                if not len(active):
+                    return win
+
+        # If max rounds reached, determine winner by remaining HP
+        final_p1_hp = (p1_hp[active] - (max_rounds * p2_damage[active, :1] + p2_crit_bonus[active]))[:, None, :]
+        final_p2_hp = (p2_hp[active] - (max_rounds * p1_damage[active, :1] + p1_crit_bonus[active]))[:, :, None]
+        win[active] += (states * (final_p1_hp > final_p2_hp)).sum(axis=(1, 2))
+        return win
+
+    @staticmethod
+    def cache_info():
+        """
+        Expose hit/miss statistics of the memoized solver
+        """
+        return _solve_matchup.cache_info()
@@ -0,0 +1,98 @@
+from array import array
+from typing import Iterator, NamedTuple, Optional
+
+# Stage labels, stored as their index in BRACKET_STAGES
+WINNERS_STAGE = "winners"
+LOSERS_STAGE = "losers"
+GRAND_FINAL_STAGE = "grand_final"
+ROUND_ROBIN_STAGE = "round_robin"
+SWISS_STAGE = "swiss"
+BRACKET_STAGES = (WINNERS_STAGE, LOSERS_STAGE, GRAND_FINAL_STAGE, ROUND_ROBIN_STAGE, SWISS_STAGE)
+STAGE_CODES = {stage: code for code, stage in enumerate(BRACKET_STAGES)}
+
+# Result codes
+RESULT_TEAM1_WON = 1
+RESULT_TEAM2_WON = 2
+
+class MatchRecord(NamedTuple):
+    """
+    Compact result of one match. Participants are indexes into
+    bracket.participants and the battle seed is derive_seed(bracket.seed,
+    round_number, match_index), so any match can be replayed on demand
+    """
+    round_number: int
+    match_index: int
+    participant1: int
+    participant2: int
+    winner: int
+    stage: str
+    replay: Optional[bytes] = None  # Encoded TeamBattleReplay, if kept
+
+    @property
+    def loser(self) -> int:
+        return self.participant2 if self.winner == self.participant1 else self.participant1
+
+class BracketStore:
+    """
+    Column store of tournament matches
+    Each match is a row of a few integers; replays, when kept, are appended to
+    one shared byte buffer, so a match costs about 26 bytes without its replay
+    """
+    __slots__ = (
+        'round_numbers', 'match_indexes', 'participant1', 'participant2',
+        'results', 'stages', 'replay_data', 'replay_offsets'
+    )
+
+    def __init__(self):
+        self.round_numbers = array('I')
+        self.match_indexes = array('I')
+        self.participant1 = array('i')
+        self.participant2 = array('i')
+        self.results = array('B')
+        self.stages = array('B')
+        self.replay_data = bytearray()
+        # replay i spans replay_data[replay_offsets[i]:replay_offsets[i + 1]];
+        # an empty span means no replay was kept
+        self.replay_offsets = array('Q', [0])
+
+    def __len__(self) -> int:
+        return len(self.results)
+
+    def append(self, record: MatchRecord):
+        self.round_numbers.append(record.round_number)
+        self.match_indexes.append(record.match_index)
+        self.participant1.append(record.participant1)
+        self.participant2.append(record.participant2)
+        self.results.append(RESULT_TEAM1_WON if record.winner == record.participant1 else RESULT_TEAM2_WON)
+        self.stages.append(STAGE_CODES[record.stage])
+        if record.replay:
+            self.replay_data += record.replay
+        self.replay_offsets.append(len(self.replay_data))
+
+    def row(self, index: int) -> MatchRecord:
+        participant1 = self.participant1[index]
+        participant2 = self.participant2[index]
+        replay = bytes(self.replay_data[self.replay_offsets[index]:self.replay_offsets[index + 1]])
+        return MatchRecord(
+            round_number=self.round_numbers[index],
+            match_index=self.match_indexes[index],
+            participant1=participant1,
+            participant2=participant2,
+            winner=participant1 if self.results[index] == RESULT_TEAM1_WON else participant2,
+            stage=BRACKET_STAGES[self.stages[index]],
+            replay=replay or None
+        )
+
+    def __iter__(self) -> Iterator[MatchRecord]:
+        for index in range(len(self)):
+            yield self.row(index)
+
+    def nbytes(self) -> int:
+        """
+        Approximate memory held by the match rows and replays
+        """
+        columns = (
+            self.round_numbers, self.match_indexes, self.participant1,
+            self.participant2, self.results, self.stages, self.replay_offsets
+        )
+        return sum(column.itemsize * len(column) for column in columns) + len(self.replay_data)
@@ -0,0 +1,329 @@
+import math
+import random
+import threading
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+from app.models.Base import User
+from app.services.rating_service import rating_service, RatingService
+
+SKIPLIST_MAX_LEVELS = 32
+WINS_BOARD = "wins"
+RATING_BOARD = "rating"
+LEADERBOARDS = (WINS_BOARD, RATING_BOARD)
+# Largest page of entries, and widest neighbourhood, one request may ask for
+LEADERBOARD_MAX_ENTRIES = 1000
+LEADERBOARD_MAX_RADIUS = 100
+# Session.info key for User changes waiting for their transaction to commit
+_PENDING_USER_CHANGES = "leaderboard_user_changes"
+
+# Entries are (-score, user_id): best score first, ties broken by user id
+LeaderboardKey = Tuple[float, int]
+
+class _SkipNode:
+    __slots__ = ('value', 'next', 'width')
+
+    def __init__(self, value: Any, levels: int, width: int = 0):
+        self.value = value
+        self.next: List["_SkipNode"] = [None] * levels
+        self.width: List[int] = [width] * levels
+
+# Sorts after every key, so searches stop at the end of each level
+_END = _SkipNode((math.inf, math.inf), 0)
+
+class IndexableSkipList:
+    """
+    Sorted list with O(log n) insert, remove, rank and positional lookup
+    Each link records how many bottom-level nodes it skips over, so positions
+    are found by summing link widths on the way down
+    """
+    def __init__(self):
+        self.size = 0
+        self._levels = 1  # Levels of the head currently linked to nodes
+        self._head = _SkipNode(None, SKIPLIST_MAX_LEVELS, width=1)
+        self._head.next = [_END] * SKIPLIST_MAX_LEVELS
+        self._random = random.Random()
+
+    def __len__(self) -> int:
+        return self.size
+
+    @classmethod
+    def from_sorted(cls, values: Iterable[LeaderboardKey]) -> "IndexableSkipList":
+        """
+        Build a list from values already in ascending order in O(n)
+        """
+        skiplist = cls()
+        last = [skiplist._head] * SKIPLIST_MAX_LEVELS
+        last_position = [0] * SKIPLIST_MAX_LEVELS
+        position = 0
+        for value in values:
+            position += 1
+            levels = skiplist._random_levels()
+            node = _SkipNode(value, levels)
+            for level in range(levels):
+                last[level].next[level] = node
+                last[level].width[level] = position - last_position[level]
+                last[level] = node
+                last_position[level] = position
+            skiplist._levels = max(skiplist._levels, levels)
+
+        for level in range(skiplist._levels):
+            last[level].next[level] = _END
+            last[level].width[level] = position + 1 - last_position[level]
+        skiplist.size = position
+        return skiplist
+
+    def _random_levels(self) -> int:
+        # Geometric level: each extra level with probability 1/2
+        return min(SKIPLIST_MAX_LEVELS, 1 - int(math.log(1.0 - self._random.random(), 2.0)))
+
+    def insert(self, value: LeaderboardKey):
+        levels = self._random_levels()
+        for level in range(self._levels, levels):
+            self._head.width[level] = self.size + 1
+        self._levels = max(self._levels, levels)
+
+        chain = [self._head] * self._levels
+        steps_at_level = [0] * self._levels
+        node = self._head
+        for level in reversed(range(self._levels)):
+            while node.next[level].value <= value:
+                steps_at_level[level] += node.width[level]
+                node = node.next[level]
+            chain[level] = node
+
+        new_node = _SkipNode(value, levels)
+        steps = 0
+        for level in range(levels):
+            previous = chain[level]
+            new_node.next[level] = previous.next[level]
+            previous.next[level] = new_node
+            new_node.width[level] = previous.width[level] - steps
+            previous.width[level] = steps + 1
+            steps += steps_at_level[level]
+        for level in range(levels, self._levels):
+            chain[level].width[level] += 1
+        self.size += 1
+
+    def remove(self, value: LeaderboardKey):
+        chain = [self._head] * self._levels
+        node = self._head
+        for level in reversed(range(self._levels)):
+            while node.next[level].value < value:
+                node = node.next[level]
+            chain[level] = node
+
+        target = chain[0].next[0]
+        if target is _END or target.value != value:
+            raise KeyError(value)
+        for level in range(len(target.next)):
+            previous = chain[level]
+            previous.width[level] += target.width[level] - 1
+            previous.next[level] = target.next[level]
+        for level in range(len(target.next), self._levels):
+            chain[level].width[level] -= 1
+        self.size -= 1
+
+    def rank(self, value: LeaderboardKey) -> Optional[int]:
+        """
+        Zero-based position of value, or None if it is not in the list
+        """
+        position = 0
+        node = self._head
+        for level in reversed(range(self._levels)):
+            while node.next[level].value < value:
+                position += node.width[level]
+                node = node.next[level]
+        if node.next[0].value != value:
+            return None
+        return position
+
+    def iterate_from(self, position: int) -> Iterator[LeaderboardKey]:
+        """
+        Yield values in order starting at a zero-based position
+        """
+        if position >= self.size:
+            return
+        node = self._head
+        remaining = position + 1
+        for level in reversed(range(self._levels)):
+            while node.width[level] <= remaining and node.next[level] is not _END:
+                remaining -= node.width[level]
+                node = node.next[level]
+        while node is not _END:
+            yield node.value
+            node = node.next[0]
+
+class Leaderboard:
+    """
+    Scores of every trainer on one board, ranked best first
+    """
+    def __init__(self, scores: Optional[Dict[int, float]] = None):
+        self._scores: Dict[int, float] = dict(scores or {})
+        self._entries = IndexableSkipList.from_sorted(
+            sorted((-score, user_id) for user_id, score in self._scores.items())
+        )
+
+    def __len__(self) -> int:
+        return len(self._scores)
+
+    def update(self, user_id: int, score: float):
+        previous = self._scores.get(user_id)
+        if previous == score:
+            return
+        if previous is not None:
+            self._entries.remove((-previous, user_id))
+        self._entries.insert((-score, user_id))
+        self._scores[user_id] = score
+
+    def add(self, user_id: int, delta: float):
+        self.update(user_id, self._scores.get(user_id, 0) + delta)
+
+    def discard(self, user_id: int):
+        previous = self._scores.pop(user_id, None)
+        if previous is not None:
+            self._entries.remove((-previous, user_id))
+
+    def rank(self, user_id: int) -> Optional[int]:
+        """
+        One-based rank of a trainer, or None if they are not on the board
+        """
+        score = self._scores.get(user_id)
+        if score is None:
+            return None
+        return self._entries.rank((-score, user_id)) + 1
+
+    def entries(self, start: int, count: int) -> List[Tuple[int, int, float]]:
+        """
+        (rank, user_id, score) for count entries from a zero-based position
+        """
+        result = []
+        for offset, (negative_score, user_id) in enumerate(self._entries.iterate_from(start)):
+            if offset == count:
+                break
+            result.append((start + offset + 1, user_id, -negative_score))
+        return result
+
+class LeaderboardService:
+    """
+    In-memory leaderboards over trainer wins and trainer ratings
+    Rebuilt from the database at startup and kept current from rating flushes
+    and User inserts and updates
+    """
+    def __init__(self):
+        self.boards = {board: Leaderboard() for board in LEADERBOARDS}
+        self._usernames: Dict[int, str] = {}
+        self._lock = threading.Lock()
+
+    def rebuild(self, db: Session, ratings: RatingService = rating_service):
+        """
+        Reload both boards; sorting dominates, O(n log n) in the number of trainers
+        """
+        wins = {}
+        usernames = {}
+        for user_id, username, total_wins in db.query(User.id, User.username, User.total_wins).yield_per(10_000):
+            wins[user_id] = total_wins or 0
+            usernames[user_id] = username
+
+        trainers = ratings.trainers
+        rated = dict(zip(trainers.ids, trainers.ratings[:len(trainers)].tolist()))
+
+        with self._lock:
+            self.boards = {WINS_BOARD: Leaderboard(wins), RATING_BOARD: Leaderboard(rated)}
+            self._usernames = usernames
+
+    def apply_rating_updates(self, trainer_ratings: Dict[int, float], trainer_counters: Dict[int, Tuple[int, int]]):
+        """
+        RatingService listener: apply a committed flush or recompute
+        """
+        with self._lock:
+            for user_id, rating in trainer_ratings.items():
+                self.boards[RATING_BOARD].update(user_id, rating)
+            for user_id, (wins, _) in trainer_counters.items():
+                self.boards[WINS_BOARD].add(user_id, wins)
+
+    def set_wins(self, user_id: int, total_wins: int, username: Optional[str] = None):
+        with self._lock:
+            self.boards[WINS_BOARD].update(user_id, total_wins)
+            if username is not None:
+                self._usernames[user_id] = username
+
+    def set_username(self, user_id: int, username: str):
+        with self._lock:
+            self._usernames[user_id] = username
+
+    def top(self, board: str, k: int = 10) -> List[Dict[str, Any]]:
+        with self._lock:
+            return self._describe(self._board(board).entries(0, k))
+
+    def trainer(self, board: str, user_id: int) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            leaderboard = self._board(board)
+            rank = leaderboard.rank(user_id)
+            if rank is None:
+                return None
+            return self._describe(leaderboard.entries(rank - 1, 1))[0]
+
+    def around(self, board: str, user_id: int, radius: int = 5) -> List[Dict[str, Any]]:
+        """
+        Entries within radius places of a trainer, the trainer included
+        """
+        with self._lock:
+            leaderboard = self._board(board)
+            rank = leaderboard.rank(user_id)
+            if rank is None:
+                return []
+            start = max(0, rank - 1 - radius)
+            return self._describe(leaderboard.entries(start, rank - start + radius))
+
+    def _board(self, board: str) -> Leaderboard:
+        if board not in self.boards:
+            raise ValueError(f"Unknown leaderboard {board}")
+        return self.boards[board]
+
+    def _describe(self, entries: List[Tuple[int, int, float]]) -> List[Dict[str, Any]]:
+        return [
+            {"rank": rank, "user_id": user_id, "username": self._usernames.get(user_id), "score": score}
+            for rank, user_id, score in entries
+        ]
+
+leaderboard_service = LeaderboardService()
+rating_service.add_listener(leaderboard_service.apply_rating_updates)
+
+@event.listens_for(Session, "after_flush")
+def _collect_user_changes(session, flush_context):
+    """
+    Note User rows whose wins or name this flush wrote
+    Only attributes with changes in this flush count, so a User loaded before
+    a rating flush, whose total_wins is stale because the counter UPDATE does
+    not refresh loaded objects, cannot push that stale count onto the board
+    when another column of it is saved
+    """
+    changes = None
+    for target in session.new.union(session.dirty):
+        if not isinstance(target, User):
+            continue
+        state = inspect(target)
+        wins_changed = target in session.new or state.attrs.total_wins.history.has_changes()
+        if not wins_changed and not state.attrs.username.history.has_changes():
+            continue
+        if changes is None:
+            changes = session.info.setdefault(_PENDING_USER_CHANGES, {})
+        previous_wins = changes.get(target.id, (None, None))[0]
+        changes[target.id] = ((target.total_wins or 0) if wins_changed else previous_wins, target.username)
+
+@event.listens_for(Session, "after_commit")
+def _apply_user_changes(session):
+    """
+    Keep the wins board in step with committed ORM writes to the users table
+    Bulk counter updates from rating flushes arrive through the rating listener
+    """
+    for user_id, (total_wins, username) in session.info.pop(_PENDING_USER_CHANGES, {}).items():
+        if total_wins is None:
+            leaderboard_service.set_username(user_id, username)
+        else:
+            leaderboard_service.set_wins(user_id, total_wins, username)
+
+@event.listens_for(Session, "after_rollback")
+def _discard_user_changes(session):
+    session.info.pop(_PENDING_USER_CHANGES, None)
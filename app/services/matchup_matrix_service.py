@@ -0,0 +1,156 @@
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+import numpy as np
+from sqlalchemy.orm import Session
+from app.models.pokemon_team import Pokemon, PokemonTeam
+from app.services.battle_services import BattleCombatant
+from app.services.battle_simulation_service import ExactBattleSolver
+
+MATCHUP_CACHE_MAX_TRAINERS = 1024
+MATCHUP_MATRIX_MIN_CAPACITY = 16
+
+class TrainerMatchupMatrix:
+    """
+    Expected-win matrix for every Pokemon a trainer owns
+    win_probability[i, j] is the chance that pokemon_ids[i] beats pokemon_ids[j]
+    when it moves first
+    """
+    def __init__(self, max_rounds: int = 20):
+        self.max_rounds = max_rounds
+        self.pokemon_ids: List[int] = []
+        self.combatants: List[BattleCombatant] = []
+        # Grows geometrically; only the top-left len(pokemon_ids) square is live
+        self._probabilities = np.zeros((0, 0))
+        self._index: Dict[int, int] = {}
+
+    @property
+    def win_probability(self) -> np.ndarray:
+        size = len(self.pokemon_ids)
+        return self._probabilities[:size, :size]
+
+    def sync(self, combatants: List[BattleCombatant]) -> int:
+        """
+        Reconcile the matrix with the trainer's current Pokemon
+        Only rows and columns of added or changed Pokemon are recomputed
+
+        :return: Number of Pokemon whose row and column were recomputed
+        """
+        current = {combatant.id: combatant for combatant in combatants}
+
+        removed = [pokemon_id for pokemon_id in self.pokemon_ids if pokemon_id not in current]
+        if removed:
+            self._remove(removed)
+
+        dirty = []
+        for pokemon_id, combatant in current.items():
+            index = self._index.get(pokemon_id)
+            if index is None:
+                dirty.append(self._append(combatant))
+            elif self.combatants[index].fingerprint() != combatant.fingerprint():
+                self.combatants[index] = combatant
+                dirty.append(index)
+            else:
+                # Keep names fresh without touching the matrix
+                self.combatants[index] = combatant
+
+        if dirty:
+            self._recompute(dirty)
+        return len(dirty)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "pokemon_ids": list(self.pokemon_ids),
+            "names": [combatant.name for combatant in self.combatants],
+            "win_probability": self.win_probability.tolist()
+        }
+
+    def _append(self, combatant: BattleCombatant) -> int:
+        index = len(self.pokemon_ids)
+        self.pokemon_ids.append(combatant.id)
+        self.combatants.append(combatant)
+        self._index[combatant.id] = index
+        capacity = len(self._probabilities)
+        if index == capacity:
+            grown = np.zeros((max(2 * capacity, MATCHUP_MATRIX_MIN_CAPACITY),) * 2)
+            grown[:capacity, :capacity] = self._probabilities
+            self._probabilities = grown
+        else:
+            # The slot may hold a removed Pokemon's results
+            self._probabilities[index, :] = 0.0
+            self._probabilities[:, index] = 0.0
+        return index
+
+    def _remove(self, pokemon_ids: List[int]):
+        drop = {self._index[pokemon_id] for pokemon_id in pokemon_ids}
+        keep = [index for index in range(len(self.pokemon_ids)) if index not in drop]
+        self._probabilities[:len(keep), :len(keep)] = self.win_probability[np.ix_(keep, keep)]
+        self.pokemon_ids = [self.pokemon_ids[index] for index in keep]
+        self.combatants = [self.combatants[index] for index in keep]
+        self._index = {pokemon_id: index for index, pokemon_id in enumerate(self.pokemon_ids)}
+
+    def _recompute(self, dirty: List[int]):
+        """
+        Recompute the rows and columns of the dirty indices in one vectorized solve
+        """
+        size = len(self.combatants)
+        cells = set()
+        for index in dirty:
+            cells.update((index, other) for other in range(size))
+            cells.update((other, index) for other in range(size))
+        rows, cols = (np.array(axis, dtype=np.intp) for axis in zip(*sorted(cells)))
+
+        self.win_probability[rows, cols] = ExactBattleSolver.win_probabilities(
+            [self.combatants[row] for row in rows],
+            [self.combatants[col] for col in cols],
+            self.max_rounds
+        )
+
+class MatchupMatrixService:
+    """
+    Per-trainer cache of matchup matrices with incremental updates
+    """
+    def __init__(self, max_trainers: int = MATCHUP_CACHE_MAX_TRAINERS):
+        self.max_trainers = max_trainers
+        self._matrices: "OrderedDict[int, TrainerMatchupMatrix]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def load_trainer_combatants(db: Session, trainer_id: int) -> List[BattleCombatant]:
+        """
+        Snapshot every Pokemon across all of the trainer's teams in one query
+        """
+        pokemons = (
+            db.query(Pokemon)
+            .join(PokemonTeam, Pokemon.team_id == PokemonTeam.id)
+            .filter(PokemonTeam.trainer_id == trainer_id)
+            .order_by(Pokemon.id)
+            .all()
+        )
+        return [BattleCombatant.from_pokemon(pokemon) for pokemon in pokemons]
+
+    def get_matrix(self, db: Session, trainer_id: int) -> Dict[str, Any]:
+        """
+        Return a snapshot of the trainer's matrix, recomputing only what changed
+        since the last call
+        """
+        combatants = self.load_trainer_combatants(db, trainer_id)
+        with self._lock:
+            matrix = self._matrices.get(trainer_id)
+            if matrix is None:
+                matrix = TrainerMatchupMatrix()
+                self._matrices[trainer_id] = matrix
+                while len(self._matrices) > self.max_trainers:
+                    self._matrices.popitem(last=False)
+            self._matrices.move_to_end(trainer_id)
+            matrix.sync(combatants)
+            return matrix.snapshot()
+
+    def invalidate(self, trainer_id: Optional[int] = None):
+        with self._lock:
+            if trainer_id is None:
+                self._matrices.clear()
+            else:
+                self._matrices.pop(trainer_id, None)
+
+matchup_matrix_service = MatchupMatrixService()
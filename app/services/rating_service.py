@@ -0,0 +1,543 @@
+import math
+import time
+import asyncio
+import logging
+import threading
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+import numpy as np
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from app.database.database import SessionLocal
+from app.models.Base import User
+from app.models.pokemon_team import Pokemon, PokemonTeam
+from app.models.rating_models import RatingModel, RatingResultModel
+from app.services.tournament_service import TournamentBracket
+from app.services.bracket_store import MatchRecord
+
+# Glicko parameters; deviation grows by RATING_DEVIATION_DRIFT before each
+# period an entity plays in
+RATING_INITIAL = 1500.0
+RATING_DEVIATION_INITIAL = 350.0
+RATING_DEVIATION_MIN = 30.0
+RATING_DEVIATION_DRIFT = 20.0
+GLICKO_Q = math.log(10) / 400
+# Pending results are flushed once there are this many, or this long after the last flush
+RATING_BATCH_SIZE = 10_000
+RATING_FLUSH_SECONDS = 5.0
+# Every rating is rebuilt from the stored results this often
+RATING_RECOMPUTE_SECONDS = 24 * 60 * 60.0
+# Stay under SQLite's bound parameter limit in IN (...) queries
+RATING_QUERY_CHUNK = 500
+
+logger = logging.getLogger(__name__)
+
+POKEMON_ENTITY = "pokemon"
+TRAINER_ENTITY = "trainer"
+
+# Winner and loser Pokemon ids of one result; a 1v1 battle has one id per side
+RatingResult = Tuple[Tuple[int, ...], Tuple[int, ...]]
+# Called after a commit with the new ratings of the changed trainers and the
+# (wins, losses) each trainer gained
+RatingListener = Callable[[Dict[int, float], Dict[int, Tuple[int, int]]], None]
+
+class RatingTable:
+    """
+    Glicko ratings for one kind of entity, stored in growable numpy arrays
+    """
+    def __init__(self):
+        self.ratings = np.empty(0)
+        self.deviations = np.empty(0)
+        self.games = np.empty(0, dtype=np.int64)
+        self.ids: List[int] = []
+        self._index: Dict[int, int] = {}
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def indices(self, entity_ids: Iterable[int]) -> np.ndarray:
+        """
+        Slots of the given ids, adding unseen ids at the initial rating
+        """
+        slots = []
+        for entity_id in entity_ids:
+            slot = self._index.get(entity_id)
+            if slot is None:
+                slot = len(self.ids)
+                self._index[entity_id] = slot
+                self.ids.append(entity_id)
+            slots.append(slot)
+
+        if len(self.ids) > len(self.ratings):
+            capacity = max(len(self.ids), 2 * len(self.ratings), 64)
+            added = capacity - len(self.ratings)
+            self.ratings = np.concatenate([self.ratings, np.full(added, RATING_INITIAL)])
+            self.deviations = np.concatenate([self.deviations, np.full(added, RATING_DEVIATION_INITIAL)])
+            self.games = np.concatenate([self.games, np.zeros(added, dtype=np.int64)])
+        return np.array(slots, dtype=np.intp)
+
+    def set(self, entity_id: int, rating: float, deviation: float, games: int):
+        slot = self.indices([entity_id])[0]
+        self.ratings[slot] = rating
+        self.deviations[slot] = deviation
+        self.games[slot] = games
+
+    def get(self, entity_id: int) -> Optional[Tuple[float, float, int]]:
+        slot = self._index.get(entity_id)
+        if slot is None:
+            return None
+        return float(self.ratings[slot]), float(self.deviations[slot]), int(self.games[slot])
+
+    def snapshot(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        return self.ratings.copy(), self.deviations.copy(), self.games.copy()
+
+    def restore(self, saved: Tuple[np.ndarray, np.ndarray, np.ndarray]):
+        """
+        Roll back to a snapshot; ids added since keep their initial rating
+        """
+        ratings, deviations, games = saved
+        self.ratings[:] = RATING_INITIAL
+        self.deviations[:] = RATING_DEVIATION_INITIAL
+        self.games[:] = 0
+        self.ratings[:len(ratings)] = ratings
+        self.deviations[:len(deviations)] = deviations
+        self.games[:len(games)] = games
+
+    def apply(self, winners: np.ndarray, losers: np.ndarray, weights: np.ndarray, players: np.ndarray):
+        """
+        Rate one Glicko period in a single vectorized update
+        Every result is scored against the ratings at the start of the period
+
+        :param winners: Winner slot of each pairing
+        :param losers: Loser slot of each pairing
+        :param weights: Share of a full game each pairing counts for
+        :param players: Slot of every entity that played, once per result
+        """
+        played = np.unique(players)
+        self.deviations[played] = np.minimum(
+            np.sqrt(self.deviations[played] ** 2 + RATING_DEVIATION_DRIFT ** 2),
+            RATING_DEVIATION_INITIAL
+        )
+        np.add.at(self.games, players, 1)
+        if not len(winners):
+            return
+
+        impact = 1.0 / np.sqrt(1.0 + 3.0 * GLICKO_Q ** 2 * self.deviations ** 2 / math.pi ** 2)
+        gap = self.ratings[winners] - self.ratings[losers]
+        winner_expected = 1.0 / (1.0 + 10.0 ** (-impact[losers] * gap / 400))
+        loser_expected = 1.0 / (1.0 + 10.0 ** (impact[winners] * gap / 400))
+
+        information = np.zeros(len(self.ratings))
+        surprise = np.zeros(len(self.ratings))
+        np.add.at(information, winners, weights * impact[losers] ** 2 * winner_expected * (1 - winner_expected))
+        np.add.at(information, losers, weights * impact[winners] ** 2 * loser_expected * (1 - loser_expected))
+        np.add.at(surprise, winners, weights * impact[losers] * (1 - winner_expected))
+        np.add.at(surprise, losers, -weights * impact[winners] * loser_expected)
+
+        rated = played[information[played] > 0]
+        precision = 1.0 / self.deviations[rated] ** 2 + GLICKO_Q ** 2 * information[rated]
+        self.ratings[rated] += GLICKO_Q / precision * surprise[rated]
+        self.deviations[rated] = np.maximum(np.sqrt(1.0 / precision), RATING_DEVIATION_MIN)
+
+    def reset(self):
+        self.__init__()
+
+class RatingService:
+    """
+    Incremental Glicko ratings for Pokemon and trainers
+    Results are buffered and every flush is one rating period: its results are
+    rated together in one vectorized update and written, with the new ratings
+    and the trainers' win/loss counters, in one transaction. The stored
+    results replay through the same update, period by period, for a full
+    recompute.
+
+    A team result rates every winning member against every losing member,
+    with each pairing weighted so a team match counts as one game for each
+    Pokemon
+    """
+    def __init__(self):
+        self.pokemon = RatingTable()
+        self.trainers = RatingTable()
+        self._pending: List[RatingResult] = []
+        self._period = 0
+        self._last_flush = time.monotonic()
+        self._listeners: List[RatingListener] = []
+        # Guards the tables and flushes; queueing only takes _pending_lock, so
+        # recording never waits on a flush's database work
+        self._lock = threading.Lock()
+        self._pending_lock = threading.Lock()
+
+    def add_listener(self, listener: RatingListener):
+        self._listeners.append(listener)
+
+    def load(self, db: Session):
+        """
+        Load stored ratings into memory; call once at startup
+        """
+        with self._lock:
+            self.pokemon.reset()
+            self.trainers.reset()
+            for row in db.query(RatingModel).yield_per(10_000):
+                table = self.pokemon if row.entity_type == POKEMON_ENTITY else self.trainers
+                table.set(row.entity_id, row.rating, row.deviation, row.games or 0)
+            self._period = db.query(func.max(RatingResultModel.period)).scalar() or 0
+
+    def record_battle(self, winner_id: Optional[int], loser_id: Optional[int]):
+        """
+        Queue a 1v1 result, e.g. from a BattleOutcome or CompactBattleOutcome
+        """
+        self.record_result((winner_id,), (loser_id,))
+
+    def record_tournament(self, tournament_bracket: TournamentBracket):
+        """
+        Queue every match of a completed bracket, straight from its compact store
+        """
+        self.record_tournament_records(tournament_bracket, tournament_bracket.store)
+
+    def record_tournament_records(self, tournament_bracket: TournamentBracket, records: Iterable[MatchRecord]):
+        """
+        Queue matches of a bracket as they are decided, e.g. from a stream
+        """
+        participants = tournament_bracket.participants
+        results = [
+            (
+                tuple(pokemon.id for pokemon in participants[record.winner].team),
+                tuple(pokemon.id for pokemon in participants[record.loser].team)
+            )
+            for record in records
+        ]
+        with self._pending_lock:
+            self._pending.extend(
+                result for result in results if self._is_rated(result)
+            )
+
+    def record_result(self, winner_ids: Sequence[Optional[int]], loser_ids: Sequence[Optional[int]]):
+        result = (tuple(winner_ids), tuple(loser_ids))
+        if self._is_rated(result):
+            with self._pending_lock:
+                self._pending.append(result)
+
+    def flush_due(self) -> bool:
+        """
+        Whether the batch is full or the flush interval has passed
+        """
+        return len(self._pending) >= RATING_BATCH_SIZE or time.monotonic() - self._last_flush >= RATING_FLUSH_SECONDS
+
+    def flush_if_due(self, db: Session) -> int:
+        """
+        Flush when the batch is full or the flush interval has passed
+        """
+        if self.flush_due():
+            return self.flush(db)
+        return 0
+
+    def flush_if_due_in_session(self, session_factory: Callable[[], Session] = SessionLocal) -> int:
+        """
+        flush_if_due in a session of its own, for worker threads and background tasks
+        """
+        if not self.flush_due():
+            return 0
+        db = session_factory()
+        try:
+            return self.flush(db)
+        finally:
+            db.close()
+
+    async def flush_if_due_async(self, session_factory: Callable[[], Session] = SessionLocal) -> int:
+        """
+        flush_if_due for async handlers: the database work runs on a worker
+        thread instead of the event loop
+        """
+        if not self.flush_due():
+            return 0
+        return await asyncio.get_running_loop().run_in_executor(
+            None, self.flush_if_due_in_session, session_factory
+        )
+
+    def flush(self, db: Session) -> int:
+        """
+        Rate pending results as one period and persist them in one transaction
+        In-memory ratings are only updated once the transaction commits
+
+        :return: Number of results flushed
+        """
+        with self._lock:
+            with self._pending_lock:
+                pending, self._pending = self._pending, []
+                self._last_flush = time.monotonic()
+            if not pending:
+                return 0
+
+            trainer_by_pokemon = self._load_trainers(
+                db, {pokemon_id for winners, losers in pending for pokemon_id in (winners[0], losers[0])}
+            )
+            trainer_results = [
+                (trainer_by_pokemon.get(winners[0]), trainer_by_pokemon.get(losers[0]))
+                for winners, losers in pending
+            ]
+            period = self._period + 1
+
+            pokemon_ratings = self.pokemon.snapshot()
+            trainer_ratings = self.trainers.snapshot()
+            try:
+                touched_pokemon, touched_trainers = self._rate_period(pending, trainer_results)
+
+                db.bulk_insert_mappings(RatingResultModel, [
+                    {
+                        "period": period,
+                        "winner_pokemon_ids": list(winners),
+                        "loser_pokemon_ids": list(losers),
+                        "winner_trainer_id": winner_trainer,
+                        "loser_trainer_id": loser_trainer
+                    }
+                    for (winners, losers), (winner_trainer, loser_trainer) in zip(pending, trainer_results)
+                ])
+                self._save_ratings(db, POKEMON_ENTITY, self.pokemon, touched_pokemon)
+                self._save_ratings(db, TRAINER_ENTITY, self.trainers, touched_trainers)
+                counters = self._trainer_counters(trainer_results)
+                self._update_trainer_counters(db, counters)
+                db.commit()
+            except Exception:
+                db.rollback()
+                # Put the ratings and the results back so nothing is lost
+                self.pokemon.restore(pokemon_ratings)
+                self.trainers.restore(trainer_ratings)
+                with self._pending_lock:
+                    self._pending = pending + self._pending
+                raise
+
+            self._period = period
+            self._notify(touched_trainers, counters)
+            return len(pending)
+
+    def recompute(self, db: Session) -> int:
+        """
+        Rebuild every rating from the stored results, one vectorized update
+        per period, and overwrite the stored ratings
+
+        :return: Number of results replayed
+        """
+        with self._lock:
+            self.pokemon.reset()
+            self.trainers.reset()
+            replayed = 0
+            period_results: List[RatingResult] = []
+            period_trainers: List[Tuple[Optional[int], Optional[int]]] = []
+            current_period = None
+
+            rows = (
+                db.query(RatingResultModel)
+                .order_by(RatingResultModel.period, RatingResultModel.id)
+                .yield_per(10_000)
+            )
+            for row in rows:
+                if row.period != current_period and period_results:
+                    self._rate_period(period_results, period_trainers)
+                    replayed += len(period_results)
+                    period_results, period_trainers = [], []
+                current_period = row.period
+                period_results.append((tuple(row.winner_pokemon_ids), tuple(row.loser_pokemon_ids)))
+                period_trainers.append((row.winner_trainer_id, row.loser_trainer_id))
+            if period_results:
+                self._rate_period(period_results, period_trainers)
+                replayed += len(period_results)
+
+            try:
+                db.query(RatingModel).delete()
+                self._save_ratings(db, POKEMON_ENTITY, self.pokemon, np.arange(len(self.pokemon)), existing=False)
+                self._save_ratings(db, TRAINER_ENTITY, self.trainers, np.arange(len(self.trainers)), existing=False)
+                db.commit()
+            except Exception:
+                db.rollback()
+                raise
+            self._notify(np.arange(len(self.trainers)), {})
+            return replayed
+
+    def recompute_in_session(self, session_factory: Callable[[], Session] = SessionLocal) -> int:
+        """
+        Flush pending results, then recompute, in a session of its own
+        """
+        db = session_factory()
+        try:
+            self.flush(db)
+            return self.recompute(db)
+        finally:
+            db.close()
+
+    async def recompute_periodically(
+        self,
+        interval: float = RATING_RECOMPUTE_SECONDS,
+        session_factory: Callable[[], Session] = SessionLocal
+    ):
+        """
+        Run the full recompute every interval seconds on a worker thread;
+        start once at startup and cancel at shutdown
+        """
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                replayed = await loop.run_in_executor(None, self.recompute_in_session, session_factory)
+                logger.info("Recomputed ratings from %d results", replayed)
+            except Exception:
+                # A failed recompute leaves the incremental ratings in place
+                logger.exception("Rating recompute failed")
+
+    def get_rating(self, entity_type: str, entity_id: int) -> Optional[Dict[str, float]]:
+        """
+        Current rating, rating deviation and games played of an entity
+        """
+        table = self.pokemon if entity_type == POKEMON_ENTITY else self.trainers
+        with self._lock:
+            entry = table.get(entity_id)
+        if entry is None:
+            return None
+        return {"rating": entry[0], "deviation": entry[1], "games": entry[2]}
+
+    def _rate_period(
+        self,
+        results: List[RatingResult],
+        trainer_results: List[Tuple[Optional[int], Optional[int]]]
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Apply one period to both tables
+
+        :return: Pokemon and trainer slots that changed
+        """
+        winner_ids: List[int] = []
+        loser_ids: List[int] = []
+        weights: List[float] = []
+        players: List[int] = []
+        for winners, losers in results:
+            winners = [pokemon_id for pokemon_id in winners if pokemon_id is not None]
+            losers = [pokemon_id for pokemon_id in losers if pokemon_id is not None]
+            players.extend(winners)
+            players.extend(losers)
+            if not winners or not losers:
+                continue
+            weight = 1.0 / (len(winners) * len(losers))
+            for winner in winners:
+                winner_ids.extend([winner] * len(losers))
+                loser_ids.extend(losers)
+            weights.extend([weight] * (len(winners) * len(losers)))
+
+        pokemon_winners = self.pokemon.indices(winner_ids)
+        pokemon_losers = self.pokemon.indices(loser_ids)
+        pokemon_players = self.pokemon.indices(players)
+        self.pokemon.apply(pokemon_winners, pokemon_losers, np.array(weights), pokemon_players)
+
+        # Results between two teams of the same trainer do not move trainer ratings
+        rated = [
+            (winner, loser) for winner, loser in trainer_results
+            if winner is not None and loser is not None and winner != loser
+        ]
+        trainer_winners = self.trainers.indices(winner for winner, _ in rated)
+        trainer_losers = self.trainers.indices(loser for _, loser in rated)
+        self.trainers.apply(
+            trainer_winners,
+            trainer_losers,
+            np.ones(len(rated)),
+            np.concatenate([trainer_winners, trainer_losers])
+        )
+        return np.unique(pokemon_players), np.unique(np.concatenate([trainer_winners, trainer_losers]))
+
+    @staticmethod
+    def _is_rated(result: RatingResult) -> bool:
+        winners, losers = result
+        return bool(winners) and bool(losers) and winners[0] is not None and losers[0] is not None
+
+    @staticmethod
+    def _load_trainers(db: Session, pokemon_ids: Iterable[int]) -> Dict[int, int]:
+        """
+        Map Pokemon ids to their trainer ids in chunked queries
+        """
+        pokemon_ids = list(pokemon_ids)
+        trainer_by_pokemon: Dict[int, int] = {}
+        for start in range(0, len(pokemon_ids), RATING_QUERY_CHUNK):
+            rows = (
+                db.query(Pokemon.id, PokemonTeam.trainer_id)
+                .join(PokemonTeam, Pokemon.team_id == PokemonTeam.id)
+                .filter(Pokemon.id.in_(pokemon_ids[start:start + RATING_QUERY_CHUNK]))
+                .all()
+            )
+            trainer_by_pokemon.update((pokemon_id, trainer_id) for pokemon_id, trainer_id in rows)
+        return trainer_by_pokemon
+
+    @staticmethod
+    def _save_ratings(
+        db: Session,
+        entity_type: str,
+        table: RatingTable,
+        slots: np.ndarray,
+        existing: bool = True
+    ):
+        """
+        Upsert the ratings of the given slots
+        """
+        values = {
+            table.ids[slot]: (float(table.ratings[slot]), float(table.deviations[slot]), int(table.games[slot]))
+            for slot in slots.tolist()
+        }
+        entity_ids = list(values)
+        if existing:
+            for start in range(0, len(entity_ids), RATING_QUERY_CHUNK):
+                rows = (
+                    db.query(RatingModel)
+                    .filter(
+                        RatingModel.entity_type == entity_type,
+                        RatingModel.entity_id.in_(entity_ids[start:start + RATING_QUERY_CHUNK])
+                    )
+                    .all()
+                )
+                for row in rows:
+                    row.rating, row.deviation, row.games = values.pop(row.entity_id)
+
+        db.bulk_insert_mappings(RatingModel, [
+            {
+                "entity_type": entity_type,
+                "entity_id": entity_id,
+                "rating": rating,
+                "deviation": deviation,
+                "games": games
+            }
+            for entity_id, (rating, deviation, games) in values.items()
+        ])
+
+    @staticmethod
+    def _trainer_counters(
+        trainer_results: List[Tuple[Optional[int], Optional[int]]]
+    ) -> Dict[int, Tuple[int, int]]:
+        """
+        Wins and losses gained by each trainer in a batch
+        """
+        counters: Dict[int, List[int]] = {}
+        for winner, loser in trainer_results:
+            if winner is None or loser is None or winner == loser:
+                continue
+            counters.setdefault(winner, [0, 0])[0] += 1
+            counters.setdefault(loser, [0, 0])[1] += 1
+        return {trainer_id: (wins, losses) for trainer_id, (wins, losses) in counters.items()}
+
+    @staticmethod
+    def _update_trainer_counters(db: Session, counters: Dict[int, Tuple[int, int]]):
+        """
+        Add the batch's wins and losses to the users table, one UPDATE per trainer
+        """
+        for trainer_id, (wins, losses) in counters.items():
+            db.query(User).filter(User.id == trainer_id).update(
+                {
+                    User.total_battles: func.coalesce(User.total_battles, 0) + wins + losses,
+                    User.total_wins: func.coalesce(User.total_wins, 0) + wins,
+                    User.trainer_losses: func.coalesce(User.trainer_losses, 0) + losses
+                },
+                synchronize_session=False
+            )
+
+    def _notify(self, trainer_slots: np.ndarray, counters: Dict[int, Tuple[int, int]]):
+        ratings = {
+            self.trainers.ids[slot]: float(self.trainers.ratings[slot])
+            for slot in trainer_slots.tolist()
+        }
+        for listener in self._listeners:
+            listener(ratings, counters)
+
+rating_service = RatingService()
@@ -4,7 +4,7 @@ from datetime import datetime, timedelta
 import jwt
 from app.models.Base import User
 from app.schemas.user_schema import UserCreate, UserLogin
-from typing import Union, Optional 
+from typing import Set, Union, Optional 
 from fastapi import Depends, HTTPException
 from app.database import get_db
 
@@ -14,6 +14,8 @@ pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 SECRET_KEY = "your-secret-key-replace-in-production"
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
+# Users allowed to run storage maintenance: resharding and backup garbage collection
+ADMIN_USER_IDS: Set[int] = set()
 
 def get_current_user(db: Session, token: str) -> User:
 
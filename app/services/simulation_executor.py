@@ -0,0 +1,343 @@
+import os
+import time
+import asyncio
+import threading
+import weakref
+from concurrent.futures import Executor, Future, ProcessPoolExecutor
+from typing import Any, AsyncIterator, Callable, Iterable, Iterator, List, Optional
+from app.services.battle_services import (
+    PokemonBattleService,
+    BattleCombatant,
+    CompactBattleOutcome,
+    TypeEffectivenessMatrix
+)
+from app.services.tournament_service import (
+    AdvancedTournamentService,
+    TournamentBracket,
+    TournamentEvent
+)
+
+SIMULATION_MAX_WORKERS = os.cpu_count() or 1
+SIMULATION_MAX_PENDING = 64 * SIMULATION_MAX_WORKERS
+# Tournaments running at once; their matches also count against max_pending
+SIMULATION_MAX_TOURNAMENTS = 2 * SIMULATION_MAX_WORKERS
+# Tournament streams hand events over in batches of at most this many, flushed
+# at least this often, with at most TOURNAMENT_STREAM_BUFFER batches waiting
+TOURNAMENT_STREAM_BATCH = 256
+TOURNAMENT_STREAM_FLUSH_SECONDS = 0.05
+TOURNAMENT_STREAM_BUFFER = 8
+
+class SimulationQueueFullError(RuntimeError):
+    """
+    Raised when the simulation executor cannot accept more work
+    """
+
+def _warm_worker():
+    """
+    Process pool initializer
+    Touches the type chart so every worker starts with it loaded
+    """
+    TypeEffectivenessMatrix.DUAL_CHART.sum()
+
+def _ping() -> int:
+    return os.getpid()
+
+def _run_chunk(function: Callable[..., Any], chunk: List[tuple]) -> List[Any]:
+    return [function(*args) for args in chunk]
+
+def run_battle_job(
+    combatant1: BattleCombatant,
+    combatant2: BattleCombatant,
+    max_rounds: int = 20,
+    seed: Optional[int] = None
+) -> CompactBattleOutcome:
+    return PokemonBattleService.simulate_compact_battle(combatant1, combatant2, max_rounds, seed)
+
+class _CountedPool(Executor):
+    """
+    The executor's process pool as seen by tournament helper threads
+    Every task submitted holds one pending slot until it finishes, so matches
+    compete for capacity with battles. A tournament that finds the pool full
+    waits for a slot rather than failing part way through
+    """
+    def __init__(self, executor: "SimulationExecutor"):
+        self._executor = executor
+        self._pool = executor._get_pool()
+
+    def submit(self, function: Callable[..., Any], *args: Any, **kwargs: Any) -> Future:
+        self._executor._acquire(wait=True)
+        try:
+            future = self._pool.submit(function, *args, **kwargs)
+        except BaseException:
+            self._executor._release()
+            raise
+        future.add_done_callback(lambda _: self._executor._release())
+        return future
+
+    def map(
+        self,
+        function: Callable[..., Any],
+        *iterables: Iterable[Any],
+        timeout: Optional[float] = None,
+        chunksize: int = 1
+    ) -> Iterator[Any]:
+        """
+        Executor.map with one pending slot per chunk submitted to the pool
+        """
+        arguments = list(zip(*iterables))
+        futures = [
+            self.submit(_run_chunk, function, arguments[start:start + chunksize])
+            for start in range(0, len(arguments), chunksize)
+        ]
+
+        def results() -> Iterator[Any]:
+            try:
+                for future in futures:
+                    yield from future.result(timeout)
+            finally:
+                for future in futures:
+                    future.cancel()
+        return results()
+
+class SimulationExecutor:
+    """
+    Runs CPU-bound battle and tournament simulations in a process pool
+    Keeps the FastAPI event loop free and applies backpressure when saturated
+    """
+    def __init__(
+        self,
+        max_workers: int = SIMULATION_MAX_WORKERS,
+        max_pending: int = SIMULATION_MAX_PENDING,
+        max_tournaments: int = SIMULATION_MAX_TOURNAMENTS
+    ):
+        """
+        Initialize the executor
+
+        :param max_workers: Number of worker processes
+        :param max_pending: Maximum number of queued or running pool tasks before rejecting work
+        :param max_tournaments: Maximum number of tournaments running at once
+        """
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.max_tournaments = max_tournaments
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._pending = 0
+        self._tournaments = 0
+        # Tournament helper threads take and return slots too
+        self._capacity = threading.Condition()
+
+    @property
+    def pending(self) -> int:
+        return self._pending
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                initializer=_warm_worker
+            )
+        return self._pool
+
+    async def start(self):
+        """
+        Spawn every worker up front so the first requests do not pay for it
+        """
+        loop = asyncio.get_running_loop()
+        pool = self._get_pool()
+        await asyncio.gather(*[
+            loop.run_in_executor(pool, _ping) for _ in range(self.max_workers)
+        ])
+
+    def _acquire(self, wait: bool = False):
+        """
+        Take one pending slot
+
+        :param wait: Block until a slot frees up instead of raising
+        :raises SimulationQueueFullError: If max_pending tasks are in flight and wait is False
+        """
+        with self._capacity:
+            while self._pending >= self.max_pending:
+                if not wait:
+                    raise SimulationQueueFullError(
+                        f"Simulation queue is full ({self.max_pending} jobs pending), retry later"
+                    )
+                self._capacity.wait()
+            self._pending += 1
+
+    async def _acquire_async(self):
+        """
+        Take one pending slot, waiting on a helper thread so the event loop
+        keeps running
+        """
+        acquiring = asyncio.get_running_loop().run_in_executor(None, self._acquire, True)
+        try:
+            await asyncio.shield(acquiring)
+        except asyncio.CancelledError:
+            # The slot may still be taken after the caller gave up; hand it back
+            acquiring.add_done_callback(
+                lambda future: None if future.cancelled() or future.exception() else self._release()
+            )
+            raise
+
+    def check_capacity(self):
+        """
+        Fail fast when no job could be queued right now, e.g. before a
+        streaming response starts and can no longer report an error status
+
+        :raises SimulationQueueFullError: If max_pending tasks are in flight
+        """
+        if self._pending >= self.max_pending:
+            raise SimulationQueueFullError(
+                f"Simulation queue is full ({self.max_pending} jobs pending), retry later"
+            )
+
+    def _release(self):
+        with self._capacity:
+            self._pending -= 1
+            self._capacity.notify()
+
+    def _start_tournament(self):
+        """
+        Admit a tournament, checking that its first matches could be queued
+
+        :raises SimulationQueueFullError: If the tournament limit is reached or the pool is full
+        """
+        with self._capacity:
+            if self._tournaments >= self.max_tournaments or self._pending >= self.max_pending:
+                raise SimulationQueueFullError(
+                    f"Simulation queue is full ({self._tournaments} tournaments, "
+                    f"{self._pending} jobs pending), retry later"
+                )
+            self._tournaments += 1
+
+    def _finish_tournament(self):
+        with self._capacity:
+            self._tournaments -= 1
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=True)
+            self._pool = None
+
+    async def submit(self, job: Callable[..., Any], *args: Any, wait: bool = False) -> Any:
+        """
+        Run a picklable job in the pool and await its result
+
+        :param wait: Wait for a free slot instead of raising, for background
+            work with nobody to retry it
+        :raises SimulationQueueFullError: If max_pending jobs are already in flight and wait is False
+        """
+        if wait:
+            await self._acquire_async()
+        else:
+            self._acquire()
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._get_pool(), job, *args)
+        finally:
+            self._release()
+
+    async def run_battle(
+        self,
+        combatant1: BattleCombatant,
+        combatant2: BattleCombatant,
+        max_rounds: int = 20,
+        seed: Optional[int] = None
+    ) -> CompactBattleOutcome:
+        return await self.submit(run_battle_job, combatant1, combatant2, max_rounds, seed)
+
+    async def run_tournament(self, tournament_bracket: TournamentBracket) -> TournamentBracket:
+        """
+        Simulate a tournament round by round, with each round's matches spread
+        across the pool; the bracket bookkeeping runs on a helper thread
+
+        :raises SimulationQueueFullError: If the tournament limit is reached or the pool is full
+        """
+        self._start_tournament()
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(
+                None,
+                AdvancedTournamentService.simulate_tournament,
+                tournament_bracket,
+                _CountedPool(self)
+            )
+        finally:
+            self._finish_tournament()
+
+    def stream_tournament(self, tournament_bracket: TournamentBracket) -> AsyncIterator[List[TournamentEvent]]:
+        """
+        Simulate a tournament on a helper thread and yield its events in small
+        batches as they are decided
+        The handoff queue is bounded, so a slow consumer pauses the simulation
+        instead of growing memory. The tournament slot is taken here, so
+        concurrent streams cannot all pass the check before any starts
+
+        :raises SimulationQueueFullError: If the tournament limit is reached or the pool is full
+        """
+        self._start_tournament()
+        finished = threading.Event()
+
+        def finish():
+            if not finished.is_set():
+                finished.set()
+                self._finish_tournament()
+
+        stream = self._stream_tournament(tournament_bracket, finish)
+        # A stream dropped before its first iteration never runs its finally
+        weakref.finalize(stream, finish)
+        return stream
+
+    async def _stream_tournament(
+        self,
+        tournament_bracket: TournamentBracket,
+        finish: Callable[[], None]
+    ) -> AsyncIterator[List[TournamentEvent]]:
+        loop = asyncio.get_running_loop()
+        batches: "asyncio.Queue" = asyncio.Queue(maxsize=TOURNAMENT_STREAM_BUFFER)
+        stopped = threading.Event()
+        pool = _CountedPool(self)
+
+        def publish(item: Any):
+            asyncio.run_coroutine_threadsafe(batches.put(item), loop).result()
+
+        def produce():
+            try:
+                batch = []
+                # Flush the first event immediately for a fast first byte
+                last_flush = float("-inf")
+                for event in AdvancedTournamentService.iter_tournament(tournament_bracket, pool):
+                    if stopped.is_set():
+                        return
+                    batch.append(event)
+                    now = time.monotonic()
+                    if len(batch) >= TOURNAMENT_STREAM_BATCH or now - last_flush >= TOURNAMENT_STREAM_FLUSH_SECONDS:
+                        publish(batch)
+                        batch = []
+                        last_flush = now
+                if batch:
+                    publish(batch)
+                publish(None)
+            except Exception as e:
+                if not stopped.is_set():
+                    publish(e)
+
+        producer = loop.run_in_executor(None, produce)
+        try:
+            while True:
+                item = await batches.get()
+                if item is None:
+                    break
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+            await producer
+        finally:
+            finish()
+            if not producer.done():
+                # The client went away; unblock the producer so its thread exits
+                stopped.set()
+                while not batches.empty():
+                    batches.get_nowait()
+
+simulation_executor = SimulationExecutor()
@@ -0,0 +1,354 @@
+import random
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence, Tuple, Union
+import numpy as np
+from app.models.pokemon_team import Pokemon
+from app.services.battle_services import (
+    BattleCombatant,
+    TypeEffectivenessMatrix,
+    CRITICAL_HIT_CHANCE,
+    CRITICAL_HIT_MULTIPLIER,
+    derive_seed,
+    new_seed
+)
+
+MAX_TEAM_SIZE = 6
+MAX_TEAM_TURNS = 120
+
+class TeamStats:
+    """
+    Preallocated stat arrays for one team, built once per team
+    Members are sent out in roster order
+    """
+    __slots__ = (
+        'ids', 'names', 'size', 'hp', 'attack', 'defense',
+        'special_attack', 'special_defense', 'speed',
+        'type_1_code', 'type_2_code'
+    )
+
+    def __init__(self, combatants: Sequence[BattleCombatant]):
+        if not 1 <= len(combatants) <= MAX_TEAM_SIZE:
+            raise ValueError(f"A team must have between 1 and {MAX_TEAM_SIZE} Pokemon")
+
+        self.ids = tuple(combatant.id for combatant in combatants)
+        self.names = tuple(combatant.name for combatant in combatants)
+        self.size = len(combatants)
+        self.hp = np.array([combatant.hp for combatant in combatants], dtype=np.int64)
+        self.attack = np.array([combatant.attack for combatant in combatants], dtype=float)
+        self.defense = np.array([combatant.defense for combatant in combatants], dtype=float)
+        self.special_attack = np.array([combatant.special_attack for combatant in combatants], dtype=float)
+        self.special_defense = np.array([combatant.special_defense for combatant in combatants], dtype=float)
+        self.speed = np.array([combatant.speed for combatant in combatants], dtype=np.int64)
+        self.type_1_code = np.array([combatant.type_1_code for combatant in combatants], dtype=np.intp)
+        self.type_2_code = np.array([combatant.type_2_code for combatant in combatants], dtype=np.intp)
+
+    @classmethod
+    def from_team(cls, team: Sequence[Union[Pokemon, BattleCombatant]]) -> "TeamStats":
+        return cls([BattleCombatant.from_pokemon(pokemon) for pokemon in team])
+
+    def damage_against(self, defenders: "TeamStats") -> np.ndarray:
+        """
+        Damage of every member against every defender: shape (size, defenders.size, 2)
+        Each attack uses the better of the physical and special stat pair
+        """
+        physical = self.attack[:, None] - defenders.defense[None, :] / 2
+        special = self.special_attack[:, None] - defenders.special_defense[None, :] / 2
+        type_multiplier = TypeEffectivenessMatrix.DUAL_CHART[
+            self.type_1_code[:, None],
+            defenders.type_1_code[None, :],
+            defenders.type_2_code[None, :]
+        ]
+        scaled = (np.maximum(physical, special) * type_multiplier)[:, :, None]
+        critical_multiplier = np.array([1.0, CRITICAL_HIT_MULTIPLIER])
+        return np.maximum(1, np.trunc(scaled * critical_multiplier)).astype(np.int64)
+
+class TeamBattleOutcome(NamedTuple):
+    """
+    Result of a full team battle
+    Pairs are ordered (team1, team2); critical_hits holds one bit per attack slot,
+    bit 2*(turn-1) for the faster active Pokemon and the next bit for the slower one
+    """
+    team1_won: bool
+    turns: int
+    knockouts: Tuple[int, int]
+    remaining_hp: Tuple[int, int]
+    seed: int
+    critical_hits: int
+
+class TeamBattleService:
+    @staticmethod
+    def simulate_team_battle(
+        team1: TeamStats,
+        team2: TeamStats,
+        max_turns: int = MAX_TEAM_TURNS,
+        seed: Optional[int] = None,
+        turn_log: Optional[List[Dict[str, Any]]] = None
+    ) -> TeamBattleOutcome:
+        """
+        Play out a full team battle
+        Each turn the faster active Pokemon attacks first (team1 on ties); a fainted
+        Pokemon is replaced by the next team member and does not act that turn.
+        No objects are allocated per turn unless turn_log is given.
+
+        Args:
+            team1: First team
+            team2: Second team
+            max_turns: Turn limit, after which remaining HP decides the winner
+            seed: Seed for the crit rolls, drawn fresh if omitted
+            turn_log: Optional list that receives one entry per attack
+
+        Returns:
+            Outcome with knockouts, remaining HP and the crit bits for replays
+        """
+        if seed is None:
+            seed = new_seed()
+        rng = random.Random(seed)
+
+        team1_damage = team1.damage_against(team2).tolist()
+        team2_damage = team2.damage_against(team1).tolist()
+        team1_speed = team1.speed.tolist()
+        team2_speed = team2.speed.tolist()
+        hp1 = team1.hp.tolist()
+        hp2 = team2.hp.tolist()
+        size1 = team1.size
+        size2 = team2.size
+
+        # Members faint in roster order, so the active index is the knockout count
+        active1 = 0
+        active2 = 0
+        critical_hits = 0
+        turn = 0
+
+        while turn < max_turns and active1 < size1 and active2 < size2:
+            turn += 1
+            first_critical = rng.random() < CRITICAL_HIT_CHANCE
+            second_critical = rng.random() < CRITICAL_HIT_CHANCE
+            critical_hits |= (first_critical | (second_critical << 1)) << (2 * (turn - 1))
+
+            if team1_speed[active1] >= team2_speed[active2]:
+                damage = team1_damage[active1][active2][first_critical]
+                hp2[active2] -= damage
+                if turn_log is not None:
+                    turn_log.append(TeamBattleService._log_entry(
+                        turn, team1, active1, team2, active2, first_critical, damage, hp2[active2]
+                    ))
+                if hp2[active2] > 0:
+                    damage = team2_damage[active2][active1][second_critical]
+                    hp1[active1] -= damage
+                    if turn_log is not None:
+                        turn_log.append(TeamBattleService._log_entry(
+                            turn, team2, active2, team1, active1, second_critical, damage, hp1[active1]
+                        ))
+            else:
+                damage = team2_damage[active2][active1][first_critical]
+                hp1[active1] -= damage
+                if turn_log is not None:
+                    turn_log.append(TeamBattleService._log_entry(
+                        turn, team2, active2, team1, active1, first_critical, damage, hp1[active1]
+                    ))
+                if hp1[active1] > 0:
+                    damage = team1_damage[active1][active2][second_critical]
+                    hp2[active2] -= damage
+                    if turn_log is not None:
+                        turn_log.append(TeamBattleService._log_entry(
+                            turn, team1, active1, team2, active2, second_critical, damage, hp2[active2]
+                        ))
+
+            # Switch in the next team member after a faint
+            if hp1[active1] <= 0:
+                active1 += 1
+            elif hp2[active2] <= 0:
+                active2 += 1
+
+        remaining1 = sum(hp for hp in hp1 if hp > 0)
+        remaining2 = sum(hp for hp in hp2 if hp > 0)
+        if active1 >= size1:
+            team1_won = False
+        elif active2 >= size2:
+            team1_won = True
+        else:
+            # If max turns reached, determine winner by remaining HP
+            team1_won = remaining1 > remaining2
+
+        return TeamBattleOutcome(
+            team1_won, turn, (active2, active1), (remaining1, remaining2), seed, critical_hits
+        )
+
+    @staticmethod
+    def simulate_team_battles(
+        teams1: Sequence[TeamStats],
+        teams2: Sequence[TeamStats],
+        max_turns: int = MAX_TEAM_TURNS,
+        seed: Optional[int] = None
+    ) -> Dict[str, np.ndarray]:
+        """
+        Run many team battles at once, teams1[i] against teams2[i]
+        Same rules as simulate_team_battle, with every running battle advanced
+        one turn per vectorized step; finished battles drop out of the working set
+
+        Returns:
+            Arrays "team1_won", "turns" and "knockouts" (shape (n, 2)), one row per battle
+        """
+        battles = len(teams1)
+        if battles != len(teams2):
+            raise ValueError("teams1 and teams2 must have the same length")
+
+        rng = np.random.default_rng(seed)
+
+        # Build stat rows once per distinct matchup (e.g. one pair run many times),
+        # then expand them to one row per battle
+        matchups: Dict[Tuple[int, int], int] = {}
+        distinct: List[Tuple[TeamStats, TeamStats]] = []
+        matchup_of_battle = np.empty(battles, dtype=np.intp)
+        for index, (team1, team2) in enumerate(zip(teams1, teams2)):
+            key = (id(team1), id(team2))
+            if key not in matchups:
+                matchups[key] = len(distinct)
+                distinct.append((team1, team2))
+            matchup_of_battle[index] = matchups[key]
+
+        shape = (len(distinct), MAX_TEAM_SIZE)
+        hp1 = np.zeros(shape, dtype=np.int64)
+        hp2 = np.zeros(shape, dtype=np.int64)
+        speed1 = np.zeros(shape, dtype=np.int64)
+        speed2 = np.zeros(shape, dtype=np.int64)
+        damage12 = np.ones((len(distinct), MAX_TEAM_SIZE, MAX_TEAM_SIZE, 2), dtype=np.int64)
+        damage21 = np.ones((len(distinct), MAX_TEAM_SIZE, MAX_TEAM_SIZE, 2), dtype=np.int64)
+        size1 = np.array([team1.size for team1, _ in distinct], dtype=np.intp)
+        size2 = np.array([team2.size for _, team2 in distinct], dtype=np.intp)
+        for index, (team1, team2) in enumerate(distinct):
+            damage12[index, :team1.size, :team2.size] = team1.damage_against(team2)
+            damage21[index, :team2.size, :team1.size] = team2.damage_against(team1)
+            hp1[index, :team1.size] = team1.hp
+            hp2[index, :team2.size] = team2.hp
+            speed1[index, :team1.size] = team1.speed
+            speed2[index, :team2.size] = team2.speed
+
+        # HP is per battle; the rest is read through the matchup index
+        hp1 = hp1[matchup_of_battle]
+        hp2 = hp2[matchup_of_battle]
+        size1 = size1[matchup_of_battle]
+        size2 = size2[matchup_of_battle]
+
+        active1 = np.zeros(battles, dtype=np.intp)
+        active2 = np.zeros(battles, dtype=np.intp)
+        turns = np.zeros(battles, dtype=np.int64)
+        running = np.arange(battles)
+
+        for turn in range(1, max_turns + 1):
+            if not len(running):
+                break
+            a1 = active1[running]
+            a2 = active2[running]
+            matchup = matchup_of_battle[running]
+            critical = (rng.random((len(running), 2)) < CRITICAL_HIT_CHANCE).astype(np.intp)
+
+            team1_first = speed1[matchup, a1] >= speed2[matchup, a2]
+            team1_critical = np.where(team1_first, critical[:, 0], critical[:, 1])
+            team2_critical = np.where(team1_first, critical[:, 1], critical[:, 0])
+            hit12 = damage12[matchup, a1, a2, team1_critical]
+            hit21 = damage21[matchup, a2, a1, team2_critical]
+
+            h1 = hp1[running, a1]
+            h2 = hp2[running, a2]
+            h1 = np.where(team1_first, h1, h1 - hit21)
+            h2 = np.where(team1_first, h2 - hit12, h2)
+            h1 = np.where(team1_first & (h2 > 0), h1 - hit21, h1)
+            h2 = np.where(~team1_first & (h1 > 0), h2 - hit12, h2)
+            hp1[running, a1] = h1
+            hp2[running, a2] = h2
+
+            active1[running] += h1 <= 0
+            active2[running] += h2 <= 0
+            turns[running] = turn
+
+            finished = (active1[running] >= size1[running]) | (active2[running] >= size2[running])
+            running = running[~finished]
+
+        team1_won = active2 >= size2
+        # If max turns reached, determine winner by remaining HP
+        timed_out = (active1 < size1) & ~team1_won
+        remaining1 = np.clip(hp1, 0, None).sum(axis=1)
+        remaining2 = np.clip(hp2, 0, None).sum(axis=1)
+        team1_won = team1_won | (timed_out & (remaining1 > remaining2))
+
+        return {
+            "team1_won": team1_won,
+            "turns": turns,
+            "knockouts": np.stack([active2, active1], axis=1)
+        }
+
+    @staticmethod
+    def estimate_team_win_rate(
+        team1: TeamStats,
+        team2: TeamStats,
+        samples: int = 1000,
+        max_turns: int = MAX_TEAM_TURNS,
+        seed: Optional[int] = None
+    ) -> float:
+        """
+        Fraction of batched battles won by team1 in this matchup
+        """
+        results = TeamBattleService.simulate_team_battles(
+            [team1] * samples, [team2] * samples, max_turns, seed
+        )
+        return float(results["team1_won"].mean())
+
+    @staticmethod
+    def pairwise_win_matrix(
+        teams: Sequence[TeamStats],
+        samples: int = 128,
+        max_turns: int = MAX_TEAM_TURNS,
+        seed: Optional[int] = None,
+        max_batch: int = 65_536
+    ) -> np.ndarray:
+        """
+        Estimate P(teams[i] beats teams[j]) for every pair with batched battles
+        Only the upper triangle is simulated, with teams[i] as team1;
+        matrix[j, i] is its complement and the diagonal is 0.5
+
+        Args:
+            teams: Teams to compare
+            samples: Battles per pair
+            max_turns: Turn limit per battle
+            seed: Base seed; each batch derives its own
+            max_batch: Upper bound on battles simulated in one vectorized call
+        """
+        size = len(teams)
+        matrix = np.full((size, size), 0.5)
+        rows, cols = np.triu_indices(size, k=1)
+        pairs_per_batch = max(1, max_batch // samples)
+
+        for batch, start in enumerate(range(0, len(rows), pairs_per_batch)):
+            batch_rows = rows[start:start + pairs_per_batch]
+            batch_cols = cols[start:start + pairs_per_batch]
+            results = TeamBattleService.simulate_team_battles(
+                [teams[row] for row in batch_rows for _ in range(samples)],
+                [teams[col] for col in batch_cols for _ in range(samples)],
+                max_turns,
+                None if seed is None else derive_seed(seed, batch)
+            )
+            win_rate = results["team1_won"].reshape(len(batch_rows), samples).mean(axis=1)
+            matrix[batch_rows, batch_cols] = win_rate
+            matrix[batch_cols, batch_rows] = 1 - win_rate
+
+        return matrix
+
+    @staticmethod
+    def _log_entry(
+        turn: int,
+        attackers: TeamStats,
+        attacker_index: int,
+        defenders: TeamStats,
+        defender_index: int,
+        critical: bool,
+        damage: int,
+        defender_hp: int
+    ) -> Dict[str, Any]:
+        return {
+            "turn": turn,
+            "attacker": attackers.names[attacker_index],
+            "defender": defenders.names[defender_index],
+            "critical": bool(critical),
+            "damage": damage,
+            "defender_hp": defender_hp
+        }
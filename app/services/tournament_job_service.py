@@ -0,0 +1,353 @@
+import asyncio
+import logging
+import uuid
+from collections import deque
+from typing import Any, AsyncIterable, AsyncIterator, Dict, Iterable, List, Optional, Sequence, Tuple, Union
+from app.models.pokemon_team import Pokemon
+from app.services.battle_services import BattleCombatant, derive_seed, new_seed
+from app.services.team_battle_service import TeamStats
+from app.services.simulation_executor import SimulationExecutor
+from app.services.rating_service import rating_service
+from app.services.tournament_service import TournamentType, MatchJob, play_match_result_job
+from app.storage.distributed_storage import DistributedTrainerStorageManager
+
+# Participants per stored chunk, and matches per executor job
+TOURNAMENT_JOB_CHUNK_SIZE = 1000
+TOURNAMENT_JOB_MATCH_BATCH = 512
+
+JOB_RUNNING = "running"
+JOB_COMPLETED = "completed"
+JOB_FAILED = "failed"
+
+logger = logging.getLogger(__name__)
+
+Team = Sequence[Union[Pokemon, BattleCombatant]]
+
+def play_match_batch_job(jobs: List[MatchJob]) -> List[Tuple[bool, Tuple[int, int]]]:
+    return [play_match_result_job(job) for job in jobs]
+
+class TournamentJobService:
+    """
+    Checkpointed single elimination for very large fields
+    Teams are written to storage in chunks as they are streamed in and the
+    bracket is checkpointed after every round, so only one chunk of teams and a
+    few batches of matches are held in memory, and an interrupted job resumes
+    from its last completed round
+    """
+    _running_jobs = set()
+
+    @staticmethod
+    def job_storage_id(job_id: str) -> str:
+        return f"tournament_job_{job_id}"
+
+    @staticmethod
+    def chunk_storage_id(job_id: str, chunk: int) -> str:
+        return f"tournament_job_{job_id}_participants_{chunk}"
+
+    @staticmethod
+    def round_storage_id(job_id: str, round_number: int) -> str:
+        return f"tournament_job_{job_id}_round_{round_number}"
+
+    @classmethod
+    async def create_job(
+        cls,
+        storage_manager: DistributedTrainerStorageManager,
+        teams: Union[Iterable[Team], AsyncIterable[Team]],
+        seed: Optional[int] = None,
+        chunk_size: int = TOURNAMENT_JOB_CHUNK_SIZE,
+        owner_id: Optional[int] = None
+    ) -> str:
+        """
+        Stream teams into storage and write the initial checkpoint
+        Teams play in the order they are streamed; pairs are neighbours and an
+        unpaired last team advances without playing
+
+        Args:
+            storage_manager: Storage backend for participants and checkpoints
+            teams: Iterable or async iterable of teams, consumed once
+            seed: Seed for every battle in the tournament. Only tournaments
+                with a server-generated seed are rated, so a chosen seed
+                cannot be replayed to farm ratings
+            chunk_size: Number of teams per stored participant chunk
+            owner_id: User starting the job, who owns its checkpoint record
+
+        Returns:
+            Job id
+        """
+        job_id = uuid.uuid4().hex
+        chunk: List[Dict[str, Any]] = []
+        chunk_count = 0
+        participant_count = 0
+
+        async for team in cls._iterate(teams):
+            chunk.append({
+                "name": f"Team {participant_count + 1}",
+                "members": [
+                    [getattr(combatant, slot) for slot in BattleCombatant.__slots__]
+                    for combatant in map(BattleCombatant.from_pokemon, team)
+                ]
+            })
+            participant_count += 1
+            if len(chunk) == chunk_size:
+                await storage_manager.save_trainer_data({
+                    "storage_id": cls.chunk_storage_id(job_id, chunk_count),
+                    "teams": chunk
+                })
+                chunk = []
+                chunk_count += 1
+
+        if chunk:
+            await storage_manager.save_trainer_data({
+                "storage_id": cls.chunk_storage_id(job_id, chunk_count),
+                "teams": chunk
+            })
+        if participant_count == 0:
+            raise ValueError("A tournament needs at least one team")
+
+        await storage_manager.save_trainer_data({
+            "storage_id": cls.job_storage_id(job_id),
+            "job_id": job_id,
+            "tournament_type": TournamentType.SINGLE_ELIMINATION.value,
+            "seed": new_seed() if seed is None else seed,
+            "rated": seed is None,
+            "participant_count": participant_count,
+            "chunk_size": chunk_size,
+            "status": JOB_RUNNING,
+            "current_round": 1,
+            "survivors": None,  # None means every participant
+            "champion": None
+        }, owner_id=owner_id, data_type="tournament_job")
+        return job_id
+
+    @classmethod
+    def is_running(cls, job_id: str) -> bool:
+        return job_id in cls._running_jobs
+
+    @classmethod
+    async def get_job(cls, storage_manager: DistributedTrainerStorageManager, job_id: str) -> Dict[str, Any]:
+        """
+        Load the latest checkpoint of a job
+        """
+        try:
+            return await storage_manager.simulate_distributed_recovery(cls.job_storage_id(job_id))
+        except FileNotFoundError:
+            raise ValueError(f"Tournament job not found: {job_id}")
+
+    @classmethod
+    async def run_job(
+        cls,
+        storage_manager: DistributedTrainerStorageManager,
+        job_id: str,
+        executor: Optional[SimulationExecutor] = None
+    ) -> Dict[str, Any]:
+        """
+        Run a job from its last checkpoint until it has a champion
+        Rounds are deterministic, so a round interrupted before its checkpoint
+        is simply played again with the same results. If the job fails, its
+        last checkpoint is marked failed with the error; running it again
+        resumes from there
+
+        Args:
+            storage_manager: Storage backend holding the job
+            job_id: Id returned by create_job
+            executor: Optional process pool executor for the matches
+
+        Returns:
+            Final checkpoint, including the champion or the error
+        """
+        if cls.is_running(job_id):
+            raise ValueError(f"Tournament job {job_id} is already running")
+
+        cls._running_jobs.add(job_id)
+        try:
+            checkpoint = await cls.get_job(storage_manager, job_id)
+            if checkpoint["status"] == JOB_FAILED:
+                checkpoint["status"] = JOB_RUNNING
+                checkpoint.pop("error", None)
+            while checkpoint["status"] == JOB_RUNNING:
+                survivors = checkpoint["survivors"]
+                if survivors is None:
+                    survivors = range(checkpoint["participant_count"])
+
+                rated_round = None
+                if len(survivors) == 1:
+                    async for _, name, _ in cls._iter_teams(storage_manager, checkpoint, survivors):
+                        checkpoint["champion"] = name
+                    checkpoint["status"] = JOB_COMPLETED
+                else:
+                    round_number = checkpoint["current_round"]
+                    result = await cls._play_round(storage_manager, checkpoint, survivors, executor)
+                    await storage_manager.save_trainer_data({
+                        "storage_id": cls.round_storage_id(job_id, round_number),
+                        "round": round_number,
+                        **result
+                    })
+                    checkpoint["survivors"] = result["advancing"]
+                    checkpoint["current_round"] = round_number + 1
+                    if checkpoint.get("rated"):
+                        rated_round = (survivors, result["winner"])
+
+                await storage_manager.save_trainer_data(checkpoint)
+                if rated_round is not None:
+                    await cls._rate_round(storage_manager, checkpoint, *rated_round)
+            return checkpoint
+        except Exception as e:
+            logger.exception("Tournament job %s failed", job_id)
+            return await cls._mark_failed(storage_manager, job_id, e)
+        finally:
+            cls._running_jobs.discard(job_id)
+
+    @classmethod
+    async def _mark_failed(
+        cls,
+        storage_manager: DistributedTrainerStorageManager,
+        job_id: str,
+        error: Exception
+    ) -> Dict[str, Any]:
+        """
+        Record a failure on the job's last saved checkpoint, so its status no
+        longer reads as running
+        """
+        checkpoint = await cls.get_job(storage_manager, job_id)
+        checkpoint["status"] = JOB_FAILED
+        checkpoint["error"] = str(error) or type(error).__name__
+        await storage_manager.save_trainer_data(checkpoint)
+        return checkpoint
+
+    @classmethod
+    async def _play_round(
+        cls,
+        storage_manager: DistributedTrainerStorageManager,
+        checkpoint: Dict[str, Any],
+        survivors: Sequence[int],
+        executor: Optional[SimulationExecutor]
+    ) -> Dict[str, List[int]]:
+        """
+        Play one round over the survivors, streaming their teams from storage
+        Keeps at most one batch per worker in flight
+
+        Returns:
+            Columns of the round's matches and the participants advancing
+        """
+        round_number = checkpoint["current_round"]
+        participant1: List[int] = []
+        participant2: List[int] = []
+        winners: List[int] = []
+        in_flight: "deque[asyncio.Future]" = deque()
+        max_in_flight = executor.max_workers if executor is not None else 1
+
+        async def collect():
+            for team1_won, _ in await in_flight.popleft():
+                match_index = len(winners)
+                winners.append(participant1[match_index] if team1_won else participant2[match_index])
+
+        batch: List[MatchJob] = []
+        waiting: Optional[Tuple[int, TeamStats]] = None
+        async for index, _, team_stats in cls._iter_teams(storage_manager, checkpoint, survivors):
+            if waiting is None:
+                waiting = (index, team_stats)
+                continue
+
+            participant1.append(waiting[0])
+            participant2.append(index)
+            batch.append((
+                waiting[1],
+                team_stats,
+                derive_seed(checkpoint["seed"], round_number, len(participant1) - 1)
+            ))
+            waiting = None
+
+            if len(batch) == TOURNAMENT_JOB_MATCH_BATCH:
+                in_flight.append(cls._submit(batch, executor))
+                batch = []
+                if len(in_flight) >= max_in_flight:
+                    await collect()
+
+        if batch:
+            in_flight.append(cls._submit(batch, executor))
+        while in_flight:
+            await collect()
+
+        # An unpaired last participant advances without playing
+        advancing = winners + ([waiting[0]] if waiting is not None else [])
+        return {
+            "participant1": participant1,
+            "participant2": participant2,
+            "winner": winners,
+            "advancing": advancing
+        }
+
+    @classmethod
+    async def _rate_round(
+        cls,
+        storage_manager: DistributedTrainerStorageManager,
+        checkpoint: Dict[str, Any],
+        survivors: Sequence[int],
+        winners: List[int]
+    ):
+        """
+        Queue a checkpointed round's results for rating
+        Runs after the checkpoint, so a round replayed after a crash is never
+        rated twice; the teams are streamed again to keep memory bounded
+        """
+        match_index = 0
+        waiting: Optional[Tuple[int, Tuple[int, ...]]] = None
+        async for index, _, team_stats in cls._iter_teams(storage_manager, checkpoint, survivors):
+            if waiting is None:
+                waiting = (index, team_stats.ids)
+                continue
+            if winners[match_index] == waiting[0]:
+                rating_service.record_result(waiting[1], team_stats.ids)
+            else:
+                rating_service.record_result(team_stats.ids, waiting[1])
+            match_index += 1
+            waiting = None
+            if match_index % TOURNAMENT_JOB_MATCH_BATCH == 0:
+                await rating_service.flush_if_due_async()
+        await rating_service.flush_if_due_async()
+
+    @staticmethod
+    def _submit(batch: List[MatchJob], executor: Optional[SimulationExecutor]) -> "asyncio.Future":
+        if executor is None:
+            # Still off the event loop, on the default thread pool
+            return asyncio.get_running_loop().run_in_executor(None, play_match_batch_job, batch)
+        # Background jobs wait for a pool slot rather than failing when it is busy
+        return asyncio.ensure_future(executor.submit(play_match_batch_job, batch, wait=True))
+
+    @classmethod
+    async def _iter_teams(
+        cls,
+        storage_manager: DistributedTrainerStorageManager,
+        checkpoint: Dict[str, Any],
+        indices: Iterable[int]
+    ) -> AsyncIterator[Tuple[int, str, TeamStats]]:
+        """
+        Yield (index, name, team stats) for ascending participant indices,
+        loading one stored chunk at a time
+        """
+        chunk_size = checkpoint["chunk_size"]
+        loaded_chunk = None
+        teams: List[Dict[str, Any]] = []
+        for index in indices:
+            chunk, offset = divmod(index, chunk_size)
+            if chunk != loaded_chunk:
+                stored = await storage_manager.simulate_distributed_recovery(
+                    cls.chunk_storage_id(checkpoint["job_id"], chunk)
+                )
+                teams = stored["teams"]
+                loaded_chunk = chunk
+
+            entry = teams[offset]
+            yield index, entry["name"], TeamStats([
+                BattleCombatant(**dict(zip(BattleCombatant.__slots__, member)))
+                for member in entry["members"]
+            ])
+
+    @staticmethod
+    async def _iterate(items: Union[Iterable[Any], AsyncIterable[Any]]) -> AsyncIterator[Any]:
+        if hasattr(items, "__aiter__"):
+            async for item in items:
+                yield item
+        else:
+            for item in items:
+                yield item
@@ -1,14 +1,62 @@
+import math
 import random
-from typing import List, Dict, Tuple, Optional
+from concurrent.futures import Executor
+from itertools import groupby
+from typing import Callable, Generator, Iterator, List, Dict, NamedTuple, Set, Tuple, Optional, Union
 from enum import Enum
-from pydantic import BaseModel
+import numpy as np
+from pydantic import BaseModel, ConfigDict, Field
 from app.models.pokemon_team import Pokemon
-from app.services.battle_service import PokemonBattleService
+from app.services.battle_services import derive_seed, new_seed
+from app.services.team_battle_service import TeamStats, TeamBattleService, MAX_TEAM_TURNS
+from app.services.battle_replay import TeamBattleReplay
+from app.services.bracket_store import (
+    BracketStore,
+    MatchRecord,
+    WINNERS_STAGE,
+    LOSERS_STAGE,
+    GRAND_FINAL_STAGE,
+    ROUND_ROBIN_STAGE,
+    SWISS_STAGE
+)
+
+# Split each round into about this many chunks when dispatching to a pool
+MATCH_CHUNKS_PER_ROUND = 64
+# Most tournaments one forecast may simulate; every run holds a row of the
+# bracket in memory at once
+FORECAST_MAX_SIMULATIONS = 100_000
+
+MatchJob = Tuple[TeamStats, TeamStats, int]
+
+def play_match_job(job: MatchJob) -> Tuple[bool, Tuple[int, int], bytes]:
+    """
+    Play one tournament match; module level so worker processes can run it
+
+    Returns:
+        Whether the first team won, the knockouts scored by each team, and the
+        encoded replay
+    """
+    team1, team2, seed = job
+    battle_result = TeamBattleService.simulate_team_battle(team1, team2, seed=seed)
+    replay = TeamBattleReplay.from_outcome(battle_result, team1, team2, MAX_TEAM_TURNS).encode()
+    return battle_result.team1_won, battle_result.knockouts, replay
+
+def play_match_result_job(job: MatchJob) -> Tuple[bool, Tuple[int, int]]:
+    """
+    Play one tournament match without encoding a replay
+
+    Returns:
+        Whether the first team won, and the knockouts scored by each team
+    """
+    team1, team2, seed = job
+    battle_result = TeamBattleService.simulate_team_battle(team1, team2, seed=seed)
+    return battle_result.team1_won, battle_result.knockouts
 
 class TournamentType(Enum):
     SINGLE_ELIMINATION = "single_elimination"
     DOUBLE_ELIMINATION = "double_elimination"
     ROUND_ROBIN = "round_robin"
+    SWISS = "swiss"
 
 class TournamentParticipant(BaseModel):
     """
@@ -29,173 +77,876 @@ class TournamentMatch(BaseModel):
     loser: Optional[TournamentParticipant] = None
     round_number: int
     match_details: Dict = {}
+    replay: Optional[bytes] = None  # Encoded TeamBattleReplay of the match
+
+class RoundSummary(NamedTuple):
+    """
+    Emitted once every match of a round has been decided
+    """
+    round_number: int
+    stage: str
+    matches: int
+    byes: int = 0  # Participants who advanced without playing
+
+class TournamentStanding(BaseModel):
+    """
+    One row of the final standings table
+    """
+    rank: int
+    name: Optional[str] = None
+    wins: int
+    losses: int
+    knockouts_scored: int
+    knockout_differential: int
+
+class TournamentStandings:
+    """
+    Standings table updated in O(1) per match
+    Ranked by wins, then knockout differential, then knockouts scored, then
+    bracket position
+    """
+    def __init__(self, size: int):
+        self.wins = np.zeros(size, dtype=np.int64)
+        self.losses = np.zeros(size, dtype=np.int64)
+        self.knockouts_scored = np.zeros(size, dtype=np.int64)
+        self.knockouts_suffered = np.zeros(size, dtype=np.int64)
+
+    def record(self, participant1: int, participant2: int, team1_won: bool, knockouts: Tuple[int, int]):
+        winner, loser = (participant1, participant2) if team1_won else (participant2, participant1)
+        self.wins[winner] += 1
+        self.losses[loser] += 1
+        self.knockouts_scored[participant1] += knockouts[0]
+        self.knockouts_suffered[participant1] += knockouts[1]
+        self.knockouts_scored[participant2] += knockouts[1]
+        self.knockouts_suffered[participant2] += knockouts[0]
+
+    def record_bye(self, participant: int):
+        self.wins[participant] += 1
+
+    def ranking(self) -> np.ndarray:
+        """
+        Participant indexes from first to last place
+        """
+        differential = self.knockouts_scored - self.knockouts_suffered
+        return np.lexsort((
+            np.arange(len(self.wins)),
+            -self.knockouts_scored,
+            -differential,
+            -self.wins
+        ))
+
+    def table(self, participants: List[TournamentParticipant]) -> List[TournamentStanding]:
+        return [
+            TournamentStanding(
+                rank=rank,
+                name=participants[index].name,
+                wins=int(self.wins[index]),
+                losses=int(self.losses[index]),
+                knockouts_scored=int(self.knockouts_scored[index]),
+                knockout_differential=int(self.knockouts_scored[index] - self.knockouts_suffered[index])
+            )
+            for rank, index in enumerate(self.ranking().tolist(), start=1)
+        ]
 
 class TournamentBracket(BaseModel):
     """
     Represents the entire tournament structure
+    Participants are stored once; matches live in a BracketStore as rows of
+    participant indexes, and TournamentMatch views are only built on request
     """
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+    
     tournament_type: TournamentType
     participants: List[TournamentParticipant]
-    matches: List[TournamentMatch] = []
+    seed: int
+    store: BracketStore = Field(default_factory=BracketStore, exclude=True)
+    byes: List[int] = []  # Participants who skip the first round, best seed first
+    standings: List[TournamentStanding] = []
     current_round: int = 1
     champion: Optional[TournamentParticipant] = None
+    
+    def iter_matches(self) -> Iterator[TournamentMatch]:
+        """
+        Lazily build a TournamentMatch view of every stored match
+        """
+        for record in self.store:
+            yield AdvancedTournamentService.match_view(self, record)
+
+TournamentEvent = Union[MatchRecord, RoundSummary]
+# Yields a round's events, then returns its winners and losers
+RoundGenerator = Generator[TournamentEvent, None, Tuple[List[int], List[int]]]
+
+class ParticipantForecast(BaseModel):
+    """
+    Forecast for one participant across many simulated runs of a bracket
+    """
+    name: Optional[str] = None
+    round_probabilities: List[float]  # Probability of playing in round 1, 2, ...
+    champion_probability: float
+
+class TournamentForecast(BaseModel):
+    """
+    Monte Carlo forecast of a tournament bracket
+    """
+    tournament_type: TournamentType
+    simulations: int
+    total_rounds: int
+    participants: List[ParticipantForecast]
 
 class AdvancedTournamentService:
     @classmethod
     def create_tournament_bracket(
         cls, 
         participants: List[List[Pokemon]], 
-        tournament_type: TournamentType = TournamentType.SINGLE_ELIMINATION
+        tournament_type: TournamentType = TournamentType.SINGLE_ELIMINATION,
+        seed: Optional[int] = None,
+        seeded: bool = False
     ) -> TournamentBracket:
         """
         Create a comprehensive tournament bracket
+        Participant order is the seeding, top seed first. Elimination brackets
+        are not padded; when the field is not a power of two the top seeds get
+        first-round byes instead
         
         Args:
             participants: List of Pokemon teams
             tournament_type: Type of tournament to simulate
+            seed: Seed for the initial shuffle and every battle in the tournament
+            seeded: Keep the given order as the seeding instead of shuffling
         
         Returns:
             Fully structured tournament bracket
         """
-        # Pad participants to nearest power of 2 for standard brackets
-        padded_participants = cls._pad_participants(participants)
-        
         # Convert to tournament participants
         tournament_participants = [
             TournamentParticipant(
                 team=team, 
                 name=f"Team {idx+1}"  # Default naming
-            ) for idx, team in enumerate(padded_participants)
+            ) for idx, team in enumerate(participants)
         ]
         
-        # Shuffle participants for random initial matchups
-        random.shuffle(tournament_participants)
+        if seed is None:
+            seed = new_seed()
+        
+        # Shuffle participants for random seeding
+        if not seeded:
+            random.Random(seed).shuffle(tournament_participants)
         
         # Initialize tournament bracket
         tournament_bracket = TournamentBracket(
             tournament_type=tournament_type,
-            participants=tournament_participants
+            participants=tournament_participants,
+            seed=seed
         )
         
+        # Round robin and Swiss pair participants themselves and have no bracket
+        if tournament_type in (TournamentType.SINGLE_ELIMINATION, TournamentType.DOUBLE_ELIMINATION):
+            tournament_bracket.byes = sorted(
+                entrant for entrant, opponent in cls._pair_slots(cls._seeded_slots(len(participants)))
+                if opponent is None
+            )
+        
         return tournament_bracket
     
     @classmethod
     def simulate_tournament(
         cls, 
-        tournament_bracket: TournamentBracket
+        tournament_bracket: TournamentBracket,
+        executor: Optional[Executor] = None
     ) -> TournamentBracket:
         """
         Simulate the entire tournament progression
         
         Args:
             tournament_bracket: Initial tournament bracket
+            executor: Optional worker pool; each round's matches are dispatched
+                to it in parallel. Results are identical to the serial path
+                because every match has its own derived seed.
         
         Returns:
             Completed tournament bracket with final results
         """
+        for event in cls.iter_tournament(tournament_bracket, executor):
+            if isinstance(event, MatchRecord):
+                tournament_bracket.store.append(event)
+        
+        return tournament_bracket
+    
+    @classmethod
+    def iter_tournament(
+        cls,
+        tournament_bracket: TournamentBracket,
+        executor: Optional[Executor] = None
+    ) -> Iterator[TournamentEvent]:
+        """
+        Simulate the tournament lazily, yielding each match as soon as it is
+        decided and a RoundSummary after every round
+        Matches are not stored on the bracket, so memory stays bounded by the
+        participants and a single round; champion and standings are set on the
+        bracket once the generator is exhausted
+        
+        Args:
+            tournament_bracket: Initial tournament bracket
+            executor: Optional worker pool for each round's matches
+        
+        Returns:
+            Iterator of MatchRecord events interleaved with RoundSummary events
+        """
+        if tournament_bracket.tournament_type == TournamentType.ROUND_ROBIN:
+            return cls._run_round_robin(tournament_bracket, executor)
+        if tournament_bracket.tournament_type == TournamentType.DOUBLE_ELIMINATION:
+            return cls._run_double_elimination(tournament_bracket, executor)
+        if tournament_bracket.tournament_type == TournamentType.SWISS:
+            return cls._run_swiss(tournament_bracket, executor)
+        return cls._run_single_elimination(tournament_bracket, executor)
+    
+    @classmethod
+    def _run_single_elimination(
+        cls,
+        tournament_bracket: TournamentBracket,
+        executor: Optional[Executor] = None
+    ) -> Iterator[TournamentEvent]:
+        # Build every team's stat arrays once for the whole tournament
+        participants = tournament_bracket.participants
+        team_stats = [TeamStats.from_team(participant.team) for participant in participants]
+        standings = TournamentStandings(len(participants))
+        
         # Create initial round of matches
-        current_participants = tournament_bracket.participants.copy()
+        current_participants = list(range(len(participants)))
         
         while len(current_participants) > 1:
-            next_round_participants = []
-            
-            # Pair participants for matches
-            for i in range(0, len(current_participants), 2):
-                if i + 1 < len(current_participants):
-                    # Simulate match between two participants
-                    match = cls._simulate_match(
-                        current_participants[i], 
-                        current_participants[i+1],
-                        tournament_bracket.current_round
-                    )
-                    
-                    # Add match to tournament matches
-                    tournament_bracket.matches.append(match)
-                    
-                    # Add winner to next round
-                    next_round_participants.append(match.winner)
-                    
-                    # Update participant stats
-                    match.winner.wins += 1
-                    match.loser.losses += 1
-                    match.loser.eliminated = True
-            
-            # Update participants and round
-            current_participants = next_round_participants
-            tournament_bracket.current_round += 1
+            # Matches within a round are independent, so play them all at once;
+            # single elimination brackets are small enough to keep every replay
+            if len(current_participants) == len(participants):
+                current_participants, losers = yield from cls._play_seeded_round(
+                    tournament_bracket, team_stats, standings, executor, with_replays=True
+                )
+            else:
+                pairings, advancing = cls._pair_in_order(current_participants)
+                winners, losers = yield from cls._play_recorded_round(
+                    tournament_bracket, team_stats, pairings, WINNERS_STAGE, standings, executor,
+                    with_replays=True
+                )
+                # Winners advance in bracket order
+                current_participants = winners + advancing
+            for loser in losers:
+                participants[loser].eliminated = True
         
         # Set tournament champion
-        tournament_bracket.champion = current_participants[0]
+        tournament_bracket.standings = standings.table(participants)
+        tournament_bracket.champion = participants[current_participants[0]]
+    
+    @classmethod
+    def _run_round_robin(
+        cls,
+        tournament_bracket: TournamentBracket,
+        executor: Optional[Executor] = None
+    ) -> Iterator[TournamentEvent]:
+        """
+        Every participant plays every other once, one circle-method round at a time
+        """
+        participants = tournament_bracket.participants
+        team_stats = [TeamStats.from_team(participant.team) for participant in participants]
+        standings = TournamentStandings(len(participants))
         
-        return tournament_bracket
+        for pairings in cls._round_robin_schedule(len(participants)):
+            yield from cls._play_recorded_round(
+                tournament_bracket, team_stats, pairings, ROUND_ROBIN_STAGE, standings, executor
+            )
+        
+        tournament_bracket.standings = standings.table(participants)
+        tournament_bracket.champion = participants[int(standings.ranking()[0])]
+    
+    @classmethod
+    def _run_double_elimination(
+        cls,
+        tournament_bracket: TournamentBracket,
+        executor: Optional[Executor] = None
+    ) -> Iterator[TournamentEvent]:
+        """
+        Winners bracket, losers bracket and a grand final with a bracket reset
+        Every winners round drops its losers into the losers bracket, which then
+        plays down to the size of the next wave of drop-ins
+        """
+        participants = tournament_bracket.participants
+        team_stats = [TeamStats.from_team(participant.team) for participant in participants]
+        standings = TournamentStandings(len(participants))
+        
+        def play(entrants: List[int], stage: str) -> RoundGenerator:
+            pairings, advancing = cls._pair_in_order(entrants)
+            winners, losers = yield from cls._play_recorded_round(
+                tournament_bracket, team_stats, pairings, stage, standings, executor,
+                byes=len(advancing)
+            )
+            return winners + advancing, losers
+        
+        def eliminate(losers: List[int]):
+            for loser in losers:
+                participants[loser].eliminated = True
+        
+        winners_bracket = list(range(len(participants)))
+        losers_bracket: List[int] = []
+        while len(winners_bracket) > 1:
+            if len(winners_bracket) == len(participants):
+                winners_bracket, dropped = yield from cls._play_seeded_round(
+                    tournament_bracket, team_stats, standings, executor
+                )
+            else:
+                winners_bracket, dropped = yield from play(winners_bracket, WINNERS_STAGE)
+            if losers_bracket:
+                # Drop-ins meet losers bracket survivors in reverse order to
+                # avoid immediate rematches
+                entrants = cls._interleave(losers_bracket, dropped[::-1])
+                losers_bracket, eliminated = yield from play(entrants, LOSERS_STAGE)
+                eliminate(eliminated)
+            else:
+                losers_bracket = dropped
+            
+            while len(losers_bracket) > max(1, len(winners_bracket) // 2):
+                losers_bracket, eliminated = yield from play(losers_bracket, LOSERS_STAGE)
+                eliminate(eliminated)
+        
+        champion = winners_bracket[0]
+        if losers_bracket:
+            (final_winner,), (final_loser,) = yield from play([champion, losers_bracket[0]], GRAND_FINAL_STAGE)
+            if final_winner != champion:
+                # The winners bracket champion has its first loss; play it again
+                (final_winner,), (final_loser,) = yield from play([final_winner, final_loser], GRAND_FINAL_STAGE)
+            eliminate([final_loser])
+            champion = final_winner
+        
+        tournament_bracket.standings = standings.table(participants)
+        tournament_bracket.champion = participants[champion]
+    
+    @classmethod
+    def _run_swiss(
+        cls,
+        tournament_bracket: TournamentBracket,
+        executor: Optional[Executor] = None
+    ) -> Iterator[TournamentEvent]:
+        """
+        Swiss system: ceil(log2(n)) rounds, each paired within score groups
+        from the current standings without rematches
+        """
+        participants = tournament_bracket.participants
+        team_stats = [TeamStats.from_team(participant.team) for participant in participants]
+        standings = TournamentStandings(len(participants))
+        opponents: List[Set[int]] = [set() for _ in participants]
+        had_bye: Set[int] = set()
+        total_rounds = math.ceil(math.log2(len(participants))) if len(participants) > 1 else 0
+        
+        for _ in range(total_rounds):
+            pairings, bye = cls._swiss_pairings(standings, opponents, had_bye)
+            if bye is not None:
+                # A bye scores as a win
+                had_bye.add(bye)
+                standings.record_bye(bye)
+                participants[bye].wins += 1
+            for participant1, participant2 in pairings:
+                opponents[participant1].add(participant2)
+                opponents[participant2].add(participant1)
+            yield from cls._play_recorded_round(
+                tournament_bracket, team_stats, pairings, SWISS_STAGE, standings, executor
+            )
+        
+        tournament_bracket.standings = standings.table(participants)
+        tournament_bracket.champion = participants[int(standings.ranking()[0])]
+    
+    @classmethod
+    def _swiss_pairings(
+        cls,
+        standings: TournamentStandings,
+        opponents: List[Set[int]],
+        had_bye: Set[int]
+    ) -> Tuple[List[Tuple[int, int]], Optional[int]]:
+        """
+        Pair one Swiss round without rematches whenever that is possible
+        The bye goes to the lowest ranked participant without one, unless only
+        another choice of bye allows a pairing without rematches. The fast
+        score-group pairing is tried first; if it leaves a rematch, its lowest
+        ranked pairings are searched again, and rematches are only accepted
+        when no pairing of the whole field avoids them.
+        
+        Returns:
+            Pairings and the participant receiving a bye, if the count is odd
+        """
+        order = standings.ranking().tolist()
+        wins = standings.wins
+        if len(order) % 2 == 0:
+            byes: List[Optional[int]] = [None]
+        else:
+            # Lowest ranked first; if everyone has had a bye, the last place sits out
+            byes = [index for index in reversed(order) if index not in had_bye] or [order[-1]]
+        
+        for bye in byes:
+            players = [index for index in order if index != bye]
+            pairings = cls._swiss_group_pairings(players, wins, opponents)
+            if not any(participant2 in opponents[participant1] for participant1, participant2 in pairings):
+                return pairings, bye
+            pairings = cls._swiss_repair_pairings(pairings, players, wins, opponents)
+            if pairings is not None:
+                return pairings, bye
+        
+        # Every pairing has a rematch; keep the score-group pairing
+        players = [index for index in order if index != byes[0]]
+        return cls._swiss_group_pairings(players, wins, opponents), byes[0]
     
     @staticmethod
-    def _simulate_match(
-        participant1: TournamentParticipant, 
-        participant2: TournamentParticipant,
-        round_number: int
-    ) -> TournamentMatch:
+    def _swiss_group_pairings(
+        players: List[int],
+        wins: np.ndarray,
+        opponents: List[Set[int]]
+    ) -> List[Tuple[int, int]]:
         """
-        Simulate a single match between two participants
+        Greedy score-group pairing
+        Players are grouped by wins in standings order. Within a group the top
+        half meets the bottom half, each top player taking the first bottom
+        player it has not met yet; anyone left unpaired floats down into the
+        next group, and the last floaters are paired even if they have met.
+        Runs in O(n log n) for the sort plus O(n * rounds) for the rematch checks
+        """
+        pairings: List[Tuple[int, int]] = []
+        floaters: List[int] = []
+        for _, group in groupby(players, key=lambda index: wins[index]):
+            group_players = floaters + list(group)
+            half = len(group_players) // 2
+            top, bottom = group_players[:half], group_players[half:]
+            taken = [False] * len(bottom)
+            start = 0
+            floaters = []
+            for player in top:
+                while start < len(bottom) and taken[start]:
+                    start += 1
+                for position in range(start, len(bottom)):
+                    if not taken[position] and bottom[position] not in opponents[player]:
+                        taken[position] = True
+                        pairings.append((player, bottom[position]))
+                        break
+                else:
+                    floaters.append(player)
+            floaters.extend(player for player, used in zip(bottom, taken) if not used)
         
-        Args:
-            participant1: First team in the match
-            participant2: Second team in the match
-            round_number: Current tournament round
+        while floaters:
+            player = floaters.pop(0)
+            partner = next(
+                (position for position, other in enumerate(floaters) if other not in opponents[player]),
+                0
+            )
+            pairings.append((player, floaters.pop(partner)))
+        return pairings
+    
+    @classmethod
+    def _swiss_repair_pairings(
+        cls,
+        pairings: List[Tuple[int, int]],
+        players: List[int],
+        wins: np.ndarray,
+        opponents: List[Set[int]]
+    ) -> Optional[List[Tuple[int, int]]]:
+        """
+        Re-pair the tail of a score-group pairing that has rematches
+        The rematches and the lowest ranked players are searched again along
+        with their partners, doubling the tail until a pairing without
+        rematches is found or the whole field has been searched. Players can
+        only have met one opponent per round, so a tail a few times the
+        number of rounds always has such a pairing, and the search stays small
+        
+        Returns:
+            Pairings, or None if every pairing has a rematch
+        """
+        rank = {player: position for position, player in enumerate(players)}
+        rematched = {player for pair in pairings if pair[1] in opponents[pair[0]] for player in pair}
+        tail = max(8, 2 * len(rematched))
+        while True:
+            reopened = rematched.union(players[-tail:])
+            kept = [pair for pair in pairings if pair[0] not in reopened and pair[1] not in reopened]
+            kept_players = {player for pair in kept for player in pair}
+            searched = [player for player in players if player not in kept_players]
+            repaired = cls._swiss_search_pairings(searched, wins, opponents)
+            if repaired is not None:
+                return sorted(kept + repaired, key=lambda pair: rank[pair[0]])
+            if not kept:
+                return None
+            tail *= 2
+    
+    @staticmethod
+    def _swiss_search_pairings(
+        players: List[int],
+        wins: np.ndarray,
+        opponents: List[Set[int]]
+    ) -> Optional[List[Tuple[int, int]]]:
+        """
+        Depth-first search for a pairing without rematches
+        The highest ranked unpaired player is paired first, trying opponents
+        in score-group order: the bottom half of its group from the top, then
+        the rest of the top half, then lower groups. Sets of unpaired players
+        already shown to have no pairing are remembered, so each is searched
+        once; in practice only the last few pairings are revisited.
         
         Returns:
-            Detailed match information
+            Pairings, or None if every pairing has a rematch
+        """
+        paired = [False] * len(players)
+        paired_mask = 0
+        failed: Set[int] = set()
+        # Each frame is [player position, candidate positions, next candidate]
+        stack: List[list] = []
+        
+        def candidates(position: int) -> List[int]:
+            player = players[position]
+            rest = [other for other in range(position + 1, len(players)) if not paired[other]]
+            if not rest:
+                return []
+            # A player alone in its score group is the top of the next group
+            score = wins[player] if wins[players[rest[0]]] == wins[player] else wins[players[rest[0]]]
+            group = [position] + [other for other in rest if wins[players[other]] == score]
+            half = len(group) // 2
+            preferred = group[half:] + group[half - 1:0:-1]
+            preferred_set = set(preferred)
+            return [
+                other for other in preferred + [other for other in rest if other not in preferred_set]
+                if players[other] not in opponents[player]
+            ]
+        
+        position = 0
+        while True:
+            while position < len(players) and paired[position]:
+                position += 1
+            if position == len(players):
+                return [(players[frame[0]], players[frame[1][frame[2] - 1]]) for frame in stack]
+            if paired_mask not in failed:
+                paired[position] = True
+                paired_mask |= 1 << position
+                stack.append([position, candidates(position), 0])
+            
+            # Advance to the next untried opponent, backtracking as needed
+            while stack:
+                frame = stack[-1]
+                if frame[2] > 0:
+                    previous = frame[1][frame[2] - 1]
+                    paired[previous] = False
+                    paired_mask &= ~(1 << previous)
+                if frame[2] < len(frame[1]):
+                    partner = frame[1][frame[2]]
+                    frame[2] += 1
+                    paired[partner] = True
+                    paired_mask |= 1 << partner
+                    break
+                stack.pop()
+                paired[frame[0]] = False
+                paired_mask &= ~(1 << frame[0])
+                failed.add(paired_mask)
+            else:
+                return None
+            position = frame[0] + 1
+    
+    @classmethod
+    def match_summaries(cls, tournament_bracket: TournamentBracket) -> Iterator[Dict]:
+        """
+        Yield an API summary of every match, whichever engine played them
         """
-        # Simulate battle using first Pokemon from each team
-        battle_result = PokemonBattleService.simulate_battle(
-            participant1.team[0], 
-            participant2.team[0]
+        for record in tournament_bracket.store:
+            yield cls.match_summary(tournament_bracket, record)
+    
+    @staticmethod
+    def match_summary(tournament_bracket: TournamentBracket, match: MatchRecord) -> Dict:
+        """
+        API summary of one match, resolved straight from the compact record
+        """
+        participants = tournament_bracket.participants
+        summary = {
+            "round": match.round_number,
+            "stage": match.stage,
+            "participants": [
+                participants[match.participant1].name,
+                participants[match.participant2].name
+            ],
+            "winner": participants[match.winner].name,
+            "loser": participants[match.loser].name
+        }
+        if match.replay is not None:
+            summary["replay"] = match.replay.hex()
+        return summary
+    
+    @classmethod
+    def match_view(cls, tournament_bracket: TournamentBracket, match: MatchRecord) -> TournamentMatch:
+        """
+        Pydantic view of a compact match record
+        """
+        participants = tournament_bracket.participants
+        return cls._build_match(
+            participants[match.participant1],
+            participants[match.participant2],
+            match.round_number,
+            match.winner == match.participant1,
+            match.replay
         )
+    
+    @staticmethod
+    def check_forecastable(tournament_type: TournamentType):
+        """
+        Raise ValueError for tournament types forecast_tournament cannot model
+        """
+        if tournament_type != TournamentType.SINGLE_ELIMINATION:
+            raise ValueError(
+                f"Forecasts are only available for {TournamentType.SINGLE_ELIMINATION.value} tournaments"
+            )
+    
+    @classmethod
+    def forecast_tournament(
+        cls,
+        tournament_bracket: TournamentBracket,
+        simulations: int = 10_000,
+        samples_per_pair: int = 128,
+        seed: Optional[int] = None
+    ) -> TournamentForecast:
+        """
+        Run the same bracket many times and report how far each participant gets
+        Only single elimination is modelled: the runs replay its seeded layout.
+        Pairwise win probabilities are estimated once with batched team battles;
+        every simulated run then only draws one random number per match, and all
+        runs advance through the bracket together as arrays
         
-        # Determine winner and loser
-        winner = (participant1 if battle_result.winner == participant1.team[0] 
-                  else participant2)
-        loser = (participant2 if winner == participant1 
-                 else participant1)
+        Args:
+            tournament_bracket: Bracket to forecast; it is not modified
+            simulations: Number of simulated tournaments, at most FORECAST_MAX_SIMULATIONS
+            samples_per_pair: Battles used to estimate each pairwise win probability
+            seed: Seed for the forecast, defaults to the bracket seed
         
-        # Create match details
-        match = TournamentMatch(
-            participants=(participant1, participant2),
-            winner=winner,
-            loser=loser,
-            round_number=round_number,
-            match_details={
-                "rounds": battle_result.rounds,
-                "damage_dealt": battle_result.damage_dealt
-            }
+        Returns:
+            Per-participant probabilities of reaching each round and of winning
+        """
+        if not 1 <= simulations <= FORECAST_MAX_SIMULATIONS:
+            raise ValueError(f"simulations must be between 1 and {FORECAST_MAX_SIMULATIONS}")
+        cls.check_forecastable(tournament_bracket.tournament_type)
+        if seed is None:
+            seed = tournament_bracket.seed
+        
+        participants = tournament_bracket.participants
+        win_probability = TeamBattleService.pairwise_win_matrix(
+            [TeamStats.from_team(participant.team) for participant in participants],
+            samples=samples_per_pair,
+            seed=derive_seed(seed, 0)
         )
+        rng = np.random.default_rng(derive_seed(seed, 1))
         
-        return match
+        # Empty first-round slots hold a sentinel participant that always
+        # loses, so byes resolve in the same vectorized step as the matches
+        bye = len(participants)
+        win_probability = np.pad(win_probability, ((0, 1), (0, 1)))
+        win_probability[:bye, bye] = 1.0
+        layout = [bye if slot is None else slot for slot in cls._seeded_slots(len(participants))]
+        
+        # slots[s, k] is the participant in bracket position k of simulation s
+        slots = np.tile(np.array(layout), (simulations, 1))
+        reached = [np.full(len(participants), simulations)]
+        
+        while slots.shape[1] > 1:
+            first = slots[:, 0::2]
+            second = slots[:, 1::2]
+            first_wins = rng.random(first.shape) < win_probability[first, second]
+            slots = np.where(first_wins, first, second)
+            reached.append(np.bincount(slots.ravel(), minlength=bye + 1)[:bye])
+        
+        reached = np.stack(reached) / simulations
+        return TournamentForecast(
+            tournament_type=tournament_bracket.tournament_type,
+            simulations=simulations,
+            total_rounds=len(reached) - 1,
+            participants=[
+                ParticipantForecast(
+                    name=participant.name,
+                    round_probabilities=reached[:-1, index].tolist(),
+                    champion_probability=float(reached[-1, index])
+                )
+                for index, participant in enumerate(participants)
+            ]
+        )
     
     @staticmethod
-    def _pad_participants(
-        participants: List[List[Pokemon]]
-    ) -> List[List[Pokemon]]:
+    def _play_matches(
+        jobs: List[MatchJob],
+        executor: Optional[Executor] = None,
+        job_function: Callable[[MatchJob], Tuple] = play_match_job
+    ) -> Iterator[Tuple]:
+        """
+        Play a round's matches serially or on a worker pool, preserving order
+        Results are produced lazily, so callers see each one as soon as it is ready
         """
-        Pad participant list to nearest power of 2
+        if executor is None or len(jobs) < 2:
+            return (job_function(job) for job in jobs)
+        chunksize = max(1, len(jobs) // MATCH_CHUNKS_PER_ROUND)
+        return executor.map(job_function, jobs, chunksize=chunksize)
+    
+    @classmethod
+    def _play_recorded_round(
+        cls,
+        tournament_bracket: TournamentBracket,
+        team_stats: List[TeamStats],
+        pairings: List[Tuple[int, int]],
+        stage: str,
+        standings: TournamentStandings,
+        executor: Optional[Executor] = None,
+        with_replays: bool = False,
+        byes: int = 0
+    ) -> RoundGenerator:
+        """
+        Play one round of index pairings, yielding a compact MatchRecord per
+        match and a RoundSummary at the end
         
         Args:
-            participants: Original list of participants
+            with_replays: Encode a replay for every match
+            byes: Number of participants advancing this round without a match
         
         Returns:
-            Padded list of participants
+            Winners and losers of the round, in pairing order
         """
-        # Find next power of 2
-        next_power_of_two = 2 ** ((len(participants) - 1).bit_length())
+        round_number = tournament_bracket.current_round
+        results = cls._play_matches(
+            [
+                (
+                    team_stats[participant1],
+                    team_stats[participant2],
+                    derive_seed(tournament_bracket.seed, round_number, match_index)
+                )
+                for match_index, (participant1, participant2) in enumerate(pairings)
+            ],
+            executor,
+            play_match_job if with_replays else play_match_result_job
+        )
         
-        # If already a power of 2, return original
-        if len(participants) == next_power_of_two:
-            return participants
+        participants = tournament_bracket.participants
+        winners = []
+        losers = []
+        for match_index, ((participant1, participant2), result) in enumerate(zip(pairings, results)):
+            team1_won, knockouts = result[:2]
+            replay = result[2] if with_replays else None
+            winner, loser = (participant1, participant2) if team1_won else (participant2, participant1)
+            standings.record(participant1, participant2, team1_won, knockouts)
+            participants[winner].wins += 1
+            participants[loser].losses += 1
+            winners.append(winner)
+            losers.append(loser)
+            yield MatchRecord(round_number, match_index, participant1, participant2, winner, stage, replay)
         
-        # Create placeholder teams to fill bracket
-        placeholder_teams = [
-            [Pokemon(name=f"Bye Team {i}", type_1="Normal", level=1)] 
-            for i in range(next_power_of_two - len(participants))
-        ]
+        yield RoundSummary(round_number, stage, len(pairings), byes)
+        tournament_bracket.current_round += 1
+        return winners, losers
+    
+    @classmethod
+    def _play_seeded_round(
+        cls,
+        tournament_bracket: TournamentBracket,
+        team_stats: List[TeamStats],
+        standings: TournamentStandings,
+        executor: Optional[Executor] = None,
+        with_replays: bool = False
+    ) -> RoundGenerator:
+        """
+        Play the first winners round from the seeded layout; participants with
+        a bye advance without a match, leaving a power of two entrants
+        
+        Returns:
+            Second-round entrants in bracket order, and the first-round losers
+        """
+        slot_pairs = cls._pair_slots(cls._seeded_slots(len(team_stats)))
+        pairings = [(first, second) for first, second in slot_pairs if second is not None]
+        winners, losers = yield from cls._play_recorded_round(
+            tournament_bracket,
+            team_stats,
+            pairings,
+            WINNERS_STAGE,
+            standings,
+            executor,
+            with_replays=with_replays,
+            byes=len(slot_pairs) - len(pairings)
+        )
+        return cls._merge_byes(slot_pairs, winners), losers
+    
+    @staticmethod
+    def _round_robin_schedule(count: int) -> Iterator[List[Tuple[int, int]]]:
+        """
+        Circle-method schedule: the first position stays fixed while the others
+        rotate one step per round, so every pair meets exactly once. With an odd
+        count one participant sits out each round.
+        """
+        slots: List[Optional[int]] = list(range(count))
+        if count % 2:
+            slots.append(None)
+        half = len(slots) // 2
+        
+        for round_index in range(len(slots) - 1):
+            pairings = []
+            for i in range(half):
+                first, second = slots[i], slots[-1 - i]
+                if first is None or second is None:
+                    continue
+                # Alternate who is listed first, since team 1 wins speed ties
+                pairings.append((first, second) if (round_index + i) % 2 == 0 else (second, first))
+            yield pairings
+            slots.insert(1, slots.pop())
+    
+    @staticmethod
+    def _seeded_slots(count: int) -> List[Optional[int]]:
+        """
+        First-round bracket positions for participants 0..count-1 in seed order
+        The field is rounded up to a power of two with the standard layout
+        (1 v 16, 8 v 9, ...), so the top seeds meet the empty slots, marked None
+        """
+        order = [0]
+        while len(order) < count:
+            size = 2 * len(order)
+            order = [position for seed in order for position in (seed, size - 1 - seed)]
+        return [position if position < count else None for position in order]
+    
+    @staticmethod
+    def _pair_slots(slots: List[Optional[int]]) -> List[Tuple[int, Optional[int]]]:
+        """
+        Pair neighbouring bracket positions; in the seeded layout the better
+        seed comes first and is never an empty slot
+        """
+        return list(zip(slots[0::2], slots[1::2]))
+    
+    @staticmethod
+    def _merge_byes(slot_pairs: List[Tuple[int, Optional[int]]], winners: List[int]) -> List[int]:
+        """
+        Entrants of the second round in bracket order, from the first-round
+        winners and the participants who had a bye
+        """
+        match_winners = iter(winners)
+        return [first if second is None else next(match_winners) for first, second in slot_pairs]
+    
+    @staticmethod
+    def _pair_in_order(entrants: List[int]) -> Tuple[List[Tuple[int, int]], List[int]]:
+        """
+        Pair neighbours; an unpaired last entrant advances without playing
+        """
+        pairings = [(entrants[i], entrants[i + 1]) for i in range(0, len(entrants) - 1, 2)]
+        return pairings, entrants[len(pairings) * 2:]
+    
+    @staticmethod
+    def _interleave(first: List[int], second: List[int]) -> List[int]:
+        merged = [entrant for pair in zip(first, second) for entrant in pair]
+        shorter = min(len(first), len(second))
+        return merged + first[shorter:] + second[shorter:]
+    
+    @staticmethod
+    def _build_match(
+        participant1: TournamentParticipant, 
+        participant2: TournamentParticipant,
+        round_number: int,
+        team1_won: bool,
+        replay: Optional[bytes]
+    ) -> TournamentMatch:
+        # Determine winner and loser
+        winner = participant1 if team1_won else participant2
+        loser = participant2 if team1_won else participant1
         
-        return participants + placeholder_teams
\ No newline at end of file
+        # Store a compact replay instead of verbose match details
+        return TournamentMatch(
+            participants=(participant1, participant2),
+            winner=winner,
+            loser=loser,
+            round_number=round_number,
+            replay=replay
+        )
@@ -0,0 +1,80 @@
+import json
+from typing import AsyncIterator, Callable, Dict, List, Optional
+from app.services.simulation_executor import SimulationExecutor
+from app.services.tournament_service import (
+    AdvancedTournamentService,
+    TournamentBracket,
+    TournamentEvent,
+    RoundSummary
+)
+from app.services.bracket_store import MatchRecord
+
+MatchListener = Callable[[List[MatchRecord]], None]
+
+class TournamentStreamService:
+    @staticmethod
+    def format_event(event: str, data: Dict) -> str:
+        """
+        Format one Server-Sent Event
+        """
+        return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+    @classmethod
+    async def stream_events(
+        cls,
+        events: AsyncIterator[List[TournamentEvent]],
+        tournament_bracket: TournamentBracket,
+        on_matches: Optional[MatchListener] = None
+    ) -> AsyncIterator[str]:
+        """
+        Turn batches of tournament events into Server-Sent Events
+        Emits a "match" event per match, a "round" event per finished round and
+        a final "tournament" event with the champion and standings
+
+        Args:
+            events: Event batches from SimulationExecutor.stream_tournament
+            tournament_bracket: Bracket being simulated, used to resolve names
+            on_matches: Called with each batch's matches as they are decided
+        """
+        try:
+            async for batch in events:
+                chunk = []
+                matches = []
+                for event in batch:
+                    if isinstance(event, RoundSummary):
+                        chunk.append(cls.format_event("round", event._asdict()))
+                    else:
+                        matches.append(event)
+                        chunk.append(cls.format_event(
+                            "match", AdvancedTournamentService.match_summary(tournament_bracket, event)
+                        ))
+                if on_matches is not None and matches:
+                    on_matches(matches)
+                yield "".join(chunk)
+        finally:
+            # Stop the simulation promptly if the client disconnects
+            await events.aclose()
+
+        yield cls.format_event("tournament", {
+            "tournament_type": tournament_bracket.tournament_type.value,
+            "champion": tournament_bracket.champion.name,
+            "total_rounds": tournament_bracket.current_round,
+            "seed": tournament_bracket.seed,
+            "byes": [tournament_bracket.participants[index].name for index in tournament_bracket.byes],
+            "standings": [standing.model_dump() for standing in tournament_bracket.standings]
+        })
+
+    @classmethod
+    def open_stream(
+        cls,
+        executor: SimulationExecutor,
+        tournament_bracket: TournamentBracket,
+        on_matches: Optional[MatchListener] = None
+    ) -> AsyncIterator[str]:
+        """
+        Start streaming a tournament
+
+        Raises:
+            SimulationQueueFullError: If the executor is saturated
+        """
+        return cls.stream_events(executor.stream_tournament(tournament_bracket), tournament_bracket, on_matches)
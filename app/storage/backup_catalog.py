@@ -0,0 +1,173 @@
+import threading
+from datetime import datetime
+from typing import Callable, List, NamedTuple, Optional
+from sqlalchemy.orm import Session
+from app.models.storage_models import BackupModel, StorageModel
+from app.storage.backup_store import BackupManifest
+
+class BackupEntry(NamedTuple):
+    """
+    Catalog entry for one backup
+    """
+    backup_id: str
+    storage_id: str
+    backup_timestamp: datetime
+    size: int
+
+class BackupCatalog:
+    """
+    Persistent index of backups in the storage_backups table
+    Entries are indexed by backup root, storage ID and backup time, so the
+    latest backup of a record, or its latest backup as of a given time, is a
+    single index seek that never touches the backup directories. The backup
+    root is the absolute path of the backup store holding the manifests, so
+    stores sharing a database only see their own backups. Timestamps are local
+    time, like the last_updated field of stored records.
+
+    The catalog also keeps the storage_entries row of each record saved on a
+    user's behalf, which records the user owning its backups
+    """
+    def __init__(self, session_factory: Callable[[], Session]):
+        """
+        :param session_factory: Creates database sessions
+        """
+        self.session_factory = session_factory
+        # The SQLite engine shares one connection between threads
+        self._lock = threading.Lock()
+
+    def claim(self, storage_id: str, user_id: int, data_type: str, size: int):
+        """
+        Record a save of a record owned by a user, creating its storage entry
+        on the first save
+
+        :param storage_id: Unique identifier for the storage entry
+        :param user_id: User saving the record
+        :param data_type: Kind of record
+        :param size: Serialized size of the record in bytes
+        :raises PermissionError: If another user owns the record
+        """
+        with self._lock:
+            db = self.session_factory()
+            try:
+                entry = db.query(StorageModel).filter(StorageModel.storage_id == storage_id).first()
+                if entry is None:
+                    db.add(StorageModel(storage_id=storage_id, user_id=user_id, data_type=data_type, total_size=size))
+                elif entry.user_id != user_id:
+                    raise PermissionError(f"Storage ID {storage_id} belongs to another user")
+                else:
+                    entry.total_size = size
+                    entry.last_updated = datetime.utcnow()
+                db.commit()
+            finally:
+                db.close()
+
+    def owner(self, storage_id: str) -> Optional[int]:
+        """
+        User owning a record, or None if it was not saved on a user's behalf
+        """
+        with self._lock:
+            db = self.session_factory()
+            try:
+                return db.query(StorageModel.user_id).filter(StorageModel.storage_id == storage_id).scalar()
+            finally:
+                db.close()
+
+    def record(self, backup_root: str, manifest: BackupManifest):
+        """
+        Add a backup written to the backup store at backup_root
+        """
+        with self._lock:
+            db = self.session_factory()
+            try:
+                db.add(BackupModel(
+                    backup_id=manifest.backup_id,
+                    original_storage_id=manifest.storage_id,
+                    backup_root=backup_root,
+                    backup_timestamp=datetime.fromisoformat(manifest.created_at),
+                    backup_metadata={'size': manifest.size, 'chunks': len(manifest.chunks)}
+                ))
+                db.commit()
+            finally:
+                db.close()
+
+    def latest(
+        self,
+        backup_root: str,
+        storage_id: str,
+        as_of: Optional[datetime] = None
+    ) -> Optional[BackupEntry]:
+        """
+        Newest backup of a record, or None
+
+        :param backup_root: Absolute path of the backup store
+        :param storage_id: Unique identifier for the storage entry
+        :param as_of: Only consider backups taken at or before this time
+        :return: Catalog entry of the backup
+        """
+        entries = self.history(backup_root, storage_id, as_of, limit=1)
+        return entries[0] if entries else None
+
+    def history(
+        self,
+        backup_root: str,
+        storage_id: str,
+        as_of: Optional[datetime] = None,
+        limit: Optional[int] = None
+    ) -> List[BackupEntry]:
+        """
+        Backups of a record, newest first
+
+        :param backup_root: Absolute path of the backup store
+        :param storage_id: Unique identifier for the storage entry
+        :param as_of: Only include backups taken at or before this time
+        :param limit: Most entries to return
+        :return: Catalog entries
+        """
+        with self._lock:
+            db = self.session_factory()
+            try:
+                query = db.query(
+                    BackupModel.backup_id,
+                    BackupModel.backup_timestamp,
+                    BackupModel.backup_metadata
+                ).filter(
+                    BackupModel.backup_root == backup_root,
+                    BackupModel.original_storage_id == storage_id
+                )
+                if as_of is not None:
+                    query = query.filter(BackupModel.backup_timestamp <= as_of)
+                # The id breaks ties between backups taken in the same microsecond
+                query = query.order_by(BackupModel.backup_timestamp.desc(), BackupModel.id.desc())
+                if limit is not None:
+                    query = query.limit(limit)
+                return [
+                    BackupEntry(backup_id, storage_id, backup_timestamp, (metadata or {}).get('size', 0))
+                    for backup_id, backup_timestamp, metadata in query
+                ]
+            finally:
+                db.close()
+
+    def expire(self, backup_root: str, storage_id: str, keep: int) -> List[str]:
+        """
+        Remove all but the newest keep entries of a record in the backup store
+        at backup_root
+
+        :return: Backup IDs removed, whose manifests the caller deletes
+        """
+        with self._lock:
+            db = self.session_factory()
+            try:
+                expired = db.query(BackupModel.id, BackupModel.backup_id).filter(
+                    BackupModel.backup_root == backup_root,
+                    BackupModel.original_storage_id == storage_id
+                ).order_by(
+                    BackupModel.backup_timestamp.desc(), BackupModel.id.desc()
+                ).offset(keep).all()
+                if expired:
+                    db.query(BackupModel).filter(
+                        BackupModel.id.in_([row_id for row_id, _ in expired])
+                    ).delete(synchronize_session=False)
+                    db.commit()
+                return [backup_id for _, backup_id in expired]
+            finally:
+                db.close()
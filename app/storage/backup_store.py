@@ -0,0 +1,250 @@
+import os
+import json
+import uuid
+import time
+import zlib
+import hashlib
+from datetime import datetime
+from typing import Any, Dict, List, NamedTuple, Optional
+import numpy as np
+
+# Content-defined chunking: a boundary follows any byte where the hash of the
+# preceding CHUNK_WINDOW bytes has its masked bits all zero, giving chunks of
+# about 1 KiB that survive insertions and deletions elsewhere in the record
+CHUNK_WINDOW = 48
+CHUNK_MASK = (1 << 10) - 1
+CHUNK_MIN_BYTES = 256
+CHUNK_MAX_BYTES = 8 * 1024
+# Chunks this recent survive garbage collection, so a backup that has written
+# or reused chunks but not yet its manifest never loses them
+GC_GRACE_SECONDS = 300
+
+CHUNK_DIRECTORY = '.chunks'
+MANIFEST_SUFFIX = '.manifest'
+# Separates the storage ID from the manifest name in a backup ID
+BACKUP_ID_SEPARATOR = '@'
+
+def _gear_table() -> np.ndarray:
+    # Derived from a fixed hash so chunk boundaries never change between runs
+    return np.array([
+        int.from_bytes(hashlib.blake2b(bytes([value]), digest_size=8).digest(), 'little')
+        for value in range(256)
+    ], dtype=np.uint64)
+
+_GEAR = _gear_table()
+
+def chunk_boundaries(data: bytes) -> List[int]:
+    """
+    End offsets of the content-defined chunks of data
+    The rolling hash is a windowed sum of per-byte random values, computed for
+    every position at once from a cumulative sum
+    """
+    size = len(data)
+    if size <= CHUNK_MIN_BYTES:
+        return [size] if size else []
+
+    sums = np.cumsum(_GEAR[np.frombuffer(data, dtype=np.uint8)], dtype=np.uint64)
+    window = sums[CHUNK_WINDOW:] - sums[:-CHUNK_WINDOW]
+    candidates = np.flatnonzero(((window >> np.uint64(32)) & np.uint64(CHUNK_MASK)) == 0) + CHUNK_WINDOW + 1
+
+    boundaries = []
+    last = 0
+    for cut in candidates.tolist():
+        while cut - last > CHUNK_MAX_BYTES:
+            last += CHUNK_MAX_BYTES
+            boundaries.append(last)
+        if cut - last >= CHUNK_MIN_BYTES:
+            boundaries.append(cut)
+            last = cut
+    while size - last > CHUNK_MAX_BYTES:
+        last += CHUNK_MAX_BYTES
+        boundaries.append(last)
+    if last < size:
+        boundaries.append(size)
+    return boundaries
+
+class BackupManifest(NamedTuple):
+    """
+    One backup: the ordered chunk hashes that reassemble the record
+    """
+    backup_id: str
+    storage_id: str
+    created_at: str
+    size: int
+    chunks: List[str]
+
+class ContentAddressedBackupStore:
+    """
+    Deduplicating backup store
+    Records are split into content-defined chunks stored once each under their
+    SHA-256, compressed; a backup is a small manifest listing its chunks, so
+    successive backups of a record only add the chunks that changed
+    """
+    def __init__(self, backup_path: str):
+        """
+        :param backup_path: Root directory for chunks and manifests
+        """
+        self.backup_path = backup_path
+        self.chunk_path = os.path.join(backup_path, CHUNK_DIRECTORY)
+        os.makedirs(self.chunk_path, exist_ok=True)
+
+    @staticmethod
+    def make_backup_id(storage_id: str, created_at: datetime) -> str:
+        # Names sort chronologically within a record's manifest directory
+        return f"{storage_id}{BACKUP_ID_SEPARATOR}{created_at.strftime('%Y%m%d_%H%M%S_%f')}_{uuid.uuid4().hex[:8]}"
+
+    def _manifest_file(self, backup_id: str) -> str:
+        storage_id, separator, name = backup_id.rpartition(BACKUP_ID_SEPARATOR)
+        if not separator or not storage_id:
+            raise FileNotFoundError(f"Invalid backup ID {backup_id}")
+        return os.path.join(self.backup_path, storage_id, f'{name}{MANIFEST_SUFFIX}')
+
+    def _chunk_file(self, digest: str) -> str:
+        return os.path.join(self.chunk_path, digest[:2], digest)
+
+    def write_backup(self, storage_id: str, payload: bytes, created_at: Optional[datetime] = None) -> BackupManifest:
+        """
+        Store a backup of a record, writing only chunks not already stored
+
+        :param storage_id: Unique identifier for the storage entry
+        :param payload: Serialized record
+        :param created_at: Backup time, defaults to now
+        :return: Manifest of the new backup
+        """
+        created_at = created_at or datetime.now()
+        chunks = []
+        start = 0
+        for end in chunk_boundaries(payload):
+            chunk = payload[start:end]
+            digest = hashlib.sha256(chunk).hexdigest()
+            self._store_chunk(digest, chunk)
+            chunks.append(digest)
+            start = end
+
+        manifest = BackupManifest(
+            backup_id=self.make_backup_id(storage_id, created_at),
+            storage_id=storage_id,
+            created_at=created_at.isoformat(),
+            size=len(payload),
+            chunks=chunks
+        )
+        manifest_file = self._manifest_file(manifest.backup_id)
+        os.makedirs(os.path.dirname(manifest_file), exist_ok=True)
+        self._write_atomic(manifest_file, json.dumps(manifest._asdict()).encode('utf-8'))
+        return manifest
+
+    def _store_chunk(self, digest: str, chunk: bytes):
+        chunk_file = self._chunk_file(digest)
+        if os.path.exists(chunk_file):
+            try:
+                # Refresh the mtime so a concurrent collection treats it as in use
+                os.utime(chunk_file)
+                return
+            except FileNotFoundError:
+                pass  # Collected just now; store it again
+        os.makedirs(os.path.dirname(chunk_file), exist_ok=True)
+        self._write_atomic(chunk_file, zlib.compress(chunk))
+
+    @staticmethod
+    def _write_atomic(file_path: str, content: bytes):
+        temporary_file = f'{file_path}.{uuid.uuid4().hex}.tmp'
+        with open(temporary_file, 'wb') as f:
+            f.write(content)
+        os.replace(temporary_file, file_path)
+
+    def read_manifest(self, backup_id: str) -> BackupManifest:
+        with open(self._manifest_file(backup_id), 'rb') as f:
+            return BackupManifest(**json.loads(f.read()))
+
+    def restore(self, backup_id: str) -> bytes:
+        """
+        Reassemble a record from its manifest, verifying every chunk
+
+        :param backup_id: Backup to restore
+        :return: Serialized record
+        """
+        manifest = self.read_manifest(backup_id)
+        parts = []
+        for digest in manifest.chunks:
+            with open(self._chunk_file(digest), 'rb') as f:
+                chunk = zlib.decompress(f.read())
+            if hashlib.sha256(chunk).hexdigest() != digest:
+                raise ValueError(f"Corrupt chunk {digest} in backup {backup_id}")
+            parts.append(chunk)
+        return b''.join(parts)
+
+    def list_backups(self, storage_id: str) -> List[str]:
+        """
+        Backup IDs of a record, newest first
+        """
+        manifest_dir = os.path.join(self.backup_path, storage_id)
+        if not os.path.isdir(manifest_dir):
+            return []
+        names = sorted(
+            (file_name[:-len(MANIFEST_SUFFIX)] for file_name in os.listdir(manifest_dir)
+             if file_name.endswith(MANIFEST_SUFFIX)),
+            reverse=True
+        )
+        return [f'{storage_id}{BACKUP_ID_SEPARATOR}{name}' for name in names]
+
+    def delete_backup(self, backup_id: str):
+        """
+        Delete a manifest; its chunks are reclaimed by collect_garbage
+        """
+        try:
+            os.remove(self._manifest_file(backup_id))
+        except FileNotFoundError:
+            pass
+
+    def collect_garbage(self) -> Dict[str, int]:
+        """
+        Delete chunks that no manifest references, mark and sweep
+
+        :return: Counts of chunks kept and removed, and bytes freed
+        """
+        started = time.time()
+        referenced = set()
+        for entry in os.scandir(self.backup_path):
+            if not entry.is_dir() or entry.name == CHUNK_DIRECTORY:
+                continue
+            for manifest in os.scandir(entry.path):
+                if not manifest.name.endswith(MANIFEST_SUFFIX):
+                    continue
+                try:
+                    with open(manifest.path, 'rb') as f:
+                        referenced.update(json.loads(f.read())['chunks'])
+                except FileNotFoundError:
+                    continue  # Pruned while scanning
+
+        kept = removed = freed = 0
+        for prefix in os.scandir(self.chunk_path):
+            if not prefix.is_dir():
+                continue
+            for chunk in os.scandir(prefix.path):
+                try:
+                    stat = chunk.stat()
+                except FileNotFoundError:
+                    continue  # Removed by a concurrent collection
+                if chunk.name in referenced or stat.st_mtime > started - GC_GRACE_SECONDS:
+                    kept += 1
+                    continue
+                try:
+                    os.remove(chunk.path)
+                except FileNotFoundError:
+                    continue
+                removed += 1
+                freed += stat.st_size
+        return {'chunks_kept': kept, 'chunks_removed': removed, 'bytes_freed': freed}
+
+    def stats(self) -> Dict[str, Any]:
+        chunks = 0
+        stored = 0
+        for prefix in os.scandir(self.chunk_path):
+            if prefix.is_dir():
+                for chunk in os.scandir(prefix.path):
+                    try:
+                        stored += chunk.stat().st_size
+                    except FileNotFoundError:
+                        continue
+                    chunks += 1
+        return {'chunks': chunks, 'chunk_bytes': stored}
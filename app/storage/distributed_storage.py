@@ -1,21 +1,108 @@
 import os
+import re
 import json
+import math
 import uuid
+import time
+import random
 import asyncio
-from typing import Dict, Any, Optional
+import weakref
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, Callable, Iterable, List, Optional, Set, Tuple, TypeVar
 from datetime import datetime, timedelta
-import shutil
+from app.storage.hash_ring import ConsistentHashRing
+from app.storage.segment_storage import open_segment_store
+from app.storage.backup_store import BackupManifest, ContentAddressedBackupStore
+from app.storage.backup_catalog import BackupCatalog, BackupEntry
+
+# Ring membership file, kept in the primary storage root
+RING_FILE = 'ring.json'
+# Shard directory names; anything else could point outside the storage root
+SHARD_NAME_PATTERN = re.compile(r'shard_[0-9]+')
+# How often each process checks the ring file for changes made by other workers
+RING_RELOAD_SECONDS = 1.0
+# Keys moved by a rebalance per trip to the I/O pool
+REBALANCE_BATCH = 100
+# Threads shared by every storage manager for blocking file I/O
+STORAGE_IO_WORKERS = 16
+# File operations allowed in flight per shard
+SHARD_IO_CONCURRENCY = 4
+
+# Primary record backends: one JSON file per record, or append-only segments
+STORAGE_BACKEND_FILES = 'files'
+STORAGE_BACKEND_SEGMENTS = 'segments'
+STORAGE_BACKEND = STORAGE_BACKEND_FILES
+
+storage_io_executor = ThreadPoolExecutor(max_workers=STORAGE_IO_WORKERS, thread_name_prefix='storage-io')
+
+T = TypeVar('T')
+
+class StorageLatency:
+    """
+    Simulated storage latency, added before every write when configured
+    """
+    DISTRIBUTIONS = ('fixed', 'uniform', 'exponential', 'lognormal')
+    
+    def __init__(self, mean: float = 0.1, distribution: str = 'fixed', spread: float = 0.0, seed: Optional[int] = None):
+        """
+        :param mean: Mean latency in seconds; the median for lognormal
+        :param distribution: One of DISTRIBUTIONS
+        :param spread: Half-width for uniform, sigma for lognormal
+        :param seed: Seed for reproducible latencies
+        """
+        if distribution not in self.DISTRIBUTIONS:
+            raise ValueError(f"Unknown latency distribution {distribution}")
+        self.mean = mean
+        self.distribution = distribution
+        self.spread = spread
+        self._random = random.Random(seed)
+    
+    def sample(self) -> float:
+        """
+        Draw one latency in seconds
+        """
+        if self.distribution == 'uniform':
+            return max(0.0, self._random.uniform(self.mean - self.spread, self.mean + self.spread))
+        if self.distribution == 'exponential':
+            return self._random.expovariate(1 / self.mean) if self.mean > 0 else 0.0
+        if self.distribution == 'lognormal':
+            return self._random.lognormvariate(math.log(self.mean), self.spread) if self.mean > 0 else 0.0
+        return self.mean
 
 class DistributedTrainerStorageManager:
     """
     Advanced distributed storage manager simulating cloud-like storage
+    Records are placed on shards by a consistent-hash ring, so placement is the
+    same in every process and resizing only moves the keys that change shard
     """
+    # Ring per storage root, shared by every manager in the process
+    _rings: Dict[str, ConsistentHashRing] = {}
+    # Modification time of the ring file each ring was loaded from or saved
+    # to, and when it was last checked, per storage root
+    _ring_versions: Dict[str, Optional[int]] = {}
+    _ring_checked: Dict[str, float] = {}
+    # Ring a running rebalance is moving keys away from, per storage root
+    _previous_rings: Dict[str, ConsistentHashRing] = {}
+    # Shard directories known to exist
+    _created_shards: Set[str] = set()
+    # Per-shard semaphores for each event loop
+    _shard_limits: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, asyncio.Semaphore]]" = (
+        weakref.WeakKeyDictionary()
+    )
+    # Simulated latency; None, the default, adds none. Set on the class to
+    # configure every manager, or on one instance
+    latency: Optional[StorageLatency] = None
+    # Primary record backend, configured the same way
+    backend: str = STORAGE_BACKEND
+    
     def __init__(
         self, 
         base_storage_path: str = './trainer_storage', 
         backup_path: str = './trainer_backups',
         max_backups: int = 5,
-        shard_count: int = 3
+        shard_count: int = 3,
+        catalog: Optional[BackupCatalog] = None
     ):
         """
         Initialize storage manager
@@ -23,16 +110,80 @@ class DistributedTrainerStorageManager:
         :param base_storage_path: Primary storage location
         :param backup_path: Backup storage location
         :param max_backups: Maximum number of backups to retain
-        :param shard_count: Number of virtual shards for data distribution
+        :param shard_count: Number of virtual shards for data distribution,
+            used until the shards are changed with add_shard or remove_shard
+        :param catalog: Index of backups by record and time; without one,
+            backups are found by listing their manifests
         """
         self.base_storage_path = base_storage_path
         self.backup_path = backup_path
         self.max_backups = max_backups
-        self.shard_count = shard_count
+        self.catalog = catalog
         
         # Create storage directories
         os.makedirs(base_storage_path, exist_ok=True)
         os.makedirs(backup_path, exist_ok=True)
+        self.backup_store = ContentAddressedBackupStore(backup_path)
+        # Catalog entries are scoped to this backup store
+        self._backup_root = os.path.abspath(backup_path)
+        
+        self._ring_key = os.path.abspath(base_storage_path)
+        self._default_shard_count = shard_count
+        if self._ring_key not in self._rings:
+            self._reload_ring()
+        self.shard_count = len(self.ring)
+    
+    @property
+    def ring(self) -> ConsistentHashRing:
+        """
+        Current ring, reloaded when another worker has changed the ring file
+        """
+        now = time.monotonic()
+        if now - self._ring_checked.get(self._ring_key, 0.0) >= RING_RELOAD_SECONDS:
+            self._ring_checked[self._ring_key] = now
+            # A rebalance in this process owns the ring until it finishes
+            if (self._ring_key not in self._previous_rings
+                    and self._ring_file_version() != self._ring_versions.get(self._ring_key)):
+                self._reload_ring()
+        return self._rings[self._ring_key]
+    
+    def _ring_file_version(self) -> Optional[int]:
+        try:
+            return os.stat(os.path.join(self.base_storage_path, RING_FILE)).st_mtime_ns
+        except FileNotFoundError:
+            return None
+    
+    def _reload_ring(self):
+        self._ring_versions[self._ring_key] = self._ring_file_version()
+        self._ring_checked[self._ring_key] = time.monotonic()
+        self._rings[self._ring_key] = self._load_ring(self._default_shard_count)
+    
+    def _load_ring(self, shard_count: int) -> ConsistentHashRing:
+        """
+        Load the persisted ring, or start one with shard_count shards
+        
+        :param shard_count: Number of shards for a new ring
+        :return: Hash ring for this storage root
+        """
+        ring_file = os.path.join(self.base_storage_path, RING_FILE)
+        if os.path.exists(ring_file):
+            with open(ring_file, 'r') as f:
+                stored = json.load(f)
+            return ConsistentHashRing(stored['shards'], stored['virtual_nodes'])
+        return ConsistentHashRing(f'shard_{index}' for index in range(shard_count))
+    
+    def _save_ring(self, ring: ConsistentHashRing):
+        """
+        Persist ring membership so restarts and other workers place keys alike
+        
+        :param ring: Hash ring to persist
+        """
+        ring_file = os.path.join(self.base_storage_path, RING_FILE)
+        temporary_file = f'{ring_file}.tmp'
+        with open(temporary_file, 'w') as f:
+            json.dump({'shards': list(ring.shards), 'virtual_nodes': ring.virtual_nodes}, f)
+        os.replace(temporary_file, ring_file)
+        self._ring_versions[self._ring_key] = self._ring_file_version()
     
     def _get_shard_path(self, storage_id: str) -> str:
         """
@@ -41,18 +192,216 @@ class DistributedTrainerStorageManager:
         :param storage_id: Unique identifier for the storage entry
         :return: Shard path for storing/retrieving data
         """
-        shard_index = hash(storage_id) % self.shard_count
-        shard_path = os.path.join(self.base_storage_path, f'shard_{shard_index}')
-        os.makedirs(shard_path, exist_ok=True)
+        return self._ensure_shard(self.ring.shard_for(storage_id))
+    
+    async def add_shard(self, shard: Optional[str] = None) -> Dict[str, int]:
+        """
+        Add a shard to the ring and move the keys it now owns onto it
+        
+        :param shard: Shard name of the form shard_N, defaults to the next free one
+        :return: Keys scanned and moved
+        :raises ValueError: If the name is invalid or already in the ring
+        """
+        if shard is None:
+            taken = set(self.ring.shards)
+            index = len(taken)
+            while f'shard_{index}' in taken:
+                index += 1
+            shard = f'shard_{index}'
+        self._check_shard_name(shard)
+        if shard in self.ring:
+            raise ValueError(f"Shard {shard} is already in the ring")
+        
+        # Only keys on the existing shards can move, and only onto the new one
+        return await self._rebalance(self.ring.with_shard(shard), self.ring.shards)
+    
+    async def remove_shard(self, shard: str) -> Dict[str, int]:
+        """
+        Remove a shard from the ring, moving its keys to the remaining shards
+        
+        :param shard: Shard name
+        :return: Keys scanned and moved
+        """
+        self._check_shard_name(shard)
+        if len(self.ring) == 1:
+            raise ValueError("Cannot remove the last shard")
+        stats = await self._rebalance(self.ring.without_shard(shard), [shard])
+        
+        shard_path = os.path.join(self.base_storage_path, shard)
+        self._created_shards.discard(shard_path)
+        try:
+            await self._run_io(os.rmdir, shard_path)
+        except OSError:
+            pass
+        return stats
+    
+    @staticmethod
+    def _check_shard_name(shard: str):
+        if not SHARD_NAME_PATTERN.fullmatch(shard):
+            raise ValueError(f"Invalid shard name {shard!r}; expected shard_<n>")
+    
+    async def rebalance(self) -> Dict[str, int]:
+        """
+        Move every key that is not on its ring shard, e.g. records written
+        before the ring was introduced
+        
+        :return: Keys scanned and moved
+        """
+        shard_directories = await self._run_io(self._list_shard_directories)
+        return await self._rebalance(self.ring, shard_directories)
+    
+    async def _rebalance(self, ring: ConsistentHashRing, sources: Iterable[str]) -> Dict[str, int]:
+        """
+        Switch to a new ring and move misplaced keys out of the source shards
+        Writes go to the new ring at once; reads that miss fall back to the
+        previous ring until the move has finished
+        
+        :param ring: New hash ring
+        :param sources: Shards that may hold keys the new ring places elsewhere
+        :return: Keys scanned and moved
+        """
+        if self.backend != STORAGE_BACKEND_FILES:
+            raise ValueError("Rebalancing is only supported by the file backend")
+        if self._ring_key in self._previous_rings:
+            raise RuntimeError("A rebalance is already running for this storage")
+        
+        self._previous_rings[self._ring_key] = self.ring
+        self._rings[self._ring_key] = ring
+        self.shard_count = len(ring)
+        
+        scanned = 0
+        moved = 0
+        try:
+            await self._run_io(self._save_ring, ring)
+            for source in sources:
+                source_path = os.path.join(self.base_storage_path, source)
+                file_names = await self._run_io(self._list_records, source_path)
+                scanned += len(file_names)
+                for offset in range(0, len(file_names), REBALANCE_BATCH):
+                    moved += await self._run_io(
+                        self._move_records, ring, source, file_names[offset:offset + REBALANCE_BATCH]
+                    )
+        finally:
+            del self._previous_rings[self._ring_key]
+        
+        return {'scanned': scanned, 'moved': moved}
+    
+    def _move_records(self, ring: ConsistentHashRing, source: str, file_names: List[str]) -> int:
+        """
+        Move records the ring places on another shard; runs on the I/O pool
+        Hard-linking never replaces a file, so a write that reached the new
+        shard first is kept and the stale source copy is dropped
+        
+        :return: Number of records moved
+        """
+        moved = 0
+        source_path = os.path.join(self.base_storage_path, source)
+        for file_name in file_names:
+            target = ring.shard_for(file_name[:-len('.json')])
+            if target == source:
+                continue
+            source_file = os.path.join(source_path, file_name)
+            try:
+                os.link(source_file, os.path.join(self._ensure_shard(target), file_name))
+            except FileExistsError:
+                pass
+            except FileNotFoundError:
+                continue
+            os.remove(source_file)
+            moved += 1
+        return moved
+    
+    def _list_shard_directories(self) -> List[str]:
+        return [
+            entry.name for entry in os.scandir(self.base_storage_path)
+            if entry.is_dir() and entry.name.startswith('shard_')
+        ]
+    
+    @staticmethod
+    def _list_records(directory: str) -> List[str]:
+        if not os.path.isdir(directory):
+            return []
+        return [file_name for file_name in os.listdir(directory) if file_name.endswith('.json')]
+    
+    def _ensure_shard(self, shard: str) -> str:
+        shard_path = os.path.join(self.base_storage_path, shard)
+        if shard_path not in self._created_shards:
+            os.makedirs(shard_path, exist_ok=True)
+            self._created_shards.add(shard_path)
         return shard_path
     
-    async def save_trainer_data(self, data: Dict[str, Any]) -> str:
+    def shard_balance(self) -> Dict[str, Any]:
+        """
+        Report how keys and bytes are spread over the shards
+        
+        :return: Per-shard key count, bytes and share of the hash ring, plus
+            totals and the largest shard's key count relative to the mean
+        """
+        ownership = self.ring.ownership()
+        shards: Dict[str, Dict[str, Any]] = {}
+        for shard in self.ring.shards:
+            keys = 0
+            size = 0
+            shard_path = os.path.join(self.base_storage_path, shard)
+            if self.backend == STORAGE_BACKEND_SEGMENTS:
+                stats = open_segment_store(shard_path).stats()
+                keys, size = stats['keys'], stats['live_bytes']
+            elif os.path.isdir(shard_path):
+                for entry in os.scandir(shard_path):
+                    if entry.name.endswith('.json'):
+                        keys += 1
+                        size += entry.stat().st_size
+            shards[shard] = {'keys': keys, 'bytes': size, 'ring_share': ownership[shard]}
+        
+        total_keys = sum(shard['keys'] for shard in shards.values())
+        mean_keys = total_keys / len(shards)
+        return {
+            'shards': shards,
+            'total_keys': total_keys,
+            'total_bytes': sum(shard['bytes'] for shard in shards.values()),
+            'key_skew': max(shard['keys'] for shard in shards.values()) / mean_keys if total_keys else 1.0
+        }
+    
+    @staticmethod
+    async def _run_io(function: Callable[..., T], *args: Any) -> T:
+        """
+        Run blocking file I/O on the shared storage thread pool
+        """
+        return await asyncio.get_running_loop().run_in_executor(
+            storage_io_executor, functools.partial(function, *args)
+        )
+    
+    def _shard_limit(self, shard_path: str) -> asyncio.Semaphore:
+        """
+        Semaphore bounding the file operations in flight on one shard
+        """
+        limits = self._shard_limits.setdefault(asyncio.get_running_loop(), {})
+        limit = limits.get(shard_path)
+        if limit is None:
+            limit = limits[shard_path] = asyncio.Semaphore(SHARD_IO_CONCURRENCY)
+        return limit
+    
+    async def save_trainer_data(
+        self,
+        data: Dict[str, Any],
+        owner_id: Optional[int] = None,
+        data_type: str = 'trainer'
+    ) -> str:
         """
         Save trainer data with distributed storage simulation
         
         :param data: Dictionary containing trainer information
+        :param owner_id: User the record is saved for; its storage entry is
+            written to the catalog before the record, so the owner can list
+            and restore its backups
+        :param data_type: Kind of record, kept on the storage entry
         :return: Unique storage ID
+        :raises PermissionError: If the record belongs to another user
+        :raises ValueError: If an owner is given but there is no catalog
         """
+        if owner_id is not None and self.catalog is None:
+            raise ValueError("Saving a record for an owner requires a backup catalog")
+        
         # Ensure storage ID exists
         storage_id = data.get('storage_id', str(uuid.uuid4()))
         data['storage_id'] = storage_id
@@ -60,61 +409,219 @@ class DistributedTrainerStorageManager:
         
         # Select appropriate shard
         shard_path = self._get_shard_path(storage_id)
-        file_path = os.path.join(shard_path, f'{storage_id}.json')
         
-        # Simulate asynchronous write with a slight delay
-        await asyncio.sleep(0.1)
+        # Simulated latency is opt-in
+        if self.latency is not None:
+            await asyncio.sleep(self.latency.sample())
         
-        # Write data
-        with open(file_path, 'w') as f:
-            json.dump(data, f, indent=2)
+        if self.backend == STORAGE_BACKEND_SEGMENTS:
+            payload = json.dumps(data).encode('utf-8')
+        else:
+            payload = json.dumps(data, indent=2).encode('utf-8')
+        if owner_id is not None:
+            await self._run_io(self.catalog.claim, storage_id, owner_id, data_type, len(payload))
+        
+        # Write data off the event loop
+        if self.backend == STORAGE_BACKEND_SEGMENTS:
+            # Appends from every writer on the shard share one group-commit fsync
+            store = await self._run_io(open_segment_store, shard_path)
+            await asyncio.wrap_future(store.put(storage_id, payload))
+        else:
+            async with self._shard_limit(shard_path):
+                await self._run_io(self._write_file, os.path.join(shard_path, f'{storage_id}.json'), payload)
         
         # Create backup
-        await self._create_backup(storage_id)
+        await self._create_backup(storage_id, payload)
         
         return storage_id
     
-    async def _create_backup(self, storage_id: str):
+    @staticmethod
+    def _write_file(file_path: str, payload: bytes):
+        """
+        Write a file atomically, so concurrent readers never see a partial record
         """
-        Create a timestamped backup of storage data
+        temporary_file = f'{file_path}.{uuid.uuid4().hex}.tmp'
+        with open(temporary_file, 'wb') as f:
+            f.write(payload)
+        os.replace(temporary_file, file_path)
+    
+    async def _create_backup(self, storage_id: str, payload: Optional[bytes] = None):
+        """
+        Create a timestamped, deduplicated backup of storage data
         
         :param storage_id: Unique identifier for the storage entry
+        :param payload: Serialized record, read from primary storage if omitted
         """
         shard_path = self._get_shard_path(storage_id)
-        source_file = os.path.join(shard_path, f'{storage_id}.json')
-        
-        if not os.path.exists(source_file):
-            return
-        
-        # Create backup directory
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        backup_dir = os.path.join(self.backup_path, storage_id)
-        os.makedirs(backup_dir, exist_ok=True)
         
-        backup_file = os.path.join(backup_dir, f'{storage_id}_backup_{timestamp}.json')
-        shutil.copy2(source_file, backup_file)
+        async with self._shard_limit(shard_path):
+            manifest = await self._run_io(self._write_backup, storage_id, shard_path, payload)
         
         # Manage backup rotation
-        await self._rotate_backups(storage_id)
+        if manifest is not None:
+            await self._rotate_backups(storage_id)
+    
+    def _write_backup(self, storage_id: str, shard_path: str, payload: Optional[bytes]) -> Optional[BackupManifest]:
+        """
+        Back up a record, storing only its new chunks, and catalog the backup;
+        runs on the I/O pool
+        
+        :return: Manifest of the backup, or None if the record does not exist
+        """
+        if payload is None:
+            payload = self._read_record(storage_id, shard_path)
+            if payload is None:
+                return None
+        manifest = self.backup_store.write_backup(storage_id, payload)
+        if self.catalog is not None:
+            self.catalog.record(self._backup_root, manifest)
+        return manifest
+    
+    def _read_record(self, storage_id: str, shard_path: str) -> Optional[bytes]:
+        """
+        Raw record bytes from a shard's primary storage, or None; runs on the
+        I/O pool
+        """
+        if self.backend == STORAGE_BACKEND_SEGMENTS:
+            return open_segment_store(shard_path).get(storage_id)
+        try:
+            with open(os.path.join(shard_path, f'{storage_id}.json'), 'rb') as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
     
     async def _rotate_backups(self, storage_id: str):
         """
         Rotate backups, keeping only the most recent backups
+        Expired backups are found from the catalog, if there is one, rather
+        than by listing the backup directory, and leave their chunks for
+        collect_backup_garbage
         
         :param storage_id: Unique identifier for the storage entry
         """
-        backup_dir = os.path.join(self.backup_path, storage_id)
+        async with self._shard_limit(self._get_shard_path(storage_id)):
+            await self._run_io(self._expire_backups, storage_id)
+    
+    def _expire_backups(self, storage_id: str):
+        if self.catalog is None:
+            expired = self.backup_store.list_backups(storage_id)[self.max_backups:]
+        else:
+            # Entries go first, so a catalogued backup always has its manifest
+            expired = self.catalog.expire(self._backup_root, storage_id, self.max_backups)
+        for backup_id in expired:
+            self.backup_store.delete_backup(backup_id)
+    
+    def _backup_entries(
+        self,
+        storage_id: str,
+        as_of: Optional[datetime] = None,
+        limit: Optional[int] = None
+    ) -> List[BackupEntry]:
+        """
+        Backups of a record, newest first, from the catalog or, without one,
+        from the manifests; runs on the I/O pool
+        """
+        if self.catalog is not None:
+            return self.catalog.history(self._backup_root, storage_id, as_of, limit)
+        entries = []
+        for backup_id in self.backup_store.list_backups(storage_id):
+            if limit is not None and len(entries) >= limit:
+                break
+            try:
+                manifest = self.backup_store.read_manifest(backup_id)
+            except FileNotFoundError:
+                continue  # Rotated away since the listing
+            backup_timestamp = datetime.fromisoformat(manifest.created_at)
+            if as_of is None or backup_timestamp <= as_of:
+                entries.append(BackupEntry(backup_id, storage_id, backup_timestamp, manifest.size))
+        return entries
+    
+    async def backup_record(self, storage_id: str, data: Dict[str, Any]) -> BackupManifest:
+        """
+        Back up a record's data outside the save path
+        
+        :param storage_id: Unique identifier for the storage entry
+        :param data: Record to back up
+        :return: Manifest of the backup
+        """
+        payload = json.dumps(data, indent=2).encode('utf-8')
+        shard_path = self._get_shard_path(storage_id)
+        async with self._shard_limit(shard_path):
+            return await self._run_io(self._write_backup, storage_id, shard_path, payload)
+    
+    async def restore_backup(self, backup_id: str) -> Dict[str, Any]:
+        """
+        Reassemble a record from one of its backups
+        
+        :param backup_id: Backup to restore
+        :return: Record data as of the backup
+        """
+        return json.loads(await self._run_io(self.backup_store.restore, backup_id))
+    
+    async def backup_history(
+        self,
+        storage_id: str,
+        as_of: Optional[datetime] = None,
+        limit: Optional[int] = None
+    ) -> List[BackupEntry]:
+        """
+        Backups of a record, newest first
         
-        # Get all backup files, sorted by modification time
-        backup_files = sorted(
+        :param storage_id: Unique identifier for the storage entry
+        :param as_of: Only include backups taken at or before this time
+        :param limit: Most entries to return
+        :return: Catalog entries
+        """
+        return await self._run_io(self._backup_entries, storage_id, as_of, limit)
+    
+    async def read_as_of(self, storage_id: str, as_of: Optional[datetime] = None) -> Tuple[BackupEntry, Dict[str, Any]]:
+        """
+        Point-in-time read: a record as of its latest backup at or before a time
+        
+        :param storage_id: Unique identifier for the storage entry
+        :param as_of: Point in time, defaults to now
+        :return: Catalog entry of the backup used and the record data
+        """
+        entries = await self._run_io(self._backup_entries, storage_id, as_of, 1)
+        entry = entries[0] if entries else None
+        if entry is None:
+            when = f" at or before {as_of.isoformat()}" if as_of is not None else ""
+            raise FileNotFoundError(f"No backup of storage ID {storage_id}{when}")
+        return entry, await self.restore_backup(entry.backup_id)
+    
+    async def restore_as_of(self, storage_id: str, as_of: Optional[datetime] = None) -> BackupEntry:
+        """
+        Point-in-time restore: write a record back to primary storage as of
+        its latest backup at or before a time. The restore is saved like any
+        write, so it is itself backed up and can be undone
+        
+        :param storage_id: Unique identifier for the storage entry
+        :param as_of: Point in time, defaults to now
+        :return: Catalog entry of the backup restored
+        """
+        entry, data = await self.read_as_of(storage_id, as_of)
+        data['storage_id'] = storage_id
+        await self.save_trainer_data(data)
+        return entry
+    
+    async def collect_backup_garbage(self) -> Dict[str, int]:
+        """
+        Delete backup chunks that no remaining backup references
+        
+        :return: Counts of chunks kept and removed, and bytes freed
+        """
+        return await self._run_io(self.backup_store.collect_garbage)
+    
+    @staticmethod
+    def _legacy_backups_newest_first(backup_dir: str) -> List[str]:
+        # Full-copy backups written before the chunk store
+        if not os.path.isdir(backup_dir):
+            return []
+        return sorted(
             [f for f in os.listdir(backup_dir) if f.endswith('.json')],
             key=lambda x: os.path.getmtime(os.path.join(backup_dir, x)),
             reverse=True
         )
-        
-        # Remove excess backups
-        for backup_file in backup_files[self.max_backups:]:
-            os.remove(os.path.join(backup_dir, backup_file))
     
     async def simulate_distributed_recovery(self, storage_id: str) -> Dict[str, Any]:
         """
@@ -125,29 +632,52 @@ class DistributedTrainerStorageManager:
         """
         # Primary retrieval from sharded storage
         shard_path = self._get_shard_path(storage_id)
-        primary_file = os.path.join(shard_path, f'{storage_id}.json')
+        candidates = [shard_path]
         
-        # Try primary storage
-        if os.path.exists(primary_file):
-            with open(primary_file, 'r') as f:
-                return json.load(f)
+        # A running rebalance may not have moved the record yet
+        previous_ring = self._previous_rings.get(self._ring_key)
+        if previous_ring is not None:
+            candidates.append(os.path.join(self.base_storage_path, previous_ring.shard_for(storage_id)))
         
-        # Backup retrieval
-        backup_dir = os.path.join(self.backup_path, storage_id)
+        async with self._shard_limit(shard_path):
+            data = await self._run_io(self._recover, storage_id, candidates)
+        if data is None:
+            raise FileNotFoundError(f"No data found for storage ID {storage_id}")
+        return data
+    
+    def _recover(self, storage_id: str, candidates: List[str]) -> Optional[Dict[str, Any]]:
+        """
+        Read the record from the first candidate shard holding it, else the
+        latest backup; runs on the I/O pool
+        """
+        for shard_path in candidates:
+            payload = self._read_record(storage_id, shard_path)
+            if payload is not None:
+                return json.loads(payload)
         
-        if os.path.exists(backup_dir):
-            backup_files = sorted(
-                [f for f in os.listdir(backup_dir) if f.endswith('.json')],
-                key=lambda x: os.path.getmtime(os.path.join(backup_dir, x)),
-                reverse=True
-            )
-            
-            if backup_files:
-                latest_backup = os.path.join(backup_dir, backup_files[0])
-                with open(latest_backup, 'r') as f:
-                    return json.load(f)
+        # Backup retrieval, newest catalogued backup first
+        if self.catalog is not None:
+            for entry in self.catalog.history(self._backup_root, storage_id):
+                try:
+                    return json.loads(self.backup_store.restore(entry.backup_id))
+                except FileNotFoundError:
+                    continue  # Rotated away since the lookup
         
-        raise FileNotFoundError(f"No data found for storage ID {storage_id}")
+        # Backups written before the catalog, or without one, are found by listing
+        for backup_id in self.backup_store.list_backups(storage_id):
+            try:
+                return json.loads(self.backup_store.restore(backup_id))
+            except FileNotFoundError:
+                continue
+        
+        backup_dir = os.path.join(self.backup_path, storage_id)
+        for backup_file in self._legacy_backups_newest_first(backup_dir):
+            try:
+                with open(os.path.join(backup_dir, backup_file), 'r') as f:
+                    return json.load(f)
+            except FileNotFoundError:
+                continue
+        return None
 
 class BackupManager:
     """
@@ -166,20 +696,16 @@ class BackupManager:
         Create a backup for a given storage entry
         
         :param storage_id: Unique identifier for the storage entry
-        :return: Backup file path
+        :return: Backup ID
         """
         try:
             # Retrieve original data
             original_data = await self.storage_manager.simulate_distributed_recovery(storage_id)
             
-            # Generate backup ID
-            backup_id = str(uuid.uuid4())
-            original_data['backup_id'] = backup_id
-            
-            # Save backup
-            backup_storage_id = await self.storage_manager.save_trainer_data(original_data)
+            # Store it as a manifest over shared chunks, not a second document
+            manifest = await self.storage_manager.backup_record(storage_id, original_data)
             
-            return backup_storage_id
+            return manifest.backup_id
         except Exception as e:
             raise RuntimeError(f"Failed to create backup: {str(e)}")
     
@@ -191,6 +717,20 @@ class BackupManager:
         :return: Backup data
         """
         try:
-            return await self.storage_manager.simulate_distributed_recovery(backup_id)
+            return await self.storage_manager.restore_backup(backup_id)
         except FileNotFoundError:
-            raise ValueError(f"Backup not found for ID: {backup_id}")
\ No newline at end of file
+            raise ValueError(f"Backup not found for ID: {backup_id}")
+    
+    async def retrieve_backup_as_of(self, storage_id: str, as_of: datetime) -> Dict[str, Any]:
+        """
+        Retrieve a storage entry as of a point in time
+        
+        :param storage_id: Unique identifier for the storage entry
+        :param as_of: Point in time
+        :return: Data of the latest backup taken at or before as_of
+        """
+        try:
+            _, data = await self.storage_manager.read_as_of(storage_id, as_of)
+            return data
+        except FileNotFoundError as e:
+            raise ValueError(str(e))
\ No newline at end of file
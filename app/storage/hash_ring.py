@@ -0,0 +1,71 @@
+import bisect
+import hashlib
+from typing import Dict, Iterable, List, Tuple
+
+# Points each shard places on the ring; more points give a more even split
+DEFAULT_VIRTUAL_NODES = 128
+
+def stable_hash(key: str) -> int:
+    """
+    64-bit hash of a string that is the same in every process, unlike hash()
+    """
+    return int.from_bytes(hashlib.blake2b(key.encode('utf-8'), digest_size=8).digest(), 'big')
+
+class ConsistentHashRing:
+    """
+    Consistent-hash ring mapping keys to shard names
+    Each shard owns DEFAULT_VIRTUAL_NODES points on a 64-bit ring and a key
+    belongs to the shard owning the first point at or after the key's hash, so
+    adding or removing a shard only moves the keys in the ranges it gains or
+    loses. Rings are immutable; with_shard and without_shard return new rings
+    """
+    def __init__(self, shards: Iterable[str], virtual_nodes: int = DEFAULT_VIRTUAL_NODES):
+        """
+        :param shards: Shard names
+        :param virtual_nodes: Ring points per shard
+        """
+        self.shards: Tuple[str, ...] = tuple(sorted(set(shards)))
+        if not self.shards:
+            raise ValueError("A hash ring needs at least one shard")
+        self.virtual_nodes = virtual_nodes
+
+        points = sorted(
+            (stable_hash(f"{shard}#{replica}"), shard)
+            for shard in self.shards
+            for replica in range(virtual_nodes)
+        )
+        self._points: List[int] = [point for point, _ in points]
+        self._owners: List[str] = [shard for _, shard in points]
+
+    def __contains__(self, shard: str) -> bool:
+        return shard in self.shards
+
+    def __len__(self) -> int:
+        return len(self.shards)
+
+    def shard_for(self, key: str) -> str:
+        """
+        Shard owning a key, in O(log(shards * virtual_nodes))
+        """
+        index = bisect.bisect_left(self._points, stable_hash(key))
+        return self._owners[index % len(self._owners)]
+
+    def with_shard(self, shard: str) -> "ConsistentHashRing":
+        return ConsistentHashRing(self.shards + (shard,), self.virtual_nodes)
+
+    def without_shard(self, shard: str) -> "ConsistentHashRing":
+        if shard not in self.shards:
+            raise ValueError(f"Unknown shard {shard}")
+        return ConsistentHashRing([name for name in self.shards if name != shard], self.virtual_nodes)
+
+    def ownership(self) -> Dict[str, float]:
+        """
+        Fraction of the hash space owned by each shard
+        """
+        share = dict.fromkeys(self.shards, 0.0)
+        ring_size = float(1 << 64)
+        previous = self._points[-1] - (1 << 64)
+        for point, shard in zip(self._points, self._owners):
+            share[shard] += (point - previous) / ring_size
+            previous = point
+        return share
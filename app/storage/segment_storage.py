@@ -0,0 +1,363 @@
+import os
+import json
+import queue
+import struct
+import threading
+import zlib
+from concurrent.futures import Future
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+# A segment is sealed with an index footer once it grows past this size
+SEGMENT_MAX_BYTES = 64 * 1024 * 1024
+# Most records written by one group commit
+GROUP_COMMIT_MAX = 256
+# Sealed segments with less live data than this are compacted
+COMPACTION_LIVE_RATIO = 0.5
+# Compaction runs after the writer has been idle this long
+COMPACTION_IDLE_SECONDS = 1.0
+
+SEGMENT_SUFFIX = '.seg'
+FOOTER_MAGIC = b'SEGIDX01'
+
+# Record: crc32 of key and payload, payload length, key length, then the key
+# and payload bytes
+_RECORD_HEADER = struct.Struct('<IIH')
+# Footer trailer: offset of the JSON index, its crc32, magic
+_FOOTER_TRAILER = struct.Struct('<QI8s')
+
+class RecordLocation(NamedTuple):
+    segment: int
+    payload_offset: int
+    payload_length: int
+    record_length: int
+
+class _Segment:
+    __slots__ = ('segment_id', 'path', 'reader', 'size', 'live_bytes', 'sealed')
+
+    def __init__(self, segment_id: int, path: str, size: int = 0, sealed: bool = False):
+        self.segment_id = segment_id
+        self.path = path
+        self.reader = open(path, 'rb')
+        self.size = size
+        self.live_bytes = 0
+        self.sealed = sealed
+
+class SegmentStore:
+    """
+    Append-only record store for one shard
+    Records are appended to the active segment by a single committer thread
+    that fsyncs once per batch, so concurrent writers share each fsync. Full
+    segments are sealed with a footer indexing their records; on open, the
+    in-memory key index is rebuilt from the footers and only the unsealed
+    active segment is scanned. Sealed segments that are mostly superseded
+    records are compacted while the writer is idle
+    """
+    def __init__(self, directory: str, segment_max_bytes: int = SEGMENT_MAX_BYTES):
+        """
+        :param directory: Directory holding this store's segment files
+        :param segment_max_bytes: Size at which the active segment is sealed
+        """
+        self.directory = directory
+        self.segment_max_bytes = segment_max_bytes
+        self._index: Dict[str, RecordLocation] = {}
+        self._segments: Dict[int, _Segment] = {}
+        self._lock = threading.Lock()
+        self._queue: "queue.Queue[Optional[Tuple[str, bytes, Future]]]" = queue.Queue()
+        self._active: Optional[_Segment] = None
+        self._active_entries: Dict[str, RecordLocation] = {}
+
+        os.makedirs(directory, exist_ok=True)
+        self._open()
+
+        self._committer = threading.Thread(
+            target=self._commit_loop, name=f'segment-committer-{directory}', daemon=True
+        )
+        self._committer.start()
+
+    def put(self, key: str, payload: bytes) -> Future:
+        """
+        Queue a record for the next group commit
+
+        :return: Future resolved once the record is durable
+        """
+        future: Future = Future()
+        self._queue.put((key, payload, future))
+        return future
+
+    def get(self, key: str) -> Optional[bytes]:
+        """
+        Latest payload stored under key, or None
+        """
+        with self._lock:
+            location = self._index.get(key)
+            if location is None:
+                return None
+            # Holding the file object keeps it open even if compaction drops
+            # the segment meanwhile
+            reader = self._segments[location.segment].reader
+        return os.pread(reader.fileno(), location.payload_length, location.payload_offset)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._index
+
+    def keys(self) -> List[str]:
+        with self._lock:
+            return list(self._index)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                'keys': len(self._index),
+                'segments': len(self._segments),
+                'live_bytes': sum(segment.live_bytes for segment in self._segments.values()),
+                'total_bytes': sum(segment.size for segment in self._segments.values())
+            }
+
+    def close(self):
+        """
+        Commit queued records, stop the committer and seal the active segment
+        so the next open needs no scan
+        """
+        self._queue.put(None)
+        self._committer.join()
+        active = self._active
+        if active.size:
+            self._seal(active)
+
+    def _segment_path(self, segment_id: int) -> str:
+        return os.path.join(self.directory, f'segment_{segment_id:08d}{SEGMENT_SUFFIX}')
+
+    def _open(self):
+        """
+        Rebuild the index from segment footers, scanning unsealed segments
+        A torn record at the end of the last segment is truncated away
+        """
+        segment_ids = sorted(
+            int(file_name[len('segment_'):-len(SEGMENT_SUFFIX)])
+            for file_name in os.listdir(self.directory)
+            if file_name.startswith('segment_') and file_name.endswith(SEGMENT_SUFFIX)
+        )
+
+        for position, segment_id in enumerate(segment_ids):
+            path = self._segment_path(segment_id)
+            entries, end = self._read_footer(segment_id, path)
+            sealed = entries is not None
+            if not sealed:
+                entries, end = self._scan(segment_id, path)
+                if end != os.path.getsize(path):
+                    with open(path, 'r+b') as f:
+                        f.truncate(end)
+
+            segment = _Segment(segment_id, path, size=end, sealed=sealed)
+            self._segments[segment_id] = segment
+            for key, location in entries.items():
+                self._set_location(key, location)
+
+            if not sealed:
+                if position == len(segment_ids) - 1:
+                    # Keep appending to the newest segment
+                    self._writer = open(path, 'ab')
+                    self._active = segment
+                    self._active_entries = entries
+                else:
+                    # Left unsealed by a crash during rollover
+                    self._seal(segment, entries)
+
+        if self._active is None:
+            self._start_segment((segment_ids[-1] + 1) if segment_ids else 0)
+
+    @staticmethod
+    def _read_footer(segment_id: int, path: str) -> Tuple[Optional[Dict[str, RecordLocation]], int]:
+        """
+        Index entries and data size of a sealed segment, or (None, 0) if the
+        segment has no valid footer
+        """
+        size = os.path.getsize(path)
+        if size < _FOOTER_TRAILER.size:
+            return None, 0
+        with open(path, 'rb') as f:
+            f.seek(size - _FOOTER_TRAILER.size)
+            index_offset, index_crc, magic = _FOOTER_TRAILER.unpack(f.read(_FOOTER_TRAILER.size))
+            if magic != FOOTER_MAGIC or index_offset > size - _FOOTER_TRAILER.size:
+                return None, 0
+            f.seek(index_offset)
+            blob = f.read(size - _FOOTER_TRAILER.size - index_offset)
+        if zlib.crc32(blob) != index_crc:
+            return None, 0
+        entries = {key: RecordLocation(segment_id, *location) for key, *location in json.loads(blob)}
+        return entries, index_offset
+
+    @staticmethod
+    def _scan(segment_id: int, path: str) -> Tuple[Dict[str, RecordLocation], int]:
+        """
+        Read records from the start of a segment up to the first torn or
+        corrupt one
+
+        :return: Latest location of each key, and the end of the valid records
+        """
+        entries: Dict[str, RecordLocation] = {}
+        offset = 0
+        with open(path, 'rb') as f:
+            while True:
+                header = f.read(_RECORD_HEADER.size)
+                if len(header) < _RECORD_HEADER.size:
+                    break
+                crc, payload_length, key_length = _RECORD_HEADER.unpack(header)
+                body = f.read(key_length + payload_length)
+                if len(body) < key_length + payload_length or zlib.crc32(body) != crc:
+                    break
+                record_length = _RECORD_HEADER.size + len(body)
+                entries[body[:key_length].decode('utf-8')] = RecordLocation(
+                    segment_id, offset + _RECORD_HEADER.size + key_length, payload_length, record_length
+                )
+                offset += record_length
+        return entries, offset
+
+    def _start_segment(self, segment_id: int):
+        path = self._segment_path(segment_id)
+        self._writer = open(path, 'ab')
+        self._active_entries = {}
+        self._segments[segment_id] = _Segment(segment_id, path)
+        self._active = self._segments[segment_id]
+
+    def _seal(self, segment: _Segment, entries: Optional[Dict[str, RecordLocation]] = None):
+        """
+        Append the index footer to a segment and fsync it
+        """
+        if segment is self._active:
+            self._writer.close()
+            entries = self._active_entries
+        blob = json.dumps([[key, *location[1:]] for key, location in entries.items()]).encode('utf-8')
+        with open(segment.path, 'ab') as f:
+            f.write(blob)
+            f.write(_FOOTER_TRAILER.pack(segment.size, zlib.crc32(blob), FOOTER_MAGIC))
+            f.flush()
+            os.fsync(f.fileno())
+        segment.sealed = True
+
+    def _set_location(self, key: str, location: RecordLocation):
+        previous = self._index.get(key)
+        if previous is not None and previous.segment in self._segments:
+            self._segments[previous.segment].live_bytes -= previous.record_length
+        self._index[key] = location
+        self._segments[location.segment].live_bytes += location.record_length
+
+    def _commit_loop(self):
+        while True:
+            try:
+                item = self._queue.get(timeout=COMPACTION_IDLE_SECONDS if self._compaction_candidate() else None)
+            except queue.Empty:
+                self._compact_one()
+                continue
+
+            # Everything queued while the last batch was fsyncing joins this one
+            batch = []
+            while item is not None:
+                batch.append(item)
+                if len(batch) == GROUP_COMMIT_MAX:
+                    break
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+
+            if batch:
+                try:
+                    self._append([(key, payload) for key, payload, _ in batch])
+                except Exception as e:
+                    for _, _, future in batch:
+                        future.set_exception(e)
+                else:
+                    for _, _, future in batch:
+                        future.set_result(None)
+            if item is None:
+                return
+
+    def _append(self, records: List[Tuple[str, bytes]]):
+        """
+        Write records to the active segment with one fsync, then publish them
+        Only the committer thread appends
+        """
+        segment = self._active
+        offset = segment.size
+        locations = []
+        for key, payload in records:
+            key_bytes = key.encode('utf-8')
+            body = key_bytes + payload
+            self._writer.write(_RECORD_HEADER.pack(zlib.crc32(body), len(payload), len(key_bytes)))
+            self._writer.write(body)
+            record_length = _RECORD_HEADER.size + len(body)
+            locations.append(RecordLocation(
+                segment.segment_id, offset + _RECORD_HEADER.size + len(key_bytes), len(payload), record_length
+            ))
+            offset += record_length
+        self._writer.flush()
+        os.fsync(self._writer.fileno())
+
+        with self._lock:
+            segment.size = offset
+            for (key, _), location in zip(records, locations):
+                self._set_location(key, location)
+                self._active_entries[key] = location
+
+        if segment.size >= self.segment_max_bytes:
+            self._seal(segment)
+            self._start_segment(segment.segment_id + 1)
+
+    def _compaction_candidate(self) -> Optional[_Segment]:
+        """
+        Sealed segment with the least live data, if under the compaction ratio
+        """
+        candidates = [
+            segment for segment in self._segments.values()
+            if segment.sealed and segment.live_bytes < COMPACTION_LIVE_RATIO * segment.size
+        ]
+        return min(candidates, key=lambda segment: segment.live_bytes / segment.size, default=None)
+
+    def _compact_one(self):
+        """
+        Copy the live records of one sparse sealed segment into the active
+        segment and delete it. Runs on the committer thread, so no write can
+        supersede a record between the copy and the index update
+        """
+        segment = self._compaction_candidate()
+        if segment is None:
+            return
+
+        with self._lock:
+            live = [
+                (key, location) for key, location in self._index.items()
+                if location.segment == segment.segment_id
+            ]
+        for start in range(0, len(live), GROUP_COMMIT_MAX):
+            self._append([
+                (key, os.pread(segment.reader.fileno(), location.payload_length, location.payload_offset))
+                for key, location in live[start:start + GROUP_COMMIT_MAX]
+            ])
+
+        with self._lock:
+            del self._segments[segment.segment_id]
+        os.remove(segment.path)
+
+_stores: Dict[str, SegmentStore] = {}
+_stores_lock = threading.Lock()
+
+def open_segment_store(directory: str) -> SegmentStore:
+    """
+    Store for a directory, opened once per process
+    """
+    directory = os.path.abspath(directory)
+    with _stores_lock:
+        store = _stores.get(directory)
+        if store is None:
+            store = _stores[directory] = SegmentStore(directory)
+        return store
+
+def close_segment_stores():
+    """
+    Close every open store; call at shutdown
+    """
+    with _stores_lock:
+        for store in _stores.values():
+            store.close()
+        _stores.clear()
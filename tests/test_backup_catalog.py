@@ -0,0 +1,75 @@
+import asyncio
+import json
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+import app.models.pokemon_team  # noqa: F401 (maps the teams User relates to)
+from app.database.database import Base
+from app.models.Base import User
+from app.storage.backup_catalog import BackupCatalog
+from app.storage.distributed_storage import DistributedTrainerStorageManager
+
+OWNER = 1
+OTHER = 2
+
+@pytest.fixture
+def catalog():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(engine)
+    session_factory = sessionmaker(bind=engine)
+    db = session_factory()
+    db.add_all([
+        User(id=user_id, username=f"trainer_{user_id}", email=f"trainer_{user_id}@example.com", hashed_password="x")
+        for user_id in (OWNER, OTHER)
+    ])
+    db.commit()
+    db.close()
+    yield BackupCatalog(session_factory)
+    engine.dispose()
+
+@pytest.fixture
+def manager(tmp_path, catalog):
+    return DistributedTrainerStorageManager(str(tmp_path / "storage"), str(tmp_path / "backups"), catalog=catalog)
+
+def test_claim_records_owner(catalog):
+    assert catalog.owner("trainer_a") is None
+    catalog.claim("trainer_a", OWNER, "trainer", 10)
+    catalog.claim("trainer_a", OWNER, "trainer", 20)
+
+    assert catalog.owner("trainer_a") == OWNER
+    with pytest.raises(PermissionError):
+        catalog.claim("trainer_a", OTHER, "trainer", 30)
+    assert catalog.owner("trainer_a") == OWNER
+
+def test_save_for_owner_is_owned(manager, catalog):
+    storage_id = asyncio.run(manager.save_trainer_data({"name": "Ash"}, owner_id=OWNER))
+
+    assert catalog.owner(storage_id) == OWNER
+    assert len(asyncio.run(manager.backup_history(storage_id))) == 1
+
+def test_save_over_another_users_record_is_refused(manager, catalog):
+    storage_id = asyncio.run(manager.save_trainer_data({"storage_id": "trainer_a", "name": "Ash"}, owner_id=OWNER))
+
+    with pytest.raises(PermissionError):
+        asyncio.run(manager.save_trainer_data({"storage_id": storage_id, "name": "Gary"}, owner_id=OTHER))
+
+    history = asyncio.run(manager.backup_history(storage_id))
+    assert len(history) == 1
+    assert json.loads(manager.backup_store.restore(history[0].backup_id))["name"] == "Ash"
+    assert asyncio.run(manager.simulate_distributed_recovery(storage_id))["name"] == "Ash"
+
+def test_owner_requires_catalog(tmp_path):
+    manager = DistributedTrainerStorageManager(str(tmp_path / "storage"), str(tmp_path / "backups"))
+    with pytest.raises(ValueError):
+        asyncio.run(manager.save_trainer_data({"name": "Ash"}, owner_id=OWNER))
+
+def test_backup_roots_share_catalog_without_mixing(tmp_path, catalog, manager):
+    other_root = DistributedTrainerStorageManager(str(tmp_path / "storage"), str(tmp_path / "other"), catalog=catalog)
+    asyncio.run(manager.save_trainer_data({"storage_id": "trainer_a", "version": 1}, owner_id=OWNER))
+    asyncio.run(other_root.save_trainer_data({"storage_id": "trainer_a", "version": 2}, owner_id=OWNER))
+
+    for storage_manager, version in ((manager, 1), (other_root, 2)):
+        history = asyncio.run(storage_manager.backup_history("trainer_a"))
+        assert len(history) == 1
+        assert json.loads(storage_manager.backup_store.restore(history[0].backup_id))["version"] == version
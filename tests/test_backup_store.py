@@ -0,0 +1,59 @@
+import os
+import time
+import numpy as np
+import pytest
+from app.storage.backup_store import GC_GRACE_SECONDS, ContentAddressedBackupStore
+
+def payload(seed: int, size: int = 64 * 1024) -> bytes:
+    return np.random.default_rng(seed).bytes(size)
+
+def age_chunks(store: ContentAddressedBackupStore):
+    """
+    Move every chunk out of the collection grace period
+    """
+    past = time.time() - 2 * GC_GRACE_SECONDS
+    for root, _, files in os.walk(store.chunk_path):
+        for file_name in files:
+            os.utime(os.path.join(root, file_name), (past, past))
+
+@pytest.fixture
+def store(tmp_path):
+    return ContentAddressedBackupStore(str(tmp_path / "backups"))
+
+def test_restore_after_garbage_collection(store):
+    original = payload(1)
+    # Each version rewrites a region in the middle, sharing the other chunks
+    versions = [original]
+    for seed in range(2, 5):
+        middle = len(original) // 2
+        versions.append(versions[-1][:middle] + payload(seed, 4096) + versions[-1][middle + 4096:])
+    backups = [store.write_backup("trainer_1", version).backup_id for version in versions]
+    other = store.write_backup("trainer_2", payload(9)).backup_id
+
+    store.delete_backup(backups[0])
+    store.delete_backup(other)
+    age_chunks(store)
+    before = store.stats()
+    result = store.collect_garbage()
+
+    assert result["chunks_removed"] > 0
+    assert store.stats()["chunks"] == before["chunks"] - result["chunks_removed"] == result["chunks_kept"]
+    assert store.list_backups("trainer_1") == backups[:0:-1]
+    for backup_id, version in zip(backups[1:], versions[1:]):
+        assert store.restore(backup_id) == version
+    with pytest.raises(FileNotFoundError):
+        store.restore(other)
+
+    # A second pass finds nothing left to collect
+    assert store.collect_garbage()["chunks_removed"] == 0
+
+def test_garbage_collection_keeps_recent_unreferenced_chunks(store):
+    backup_id = store.write_backup("trainer_1", payload(1)).backup_id
+    age_chunks(store)
+    # Chunks a backup has written but not yet referenced from its manifest
+    pending = payload(2)
+    store.delete_backup(store.write_backup("trainer_1", pending).backup_id)
+
+    assert store.collect_garbage()["chunks_removed"] == 0
+    assert store.restore(store.write_backup("trainer_1", pending).backup_id) == pending
+    assert store.restore(backup_id) == payload(1)
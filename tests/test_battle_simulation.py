@@ -0,0 +1,53 @@
+import math
+import pytest
+from app.services.battle_services import BattleCombatant, TypeEffectivenessMatrix
+from app.services.battle_simulation_service import ExactBattleSolver, MonteCarloBattleService
+
+TYPE_CODES = TypeEffectivenessMatrix.TYPE_CODES
+
+def combatant(id: int, type_name: str, hp: int, attack: int, defense: int) -> BattleCombatant:
+    return BattleCombatant(id, f"pokemon_{id}", hp, attack, defense, TYPE_CODES[type_name])
+
+MATCHUPS = [
+    # Each side has a real chance to win, by knockout or on HP after max_rounds
+    (combatant(1, "Fire", 34, 39, 51), combatant(2, "Grass", 293, 33, 52)),
+    (combatant(3, "Fire", 53, 10, 37), combatant(4, "Normal", 30, 27, 12)),
+    (combatant(5, "Fire", 24, 42, 60), combatant(6, "Water", 164, 6, 49)),
+    (combatant(7, "Grass", 24, 41, 26), combatant(8, "Grass", 247, 16, 32)),
+    (combatant(9, "Water", 263, 25, 31), combatant(10, "Water", 161, 30, 39)),
+]
+
+@pytest.mark.parametrize("pokemon1, pokemon2", MATCHUPS)
+def test_monte_carlo_agrees_with_exact_solver(pokemon1, pokemon2):
+    samples = 20_000
+    exact = ExactBattleSolver.solve(pokemon1, pokemon2)
+    estimate = MonteCarloBattleService.simulate_battles(pokemon1, pokemon2, samples=samples, seed=7)
+
+    # Four standard errors, with a floor for probabilities near 0 or 1
+    def tolerance(probability: float) -> float:
+        return 4 * math.sqrt(max(probability * (1 - probability), 0.01) / samples)
+
+    assert estimate.win_rate == pytest.approx(exact.win_probability, abs=tolerance(exact.win_probability))
+    assert estimate.timeout_rate == pytest.approx(exact.timeout_probability, abs=tolerance(exact.timeout_probability))
+    mean_rounds = sum(rounds * share for rounds, share in estimate.rounds_distribution.items())
+    assert mean_rounds == pytest.approx(exact.expected_rounds, rel=0.02)
+
+@pytest.mark.parametrize("pokemon1, pokemon2", MATCHUPS)
+def test_exact_distribution_is_complete(pokemon1, pokemon2):
+    exact = ExactBattleSolver.solve(pokemon1, pokemon2)
+    assert exact.win_probability + exact.loss_probability == pytest.approx(1.0)
+    assert 0.0 <= exact.timeout_probability <= 1.0
+
+def test_batched_solver_matches_single_matchups():
+    first = [pokemon1 for pokemon1, _ in MATCHUPS]
+    second = [pokemon2 for _, pokemon2 in MATCHUPS]
+    batched = ExactBattleSolver.win_probabilities(first, second)
+    for probability, (pokemon1, pokemon2) in zip(batched, MATCHUPS):
+        assert probability == pytest.approx(ExactBattleSolver.solve(pokemon1, pokemon2).win_probability)
+
+def test_simulate_battles_rejects_empty_runs():
+    pokemon1, pokemon2 = MATCHUPS[0]
+    with pytest.raises(ValueError):
+        MonteCarloBattleService.simulate_battles(pokemon1, pokemon2, samples=0)
+    with pytest.raises(ValueError):
+        MonteCarloBattleService.simulate_battles(pokemon1, pokemon2, max_rounds=0)
@@ -0,0 +1,117 @@
+import os
+import shutil
+import pytest
+from app.storage.segment_storage import SEGMENT_SUFFIX, SegmentStore, _FOOTER_TRAILER, _RECORD_HEADER
+
+RECORDS = {f"key_{index}": f"payload {index}".encode("utf-8") * (index % 7 + 1) for index in range(200)}
+
+def fill(store: SegmentStore, records=RECORDS):
+    for future in [store.put(key, payload) for key, payload in records.items()]:
+        future.result(timeout=10)
+
+def segment_files(directory):
+    return sorted(os.path.join(directory, name) for name in os.listdir(directory) if name.endswith(SEGMENT_SUFFIX))
+
+def crash_copy(store: SegmentStore, tmp_path) -> str:
+    """
+    Segment files as a crash would leave them: records fsynced, nothing sealed
+    """
+    directory = str(tmp_path / "crashed")
+    shutil.copytree(store.directory, directory)
+    return directory
+
+@pytest.fixture
+def store(tmp_path):
+    store = SegmentStore(str(tmp_path / "store"))
+    yield store
+    store.close()
+
+def assert_records(store: SegmentStore, records=RECORDS):
+    assert sorted(store.keys()) == sorted(records)
+    for key, payload in records.items():
+        assert store.get(key) == payload
+
+@pytest.mark.parametrize("segment_max_bytes", [1 << 20, 512])
+def test_reopen_after_close(tmp_path, segment_max_bytes):
+    directory = str(tmp_path / "store")
+    store = SegmentStore(directory, segment_max_bytes)
+    fill(store)
+    fill(store, {"key_0": b"overwritten"})
+    store.close()
+
+    reopened = SegmentStore(directory, segment_max_bytes)
+    try:
+        assert_records(reopened, {**RECORDS, "key_0": b"overwritten"})
+        fill(reopened, {"key_new": b"after reopen"})
+        assert reopened.get("key_new") == b"after reopen"
+    finally:
+        reopened.close()
+
+def test_reopen_after_crash_scans_active_segment(store, tmp_path):
+    fill(store)
+    recovered = SegmentStore(crash_copy(store, tmp_path))
+    try:
+        assert_records(recovered)
+    finally:
+        recovered.close()
+
+@pytest.mark.parametrize("torn_bytes", [1, _RECORD_HEADER.size - 1, _RECORD_HEADER.size + 3])
+def test_torn_tail_is_truncated(store, tmp_path, torn_bytes):
+    fill(store)
+    directory = crash_copy(store, tmp_path)
+    path = segment_files(directory)[-1]
+    valid_size = os.path.getsize(path)
+    with open(path, "ab") as f:
+        f.write(_RECORD_HEADER.pack(0, 64, 8)[:torn_bytes] + b"x" * max(0, torn_bytes - _RECORD_HEADER.size))
+
+    recovered = SegmentStore(directory)
+    try:
+        assert os.path.getsize(path) == valid_size
+        assert_records(recovered)
+        fill(recovered, {"key_new": b"after recovery"})
+    finally:
+        recovered.close()
+
+    reopened = SegmentStore(directory)
+    try:
+        assert_records(reopened, {**RECORDS, "key_new": b"after recovery"})
+    finally:
+        reopened.close()
+
+def test_corrupt_last_record_is_dropped(store, tmp_path):
+    fill(store)
+    directory = crash_copy(store, tmp_path)
+    path = segment_files(directory)[-1]
+    with open(path, "r+b") as f:
+        f.seek(-1, os.SEEK_END)
+        last = f.read(1)
+        f.seek(-1, os.SEEK_END)
+        f.write(bytes([last[0] ^ 0xFF]))
+
+    recovered = SegmentStore(directory)
+    try:
+        assert_records(recovered, {key: payload for key, payload in RECORDS.items() if key != "key_199"})
+    finally:
+        recovered.close()
+
+def test_segment_left_unsealed_by_rollover_is_recovered(tmp_path):
+    directory = str(tmp_path / "store")
+    store = SegmentStore(directory, segment_max_bytes=512)
+    fill(store)
+    store.close()
+
+    # Cut the first segment's footer short, as if the crash hit mid-seal
+    path = segment_files(directory)[0]
+    with open(path, "r+b") as f:
+        f.seek(-_FOOTER_TRAILER.size, os.SEEK_END)
+        index_offset = _FOOTER_TRAILER.unpack(f.read(_FOOTER_TRAILER.size))[0]
+        f.truncate(index_offset + 5)
+
+    reopened = SegmentStore(directory, segment_max_bytes=512)
+    try:
+        assert_records(reopened)
+    finally:
+        reopened.close()
+
+    # Recovery sealed it again, so the next open reads its footer
+    assert SegmentStore._read_footer(0, path)[0] is not None
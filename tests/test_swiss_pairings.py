@@ -0,0 +1,62 @@
+import math
+import random
+from functools import lru_cache
+from typing import List, Set
+import pytest
+from app.services.tournament_service import AdvancedTournamentService, TournamentStandings
+
+def rematch_free_pairing_exists(players: List[int], opponents: List[Set[int]]) -> bool:
+    @lru_cache(maxsize=None)
+    def pairable(rest: tuple) -> bool:
+        if not rest:
+            return True
+        player, rest = rest[0], rest[1:]
+        return any(
+            other not in opponents[player] and pairable(rest[:position] + rest[position + 1:])
+            for position, other in enumerate(rest)
+        )
+    return pairable(tuple(sorted(players)))
+
+def play_swiss(entrants: int, seed: int):
+    """
+    Pair every round of a Swiss event with random results, yielding each
+    round's pairings, bye and the opponents met before it
+    """
+    rng = random.Random(seed)
+    standings = TournamentStandings(entrants)
+    opponents: List[Set[int]] = [set() for _ in range(entrants)]
+    had_bye: Set[int] = set()
+    for _ in range(math.ceil(math.log2(entrants))):
+        pairings, bye = AdvancedTournamentService._swiss_pairings(standings, opponents, had_bye)
+        yield pairings, bye, [set(met) for met in opponents], set(had_bye)
+        if bye is not None:
+            had_bye.add(bye)
+            standings.record_bye(bye)
+        for participant1, participant2 in pairings:
+            opponents[participant1].add(participant2)
+            opponents[participant2].add(participant1)
+            standings.record(
+                participant1, participant2, rng.random() < 0.5, (rng.randrange(7), rng.randrange(7))
+            )
+
+@pytest.mark.parametrize("entrants", [5, 9, 13, 21, 23])
+@pytest.mark.parametrize("seed", range(20))
+def test_rematches_only_when_unavoidable(entrants, seed):
+    for pairings, bye, opponents, had_bye in play_swiss(entrants, seed):
+        paired = [player for pair in pairings for player in pair]
+        assert sorted(paired + ([bye] if bye is not None else [])) == list(range(entrants))
+        if bye is not None and len(had_bye) < entrants:
+            assert bye not in had_bye
+
+        if any(participant2 in opponents[participant1] for participant1, participant2 in pairings):
+            byes = [player for player in range(entrants) if player not in had_bye] or list(range(entrants))
+            assert not any(
+                rematch_free_pairing_exists([player for player in range(entrants) if player != candidate], opponents)
+                for candidate in byes
+            )
+
+@pytest.mark.parametrize("entrants", [2, 8, 64, 1000])
+def test_even_fields_never_rematch(entrants):
+    for pairings, bye, opponents, _ in play_swiss(entrants, seed=1):
+        assert bye is None
+        assert not any(participant2 in opponents[participant1] for participant1, participant2 in pairings)
@@ -0,0 +1,106 @@
+import math
+import random
+from collections import Counter, defaultdict
+from typing import List
+import pytest
+from app.models.pokemon_team import Pokemon
+from app.services.tournament_service import AdvancedTournamentService, TournamentBracket, TournamentType
+
+ODD_FIELDS = [3, 5, 7, 9, 13, 21]
+
+def make_teams(count: int, seed: int) -> List[List[Pokemon]]:
+    rng = random.Random(seed)
+    return [
+        [
+            Pokemon(
+                id=team * 3 + member,
+                name=f"pokemon_{team}_{member}",
+                species="test",
+                type_1=rng.choice(["Fire", "Water", "Grass"]),
+                hp=rng.randint(30, 80),
+                attack=rng.randint(10, 40),
+                defense=rng.randint(10, 40),
+                speed=rng.randint(5, 50)
+            )
+            for member in range(3)
+        ]
+        for team in range(count)
+    ]
+
+def play(count: int, tournament_type: TournamentType, seed: int) -> TournamentBracket:
+    bracket = AdvancedTournamentService.create_tournament_bracket(make_teams(count, seed), tournament_type, seed)
+    return AdvancedTournamentService.simulate_tournament(bracket)
+
+def losses(bracket: TournamentBracket) -> Counter:
+    return Counter(
+        record.participant2 if record.winner == record.participant1 else record.participant1
+        for record in bracket.store
+    )
+
+@pytest.mark.parametrize("count", ODD_FIELDS)
+@pytest.mark.parametrize("seed", range(3))
+def test_single_elimination_gives_top_seeds_byes(count, seed):
+    bracket = play(count, TournamentType.SINGLE_ELIMINATION, seed)
+    field = 1 << math.ceil(math.log2(count))
+    first_round = [record for record in bracket.store if record.round_number == 1]
+
+    assert bracket.byes == list(range(field - count))
+    assert len(first_round) == (count - len(bracket.byes)) // 2
+    assert not {player for record in first_round for player in (record.participant1, record.participant2)} & set(bracket.byes)
+    # Byes leave a power of two for the second round
+    assert len(bracket.byes) + len(first_round) == field // 2
+
+@pytest.mark.parametrize("count", ODD_FIELDS)
+@pytest.mark.parametrize("seed", range(3))
+def test_single_elimination_eliminates_everyone_once(count, seed):
+    bracket = play(count, TournamentType.SINGLE_ELIMINATION, seed)
+    champion = bracket.participants.index(bracket.champion)
+    lost = losses(bracket)
+
+    assert len(bracket.store) == count - 1
+    assert set(lost) == set(range(count)) - {champion}
+    assert set(lost.values()) == {1}
+    assert max(record.round_number for record in bracket.store) == math.ceil(math.log2(count))
+
+    rounds = defaultdict(list)
+    for record in bracket.store:
+        rounds[record.round_number] += [record.participant1, record.participant2]
+        assert record.winner in (record.participant1, record.participant2)
+    for players in rounds.values():
+        assert len(players) == len(set(players))
+    assert [standing.rank for standing in bracket.standings] == list(range(1, count + 1))
+
+@pytest.mark.parametrize("count", ODD_FIELDS)
+@pytest.mark.parametrize("seed", range(3))
+def test_double_elimination_eliminates_everyone_twice(count, seed):
+    bracket = play(count, TournamentType.DOUBLE_ELIMINATION, seed)
+    champion = bracket.participants.index(bracket.champion)
+    lost = losses(bracket)
+
+    assert lost[champion] <= 1
+    assert all(lost[index] == 2 for index in range(count) if index != champion)
+    assert len(bracket.store) == 2 * (count - 1) + lost[champion]
+
+    rounds = defaultdict(list)
+    for record in bracket.store:
+        rounds[record.stage, record.round_number] += [record.participant1, record.participant2]
+    for players in rounds.values():
+        assert len(players) == len(set(players))
+
+@pytest.mark.parametrize("count", ODD_FIELDS)
+@pytest.mark.parametrize("seed", range(3))
+def test_round_robin_plays_every_pair_once(count, seed):
+    bracket = play(count, TournamentType.ROUND_ROBIN, seed)
+    pairs = Counter(frozenset((record.participant1, record.participant2)) for record in bracket.store)
+
+    assert len(pairs) == count * (count - 1) // 2
+    assert set(pairs.values()) == {1}
+
+    rounds = defaultdict(list)
+    for record in bracket.store:
+        rounds[record.round_number] += [record.participant1, record.participant2]
+    # An odd field sits one participant out of each of its count rounds
+    assert len(rounds) == count
+    for players in rounds.values():
+        assert len(players) == len(set(players)) == count - 1
+    assert sum(standing.wins for standing in bracket.standings) == len(bracket.store)